@@ -0,0 +1,332 @@
+"""
+    Classes representing the concurrent actuation of a robot: a bounded queue of commands for each actuator, served by
+    a worker thread, and an arbiter granting each actuator to the plan layer of highest priority.
+    Completion of each command is reported by a concurrent.futures.Future, which asyncio code can await through asyncio.wrap_future.
+"""
+
+from concurrent.futures import Future
+import queue
+import threading
+
+COMMANDS = ('move_forward', 'turn', 'pick_up', 'put_down') # Methods of Actuator that can be queued
+
+class CommandQueue:
+
+    def __init__(self, actuator, capacity:int=8, on_energy=None) -> None:
+
+        """
+            Method to initialize the queue of commands of an actuator, and start the thread performing them in order.
+            A command returning a tuple (outcome,energy_consumed), such as pick_up, is retried while its outcome is
+            False, up to the number of attempts it was submitted with.
+
+            Args:
+                actuator (Actuator): actuator performing the commands.
+                capacity (int): maximum number of commands waiting in the queue.
+                on_energy (callable): optional function called, in the worker thread, with the energy consumed by each attempt,
+                                      returning whether a failed command can be attempted again.
+
+            Returns:
+                CommandQueue: new instance of the CommandQueue class.
+
+            Raises:
+                ValueError: if capacity is not positive.
+        """
+
+        if capacity <= 0: raise ValueError(f"Capacity must be positive, got {capacity}.")
+
+        self._actuator = actuator
+        self._on_energy = on_energy
+        self._queue = queue.Queue(capacity)
+        self._performed = 0
+        self._attempts = 0
+        self._thread = threading.Thread(target=self._serve, name=f"actuator-{actuator._type}", daemon=True)
+        self._thread.start()
+
+    def __str__(self) -> str:
+        return f"Queue of actuator {self._actuator._type} with {self._queue.qsize()} commands waiting, {self._performed} performed."
+
+    def submit(self, method:str, *args, attempts:int=1, timeout:float=None, future:Future=None) -> Future:
+        """
+            Method adding a command to the queue, waiting for a free place if the queue is full.
+
+            Args:
+                method (str): name of the method of the actuator, one of COMMANDS.
+                *args: arguments of the method.
+                attempts (int): maximum number of times a command with an outcome is performed until it succeeds.
+                timeout (float): optional number of seconds to wait for a free place. If None, it waits as long as needed.
+                future (Future): optional future completed with the result of the command. If None, a new one is created.
+
+            Returns:
+                future (Future): future completed with the result of the method, or with the exception it raised.
+                                 For commands retried, the result is (outcome,energy_consumed by all the attempts).
+
+            Raises:
+                ValueError: if the method is not a command, or attempts is not positive.
+                queue.Full: if no place was free before timeout.
+        """
+
+        if method not in COMMANDS: raise ValueError(f"Unknown command {method}, use one of {', '.join(COMMANDS)}.")
+        if attempts < 1: raise ValueError(f"Attempts must be positive, got {attempts}.")
+        future = future if future is not None else Future()
+        self._queue.put((future, getattr(self._actuator, method), args, attempts), timeout=timeout)
+        return future
+
+    def _serve(self) -> None:
+        """
+            Method performing the commands of the queue one after the other, until it receives None.
+        """
+
+        commands = self._queue
+        while True:
+            command = commands.get()
+            if command is None:
+                commands.task_done()
+                return
+            future, method, args, attempts = command
+            # Commands cancelled while waiting are skipped, and a command is done only once its future is completed
+            if future.set_running_or_notify_cancel():
+                try: future.set_result(self._perform(method, args, attempts))
+                except Exception as error: future.set_exception(error)
+                self._performed += 1
+            commands.task_done()
+
+    def _perform(self, method, args:tuple, attempts:int):
+        """
+            Method performing a command, retrying it while its outcome is False.
+        """
+
+        total = 0.0
+        for _ in range(attempts):
+            result = method(*args)
+            self._attempts += 1
+            energy = result[1] if isinstance(result, tuple) else result
+            retry = self._on_energy(energy) if self._on_energy is not None else True
+            if not isinstance(result, tuple): return result
+            total += energy
+            if result[0] or not retry: break
+        return (result[0], total)
+
+    def is_busy(self) -> bool:
+        """
+            Method determining whether the actuator is performing a command or has commands waiting.
+        """
+        return self._queue.unfinished_tasks > 0
+
+    def get_pending(self) -> int:
+        """
+            Method to get the number of commands waiting in the queue.
+        """
+        return self._queue.qsize()
+
+    def get_attempts(self) -> int:
+        """
+            Method to get the number of times the actuator performed a command, retries included.
+        """
+        return self._attempts
+
+    def close(self, wait:bool=True) -> None:
+        """
+            Method stopping the worker thread once the commands already queued are performed.
+
+            Args:
+                wait (bool): whether to wait for the thread to stop.
+        """
+        self._queue.put(None)
+        if wait: self._thread.join()
+
+class Actuation:
+
+    def __init__(self, robot, capacity:int=8, layers:list=None, attempts:int=3) -> None:
+
+        """
+            Method to initialize the concurrent actuation of a robot, with a command queue for each of its actuators.
+            The energy consumed by each command is subtracted from the battery of the robot, under its lock, as soon
+            as it is performed, and a command is not retried once the battery is empty.
+            Commands can be submitted directly, or proposed by the layers of a subsumption plan: at each arbitration,
+            each actuator is granted to the proposal of the layer listed first, as the rules of a plan are ordered
+            by priority, and the proposals it subsumes are cancelled.
+
+            Args:
+                robot (Robot): robot whose actuators perform the commands.
+                capacity (int): maximum number of commands waiting in the queue of each actuator.
+                layers (list): names of the plan layers that can propose commands, highest priority first.
+                attempts (int): default maximum number of times a command with an outcome, such as pick_up, is performed until it succeeds.
+
+            Returns:
+                Actuation: new instance of the Actuation class.
+
+            Raises:
+                ValueError: if capacity or attempts are not positive.
+        """
+
+        if attempts < 1: raise ValueError(f"Attempts must be positive, got {attempts}.")
+
+        self._robot = robot
+        self._queues = {name: CommandQueue(actuator, capacity, self._consume) for name, actuator in robot._actuators.items()}
+        self._layers = {layer: priority for priority, layer in enumerate(layers or [])}
+        self._attempts = attempts
+        self._proposals = {} # Proposals of the current arbitration, keyed by actuator, as lists of (priority, command)
+        self._lock = threading.Lock() # Guards the proposals, which layers may make from different threads
+        self._conflicts = 0 # Proposals cancelled because a layer of higher priority wanted the same actuator
+
+    def __str__(self) -> str:
+        return f"Actuation of robot {self._robot._name} with queues {', '.join(self._queues)}."
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _consume(self, energy:float) -> bool:
+        """
+            Method subtracting from the battery the energy of a command, returning whether there is battery left for retries.
+        """
+        self._robot.consume_energy(energy)
+        return self._robot._battery_level > 0
+
+    def _queue(self, actuator:str) -> CommandQueue:
+        """
+            Method returning the queue of an actuator.
+        """
+        if actuator not in self._queues: raise ValueError(f"Unknown actuator {actuator}, use one of {', '.join(self._queues)}.")
+        return self._queues[actuator]
+
+    def submit(self, actuator:str, method:str, *args, attempts:int=None, timeout:float=None) -> Future:
+        """
+            Method queueing a command for an actuator, without arbitration.
+
+            Args:
+                actuator (str): name of the actuator, as in Robot._actuators.
+                method (str): name of the method of the actuator, one of COMMANDS.
+                *args: arguments of the method.
+                attempts (int): maximum number of attempts of a command with an outcome. If None, the default of the actuation is used.
+                timeout (float): optional number of seconds to wait for a free place in the queue.
+
+            Returns:
+                future (Future): future completed with the result of the command.
+
+            Raises:
+                ValueError: if the actuator or the command are unknown.
+                queue.Full: if no place was free before timeout.
+        """
+        return self._queue(actuator).submit(method, *args, attempts=attempts or self._attempts, timeout=timeout)
+
+    def propose(self, layer:str, actuator:str, method:str, *args, attempts:int=None) -> Future:
+        """
+            Method proposing a command of a plan layer for an actuator, queued at the next arbitration if no layer
+            of higher priority proposes a command for the same actuator.
+
+            Args:
+                layer (str): name of the plan layer, one of the layers of the actuation.
+                actuator (str): name of the actuator, as in Robot._actuators.
+                method (str): name of the method of the actuator, one of COMMANDS.
+                *args: arguments of the method.
+                attempts (int): maximum number of attempts of a command with an outcome. If None, the default of the actuation is used.
+
+            Returns:
+                future (Future): future completed with the result of the command, or cancelled if the command is subsumed.
+
+            Raises:
+                ValueError: if the layer, the actuator or the command are unknown.
+        """
+
+        if layer not in self._layers: raise ValueError(f"Unknown layer {layer}, use one of {', '.join(self._layers)}.")
+        self._queue(actuator)
+        if method not in COMMANDS: raise ValueError(f"Unknown command {method}, use one of {', '.join(COMMANDS)}.")
+        future = Future()
+        with self._lock: self._proposals.setdefault(actuator, []).append((self._layers[layer], layer, method, args, attempts, future))
+        return future
+
+    def arbitrate(self, timeout:float=None) -> dict:
+        """
+            Method queueing, for each actuator, the command proposed by the layer of highest priority since the last
+            arbitration, and cancelling the others. Among proposals of the same layer, the first one wins.
+
+            Args:
+                timeout (float): optional number of seconds to wait for a free place in each queue.
+
+            Returns:
+                granted (dict): dictionary associating to each actuator that received proposals the layer it was granted to.
+        """
+
+        with self._lock: proposals, self._proposals = self._proposals, {}
+        granted = {}
+        for actuator, candidates in proposals.items():
+            _, layer, method, args, attempts, future = min(candidates, key=lambda candidate: candidate[0])
+            for candidate in candidates:
+                if candidate[-1] is not future:
+                    candidate[-1].cancel()
+                    self._conflicts += 1
+            self._queues[actuator].submit(method, *args, attempts=attempts or self._attempts, timeout=timeout, future=future)
+            granted[actuator] = layer
+        return granted
+
+    def is_busy(self, actuator:str) -> bool:
+        """
+            Method determining whether an actuator is performing a command or has commands waiting.
+        """
+        return self._queue(actuator).is_busy()
+
+    def get_queue(self, actuator:str) -> CommandQueue:
+        """
+            Method to get the command queue of an actuator.
+        """
+        return self._queue(actuator)
+
+    def get_conflicts(self) -> int:
+        """
+            Method to get the number of proposals cancelled by arbitration.
+        """
+        return self._conflicts
+
+    def close(self, wait:bool=True) -> None:
+        """
+            Method stopping the worker threads once the commands already queued are performed.
+
+            Args:
+                wait (bool): whether to wait for the threads to stop.
+        """
+        for command_queue in self._queues.values(): command_queue.close(wait)
+
+if __name__ == "__main__":
+
+    import time
+
+    import numpy as np
+
+    from sense_plan_act.actuator import Actuator
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    # Slow gripper: each attempt of pick up takes 10 ms
+    class SlowGripper(Actuator):
+        def pick_up(self, object:str) -> tuple:
+            time.sleep(0.01)
+            return super().pick_up(object)
+
+    # Test that pick up retries in the gripper queue while the motor keeps moving, and the battery they share
+    robot = build_robot(DEFAULT_CONFIG, np.random.default_rng(0))
+    robot._actuators['gripper'] = SlowGripper('gripper', 2.0, 1.0, 0.2, np.random.default_rng(1))
+    with Actuation(robot, attempts=5) as actuation:
+        start = time.perf_counter()
+        picked = actuation.submit('gripper', 'pick_up', 'water')
+        moves = [actuation.submit('motor', 'move_forward', 1.0) for _ in range(4)]
+        print([move.result() for move in moves], f"moved in {1e3 * (time.perf_counter() - start):.1f} ms, gripper busy: {actuation.is_busy('gripper')}")
+        print(picked.result(), f"after {actuation.get_queue('gripper').get_attempts()} attempts, {1e3 * (time.perf_counter() - start):.1f} ms")
+    print(f"Battery: {robot._battery_level:.1f}")
+
+    # Test arbitration between the layers of a subsumption plan
+    with Actuation(robot, layers=['avoid', 'go', 'wander']) as actuation:
+        wander = actuation.propose('wander', 'servo', 'turn', 'left', 1.0)
+        avoid = actuation.propose('avoid', 'servo', 'turn', 'right', 1.0)
+        go = actuation.propose('go', 'motor', 'move_forward', 1.0)
+        print(actuation.arbitrate(), avoid.result(), go.result(), wander.cancelled(), actuation.get_conflicts())
+
+    # Test that commands from many threads never lose an update of the battery
+    robot.reload_battery()
+    with Actuation(robot, capacity=4) as actuation:
+        def command(index:int) -> float:
+            return actuation.submit('motor' if index % 2 else 'servo', 'move_forward', 1.0).result()
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(8) as pool: energy = sum(pool.map(command, range(1000)))
+    print(f"Energy: {energy:.1f}, battery: {robot._battery_level:.1f}, expected {100 - energy:.1f}")
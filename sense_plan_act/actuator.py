@@ -2,11 +2,13 @@
     Class representing an actuator used by the robot to perform actions.
 """
 
-import random
+import threading
+
+from sense_plan_act.events import NULL_LOG, INFO, MOVE_FORWARD, TURN, PICK_UP, PICK_UP_DONE, PICK_UP_FAILED, PUT_DOWN, PUT_DOWN_SKIPPED
 
 class Actuator:
     
-    def __init__(self, type:str, max_speed:float, max_turning_speed:float, energy_cost:float) -> None:
+    def __init__(self, type:str, max_speed:float, max_turning_speed:float, energy_cost:float, rng=None, events=None) -> None:
 
         """
             Method to initialize an actuator. 
@@ -16,6 +18,8 @@ class Actuator:
                 max_speed (float): float representing the max speed the actuator can reach.
                 energy_cors (float): float representing the energy cost for the usage of the actuator.
                 is_active (bool): boolean denoting if the actuator is active or not.
+                rng (np.random.Generator): optional random generator deciding the outcome of pick up operations. If None, global random state is used.
+                events (EventLog): optional log receiving the events of the actuator. If None, events are discarded.
             
             Returns:
                 Actuator: new instance of the Actuator class.
@@ -23,6 +27,8 @@ class Actuator:
         
         self._type = type
         self._energy_cost = energy_cost
+        self._rng = rng
+        self._events = events if events is not None else NULL_LOG
 
         self._max_speed = max_speed
         self._current_speed = 0.0 # Initial speed is zero
@@ -31,6 +37,7 @@ class Actuator:
         self._current_turning_speed = 0.0 # Initial turning speed is zero
 
         self._holding = None # Initally robot holds nothing
+        self._lock = threading.Lock() # Guards the object held, as commands may be performed by a worker thread
         self.is_active = False # Initially the actuator is not active
     
     def move_forward(self, speed:float) -> float:
@@ -45,7 +52,7 @@ class Actuator:
         """
 
         self._current_speed = speed if speed < self._max_speed else self._max_speed
-        print(f"Moving forward at speed {self._current_speed}.")
+        self._events.emit(INFO, MOVE_FORWARD, self._type, self._current_speed)
 
         return self._energy_cost
         
@@ -62,7 +69,7 @@ class Actuator:
         """
         
         self._current_turning_speed = speed if speed < self._max_turning_speed else self._max_turning_speed
-        print(f"Turning {direction} at speed {self._current_turning_speed}.")
+        self._events.emit(INFO, TURN, self._type, self._current_turning_speed, direction)
 
         return self._energy_cost
 
@@ -76,12 +83,15 @@ class Actuator:
             Returns:
                 result (tuple): tuple in the form (outcome,energy_consumed). Outcome is True if operation carried out successfully, and False otherwise.
         """
-        success = random.choice([True, False])
-        print(f"Picking up {object} from the environment.")
+        if self._rng is not None: success = bool(self._rng.random() < 0.5)
+        else:
+            import random # Only needed without a generator, so not imported with the module
+            success = random.choice([True, False])
+        self._events.emit(INFO, PICK_UP, self._type, detail=object)
         if success: 
-            self._holding = object
-            print(f"Operation completed successfully. Now holding {object}")
-        else: print(f"Operation failed, retry.")
+            with self._lock: self._holding = object
+            self._events.emit(INFO, PICK_UP_DONE, self._type, detail=object)
+        else: self._events.emit(INFO, PICK_UP_FAILED, self._type, detail=object)
         
         return (success, self._energy_cost)
 
@@ -93,13 +103,13 @@ class Actuator:
                 energy_consumed (float): energy consumed to perform the operation.
         """
 
-        if self._holding is None: 
+        with self._lock: held, self._holding = self._holding, None
+        if held is None: 
             energy_consumed = 0.0
-            print(f"Nothing to put down. Operation skipped.")
+            self._events.emit(INFO, PUT_DOWN_SKIPPED, self._type)
         else: 
             energy_consumed = self._energy_cost
-            print(f"Put down {self._holding} completed.")
-            self._holding = None
+            self._events.emit(INFO, PUT_DOWN, self._type, detail=held)
         
         return energy_consumed
     
@@ -110,11 +120,14 @@ class Actuator:
         return self._holding
     
 if __name__ == "__main__":
-    
-    # Initialize actuators
-    motor = Actuator('motor', 10.0, 2.0, 10.0)
-    gripper = Actuator('gripper', 2.0, 1.0, 2.0)
-    servo = Actuator('servo', 3.0, 3.0, 5.0)
+
+    from sense_plan_act.events import EventLog, ConsoleSink
+
+    # Initialize actuators, printing their events
+    log = EventLog(ConsoleSink(), INFO, capacity=1)
+    motor = Actuator('motor', 10.0, 2.0, 10.0, events=log)
+    gripper = Actuator('gripper', 2.0, 1.0, 2.0, events=log)
+    servo = Actuator('servo', 3.0, 3.0, 5.0, events=log)
 
     # Test move_forward
     print(motor.move_forward(4.0))
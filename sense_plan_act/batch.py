@@ -0,0 +1,188 @@
+"""
+    Functions to run many missions in parallel and to aggregate their results.
+"""
+
+import os
+
+import numpy as np
+
+from sense_plan_act.faults import FaultInjector
+from sense_plan_act.mission import build_robot, run_mission
+
+# Ways of starting the worker processes. With forkserver, a server process imports the package once, and every worker
+# is forked from it already warm, instead of starting a new interpreter (spawn) or copying this process (fork).
+START_METHODS = ('fork', 'forkserver', 'spawn')
+_preloaded = False # Whether the modules preloaded by the forkserver were set, which is global to the process
+
+def _run_shard(config:dict, shard:list) -> list:
+    """
+        Function running a shard of missions in a worker process.
+
+        Args:
+            config (dict): dictionary describing the robot and the mission.
+            shard (list): list of tuples (run index, np.random.SeedSequence) of the missions to run.
+
+        Returns:
+            results (list): list of tuples (run index, result of the mission).
+    """
+
+    results = []
+    for index, seed in shard:
+        rng = np.random.default_rng(seed)
+        robot = build_robot(config, rng)
+        faults = FaultInjector(config['faults'], rng) if config.get('faults') is not None else None
+        results.append((index, run_mission(robot, config['goal'], config.get('max_ticks'), faults=faults)))
+    return results
+
+def iter_batch(config:dict, n_runs:int, workers:int=None, seed:int=None, chunk_size:int=None, start_method:str=None):
+    """
+        Function running missions in parallel and yielding their results as soon as they are available.
+        Each mission has its own random generator, spawned from the master seed, so that results do not
+        depend on the number of workers nor on the order in which missions complete.
+
+        Args:
+            config (dict): dictionary describing the robot and the mission, in the same form as DEFAULT_CONFIG.
+            n_runs (int): integer representing the number of missions to run.
+            workers (int): number of worker processes. If None, all available cores are used. If 0, missions run in this process.
+            seed (int): master seed from which the seeds of all missions are derived.
+            chunk_size (int): number of missions sent to a worker at once. If None, it is chosen from n_runs and workers.
+            start_method (str): one of START_METHODS, the way worker processes are started. If None, the default of the platform is used.
+                                With forkserver, the server and the modules it preloads are shared by every batch of the process.
+
+        Yields:
+            result (tuple): tuple (run index, result of the mission).
+    """
+
+    for _, index, result in iter_sweep([(config, n_runs, seed)], workers, chunk_size, start_method): yield index, result
+
+def iter_sweep(batches:list, workers:int=None, chunk_size:int=None, start_method:str=None):
+    """
+        Function running the missions of many batches in the same pool of workers, yielding their results as soon as they are available.
+        Seeds of the missions of each batch are derived as in iter_batch, so results are the same as running the batches one by one.
+
+        Args:
+            batches (list): list of tuples (config, n_runs, seed) describing each batch, as the arguments of iter_batch.
+            workers (int): number of worker processes. If None, all available cores are used. If 0, missions run in this process.
+            chunk_size (int): number of missions sent to a worker at once. If None, it is chosen from the total number of missions and workers.
+            start_method (str): one of START_METHODS, the way worker processes are started. If None, the default of the platform is used.
+                                With forkserver, the server and the modules it preloads are shared by every batch of the process.
+
+        Yields:
+            result (tuple): tuple (batch index, run index, result of the mission).
+
+        Raises:
+            ValueError: if start_method is not supported on this platform.
+    """
+
+    seeds = [list(enumerate(np.random.SeedSequence(seed).spawn(n_runs))) for _, n_runs, seed in batches]
+
+    if workers == 0:
+        for batch, (config, _, _) in enumerate(batches):
+            for shard in seeds[batch]:
+                for index, result in _run_shard(config, [shard]): yield batch, index, result
+        return
+
+    # Process pools are imported only when missions run in workers
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import multiprocessing
+
+    context = None
+    if start_method is not None:
+        if start_method not in multiprocessing.get_all_start_methods(): raise ValueError(f"Start method {start_method} is not available, use one of {', '.join(multiprocessing.get_all_start_methods())}.")
+        context = multiprocessing.get_context(start_method)
+        # The forkserver is shared by the whole process, so its preload is set once, the first time it is used, and applies
+        # to every later batch. It preloads the main module and this one, except when this module is itself run as a script:
+        # it is then __main__, and preloading it under its own name too would import it twice in the server.
+        global _preloaded
+        if start_method == 'forkserver' and not _preloaded and __name__ != '__main__':
+            context.set_forkserver_preload(['__main__', __name__])
+            _preloaded = True
+
+    workers = workers if workers is not None else os.cpu_count()
+    total = sum(n_runs for _, n_runs, _ in batches)
+    chunk_size = chunk_size if chunk_size is not None else max(1, total // (workers * 8))
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        futures = {pool.submit(_run_shard, config, seeds[batch][start:start+chunk_size]): batch
+                   for batch, (config, n_runs, _) in enumerate(batches) for start in range(0, n_runs, chunk_size)}
+        for future in as_completed(futures):
+            for index, result in future.result(): yield futures[future], index, result
+
+def summarize(results:list) -> dict:
+    """
+        Function aggregating the results of many missions into summary statistics.
+
+        Args:
+            results (list): list of results of the missions, as returned by run_mission.
+
+        Returns:
+            summary (dict): dictionary of summary statistics, all None but n_runs if there are no results.
+    """
+
+    if not results:
+        return {'n_runs': 0, 'success_rate': None, 'trapped_rate': None, 'battery_mean': None, 'battery_std': None,
+                'battery_percentiles': None, 'ticks_mean': None, 'ticks_success_mean': None}
+
+    found = np.array([result['found'] for result in results], dtype=bool)
+    trapped = np.array([result['trapped'] for result in results], dtype=bool)
+    battery = np.array([result['battery_level'] for result in results], dtype=float)
+    ticks = np.array([result['ticks'] for result in results], dtype=float)
+
+    return {
+        'n_runs': len(results),
+        'success_rate': float(found.mean()),
+        'trapped_rate': float(trapped.mean()),
+        'battery_mean': float(battery.mean()),
+        'battery_std': float(battery.std()),
+        'battery_percentiles': {str(q): float(np.percentile(battery, q)) for q in (5, 50, 95)},
+        'ticks_mean': float(ticks.mean()),
+        'ticks_success_mean': float(ticks[found].mean()) if found.any() else None,
+        **({'degraded_rate': sum(result['degraded_ticks'] for result in results) / max(1, ticks.sum())} if results and 'degraded_ticks' in results[0] else {})
+    }
+
+def run_batch(config:dict, n_runs:int, workers:int=None, seed:int=None, on_result=None, start_method:str=None) -> dict:
+    """
+        Function running missions in parallel and aggregating their results.
+
+        Args:
+            config (dict): dictionary describing the robot and the mission, in the same form as DEFAULT_CONFIG.
+            n_runs (int): integer representing the number of missions to run.
+            workers (int): number of worker processes. If None, all available cores are used. If 0, missions run in this process.
+            seed (int): master seed from which the seeds of all missions are derived.
+            on_result (callable): optional function called with run index and result of each mission, as soon as it completes.
+            start_method (str): one of START_METHODS, the way worker processes are started. If None, the default of the platform is used.
+                                With forkserver, the server and the modules it preloads are shared by every batch of the process.
+
+        Returns:
+            summary (dict): dictionary of summary statistics, as returned by summarize.
+    """
+
+    results = [None] * n_runs
+    for index, result in iter_batch(config, n_runs, workers, seed, start_method=start_method):
+        results[index] = result
+        if on_result is not None: on_result(index, result)
+    return summarize(results)
+
+if __name__ == "__main__":
+
+    import time
+
+    from sense_plan_act.mission import DEFAULT_CONFIG
+
+    # Test reproducibility with different number of workers
+    serial = run_batch(DEFAULT_CONFIG, 50, workers=0, seed=1)
+    parallel = run_batch(DEFAULT_CONFIG, 50, workers=2, seed=1)
+    print(serial == parallel)
+    print(serial)
+
+    # Test scaling across cores
+    for workers in (1, os.cpu_count()):
+        start = time.perf_counter()
+        run_batch(DEFAULT_CONFIG, 200, workers=workers, seed=2)
+        print(f"{workers} workers: {time.perf_counter() - start:.2f} s")
+
+    # Test start methods of the workers on short missions, where starting the workers costs more than the missions
+    short = dict(DEFAULT_CONFIG, max_ticks=20)
+    for start_method in START_METHODS:
+        start = time.perf_counter()
+        summary = run_batch(short, 64, workers=8, seed=3, start_method=start_method)
+        print(f"{start_method}: {time.perf_counter() - start:.2f} s", summary == run_batch(short, 64, workers=0, seed=3))
@@ -0,0 +1,322 @@
+"""
+    Functions to benchmark the phases of a Sense-Plan-Act time step at several scales.
+
+    Run with: python -m sense_plan_act.benchmark [--save baseline.json] [--compare baseline.json] [--imports]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sense_plan_act.sensor import Sensor
+from sense_plan_act.planner import Planner
+from sense_plan_act.actuator import Actuator
+from sense_plan_act.fleet import FleetSimulator
+from sense_plan_act.robot import Robot
+from sense_plan_act.control_loop import ControlLoop
+from sense_plan_act.perception import depends_on
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+
+def _statistics(times:np.ndarray, units:int=1) -> dict:
+    """
+        Function computing throughput and latency percentiles from the durations, in nanoseconds, of some ticks.
+        Units is the number of ticks performed in each measured call, for example the robots of a fleet.
+    """
+
+    total = times.sum()
+    return {
+        'ticks_per_sec': float(len(times) * units / (total / 1e9)) if total else float('inf'),
+        'p50_us': float(np.percentile(times, 50) / 1e3),
+        'p99_us': float(np.percentile(times, 99) / 1e3)
+    }
+
+def _allocations(function, n_ticks:int) -> float:
+    """
+        Function measuring the average amount of memory, in bytes, allocated at peak during a call of function.
+    """
+
+    tracemalloc.start()
+    total = 0
+    for _ in range(n_ticks):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        function()
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / n_ticks
+
+def measure(function, n_ticks:int, warmup:int=10, units:int=1) -> dict:
+    """
+        Function benchmarking a function representing a tick, or a phase of a tick.
+
+        Args:
+            function (callable): function without arguments performing the tick.
+            n_ticks (int): integer representing the number of measured ticks.
+            warmup (int): integer representing the number of ticks performed before measuring.
+            units (int): number of ticks performed by each call of function.
+
+        Returns:
+            result (dict): dictionary with ticks per second, p50 and p99 latency in microseconds and bytes allocated per tick.
+    """
+
+    for _ in range(warmup): function()
+
+    times = np.empty(n_ticks, dtype=np.int64)
+    clock = time.perf_counter_ns
+    for tick in range(n_ticks):
+        start = clock()
+        function()
+        times[tick] = clock() - start
+
+    result = _statistics(times, units)
+    result['alloc_bytes_per_tick'] = _allocations(function, min(n_ticks, 100)) / units
+    return result
+
+def _make_robot_parts(n_sensors:int, max_samples:int, seed:int=0) -> tuple:
+    """
+        Function creating sensors, actuators and planner for the phase benchmarks.
+    """
+
+    rng = np.random.default_rng(seed)
+    sensors = {'position': Sensor('position', 1.0, max_samples, rng), 'camera': Sensor('camera', 0.0, max_samples, rng)}
+    for index in range(n_sensors - 2): sensors[f'sensor_{index}'] = Sensor('generic', 10.0, max_samples, rng)
+    actuators = {'motor': Actuator('motor', 10.0, 2.0, 1.0), 'gripper': Actuator('gripper', 2.0, 1.0, 0.2, rng),
+                 'servo': Actuator('servo', 3.0, 3.0, 0.5)}
+    return sensors, actuators, Planner('search')
+
+def _nested_plan(planner:Planner, depth:int) -> str:
+    """
+        Function adding to a planner a chain of depth plans, each one delegating to the next, ending with the search plan.
+        Every level also has a rule that never applies, so the planner walks the whole hierarchy.
+    """
+
+    goal = 'search'
+    for level in range(depth - 1):
+        new_goal = f'level_{level}'
+        planner.add_plan(new_goal, [(depends_on('battery_level')(lambda perceptions: perceptions['battery_level'] < 0), 'pick_up'),
+                                    (planner.check_battery, goal)])
+        goal = new_goal
+    return goal
+
+def benchmark_phases(n_sensors:int=5, max_samples:int=10, plan_depth:int=1, n_ticks:int=2000) -> dict:
+    """
+        Function benchmarking separately each phase of the time step performed by ControlLoop, and the whole time step.
+
+        Args:
+            n_sensors (int): integer representing the number of sensors of the robot.
+            max_samples (int): integer representing the samples collected by each sensor at each tick.
+            plan_depth (int): integer representing the number of nested plans the planner walks through.
+            n_ticks (int): integer representing the number of measured ticks.
+
+        Returns:
+            results (dict): dictionary associating to each phase its benchmark result.
+    """
+
+    sensors, actuators, planner = _make_robot_parts(n_sensors, max_samples)
+    goal = _nested_plan(planner, plan_depth)
+    camera, gps = sensors['camera'], sensors['position']
+
+    perceptions = {'battery_level': 100.0, 'position': (0,0), 'target': None}
+    perceptions.update(camera.get_directions_state())
+
+    def plan_legacy():
+        planner.select_action(planner.compute_subsumption_plan(goal), perceptions)
+
+    def plan_compiled():
+        planner.select_action(planner.compile(goal), perceptions)
+
+    # Same plan with the cache of the planner, hit at every tick since perceptions do not change
+    cached_planner = Planner('search')
+    _nested_plan(cached_planner, plan_depth)
+    cached_planner.set_cache()
+    def plan_cached():
+        cached_planner.select_action(cached_planner.compile(goal), perceptions)
+
+    def act():
+        actuators['motor'].move_forward(1.0)
+        actuators['servo'].turn('left', 1.0)
+        actuators['gripper'].pick_up('water')
+
+    # Battery is reloaded at each tick, so that the planner keeps selecting actions
+    loop = ControlLoop(Robot('Benchmark', (1.5, 0.3), 20, sensors, actuators, planner), goal)
+    def tick():
+        loop._robot.reload_battery()
+        loop.step()
+
+    # Same time step, reading only the sensors the rules evaluated need
+    lazy_loop = ControlLoop(loop._robot, goal, lazy=True)
+    def tick_lazy():
+        lazy_loop._robot.reload_battery()
+        lazy_loop.step()
+
+    return {
+        'sense': measure(lambda: [sensor.get_all_data() for sensor in sensors.values()], n_ticks),
+        'target_visible': measure(camera.target_visible, n_ticks),
+        'directions_state': measure(camera.get_directions_state, n_ticks),
+        'directions_mask': measure(camera.get_directions_mask, n_ticks),
+        'plan_legacy': measure(plan_legacy, n_ticks),
+        'plan_compiled': measure(plan_compiled, n_ticks),
+        'plan_cached': measure(plan_cached, n_ticks),
+        'act': measure(act, n_ticks),
+        'tick': measure(tick, n_ticks),
+        'tick_lazy': measure(tick_lazy, n_ticks)
+    }
+
+def benchmark_fleet(n_robots:int, n_ticks:int=50) -> dict:
+    """
+        Function benchmarking the fleet simulator, counting each robot of the fleet as a tick.
+
+        Args:
+            n_robots (int): integer representing the number of robots in the fleet.
+            n_ticks (int): integer representing the number of measured fleet steps.
+
+        Returns:
+            result (dict): benchmark result.
+    """
+
+    def step():
+        # A new fleet is created whenever the previous one is done, so every step is a full one
+        if fleet[0].step() < n_robots: fleet[0] = FleetSimulator(n_robots, {'position': 10, 'camera': 1}, 1.0, 0.5, 0.2, rng)
+
+    rng = np.random.default_rng(0)
+    fleet = [FleetSimulator(n_robots, {'position': 10, 'camera': 1}, 1.0, 0.5, 0.2, rng)]
+    return measure(step, n_ticks, warmup=2, units=n_robots)
+
+def run_suite(quick:bool=False) -> dict:
+    """
+        Function running all the benchmarks, at several scales.
+
+        Args:
+            quick (bool): True to measure fewer ticks, for a faster but noisier run.
+
+        Returns:
+            results (dict): dictionary associating to the name of each benchmark its result.
+    """
+
+    n_ticks = 200 if quick else 2000
+    results = {}
+
+    def add(prefix:str, phases:dict) -> None:
+        for phase, result in phases.items(): results[f'{prefix}.{phase}'] = result
+
+    add('default', benchmark_phases(n_ticks=n_ticks))
+    for n_sensors in (2, 20):
+        results[f'sensors_{n_sensors}.tick'] = benchmark_phases(n_sensors=n_sensors, n_ticks=n_ticks)['tick']
+    for max_samples in (1, 100, 1000):
+        results[f'samples_{max_samples}.sense'] = benchmark_phases(max_samples=max_samples, n_ticks=n_ticks)['sense']
+    for plan_depth in (4, 16):
+        phases = benchmark_phases(plan_depth=plan_depth, n_ticks=n_ticks)
+        results[f'depth_{plan_depth}.plan_legacy'] = phases['plan_legacy']
+        results[f'depth_{plan_depth}.plan_compiled'] = phases['plan_compiled']
+    for n_robots in (1, 100, 10000):
+        results[f'fleet_{n_robots}.step'] = benchmark_fleet(n_robots, 10 if quick else 50)
+
+    return results
+
+def measure_imports(module:str='sense_plan_act.batch', repeat:int=5) -> dict:
+    """
+        Function measuring the startup of new interpreters importing a module, as a worker of a batch does,
+        with the import times reported by python -X importtime.
+
+        Args:
+            module (str): name of the module imported.
+            repeat (int): number of interpreters started.
+
+        Returns:
+            imports (dict): dictionary with the median time, in milliseconds, of an interpreter starting, importing the
+                            module and exiting, 'startup_ms', and of the import alone, 'import_ms', and the cumulative
+                            import time, in milliseconds, of each module imported in the fastest run, slowest first.
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    startups, runs = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True, env=env, check=True)
+        startups.append(time.perf_counter() - start)
+
+        # Lines are 'import time: self [us] | cumulative [us] | nested name', after a header
+        modules = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line: continue
+            _, cumulative, name = line.split('|')
+            modules[name.strip()] = int(cumulative) / 1e3
+        runs.append(modules)
+
+    fastest = min(runs, key=lambda modules: modules.get(module, 0.0))
+    return {
+        'startup_ms': float(np.median(startups) * 1e3),
+        'import_ms': float(np.median([modules.get(module, 0.0) for modules in runs])),
+        'modules': dict(sorted(fastest.items(), key=lambda item: item[1], reverse=True))
+    }
+
+def compare(results:dict, baseline:dict, tolerance:float=0.2) -> list:
+    """
+        Function comparing benchmark results with a baseline.
+
+        Args:
+            results (dict): results of the current run.
+            baseline (dict): results of the baseline run.
+            tolerance (float): relative slowdown accepted before a benchmark is considered a regression.
+
+        Returns:
+            regressions (list): list of strings describing each regression.
+    """
+
+    regressions = []
+    for name, reference in baseline.items():
+        result = results.get(name)
+        if result is None: continue
+        if result['ticks_per_sec'] < reference['ticks_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['ticks_per_sec']:.0f} ticks/s, baseline {reference['ticks_per_sec']:.0f}")
+        if result['p99_us'] > reference['p99_us'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {result['p99_us']:.1f} us, baseline {reference['p99_us']:.1f}")
+    return regressions
+
+def main(argv:list=None) -> int:
+    """
+        Function running the benchmark suite from the command line.
+
+        Returns:
+            status (int): 1 if a regression with respect to the baseline is found, 0 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark the Sense-Plan-Act time step.")
+    parser.add_argument('--save', help="path of a JSON file where results are saved as baseline")
+    parser.add_argument('--compare', help="path of a JSON baseline to compare results with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="relative slowdown accepted (default 0.2)")
+    parser.add_argument('--quick', action='store_true', help="measure fewer ticks")
+    parser.add_argument('--imports', nargs='?', const='sense_plan_act.batch', metavar='MODULE',
+                        help="only measure the startup of interpreters importing a module (default: sense_plan_act.batch)")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        imports = measure_imports(args.imports)
+        print(f"Startup: {imports['startup_ms']:.1f} ms, import of {args.imports}: {imports['import_ms']:.1f} ms")
+        for name, cumulative in list(imports['modules'].items())[:15]: print(f"{name:40} {cumulative:10.2f} ms")
+        return 0
+
+    results = run_suite(args.quick)
+    print(f"{'benchmark':30} {'ticks/s':>12} {'p50 us':>10} {'p99 us':>10} {'alloc B':>10}")
+    for name, result in results.items():
+        print(f"{name:30} {result['ticks_per_sec']:12.0f} {result['p50_us']:10.2f} {result['p99_us']:10.2f} {result['alloc_bytes_per_tick']:10.0f}")
+
+    if args.save:
+        with open(args.save, 'w') as file: json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file: regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions: print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
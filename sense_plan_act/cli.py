@@ -0,0 +1,120 @@
+"""
+    Command line entry point running sweeps of scenarios, installed as the sense-plan-act console script.
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+from sense_plan_act.batch import START_METHODS, iter_sweep, summarize
+from sense_plan_act.scenario import load_scenarios, to_config
+
+FORMATS = ('table', 'json', 'csv')
+
+# Columns of the table and csv outputs, taken from the summaries returned by summarize
+COLUMNS = ('n_runs', 'success_rate', 'trapped_rate', 'battery_mean', 'battery_std', 'ticks_mean', 'ticks_success_mean')
+
+def _count(minimum:int):
+    """
+        Function returning an argparse type accepting integers of at least a minimum.
+    """
+
+    def parse(text:str) -> int:
+        try: value = int(text)
+        except ValueError: raise argparse.ArgumentTypeError(f"{text!r} is not an integer.")
+        if value < minimum: raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {value}.")
+        return value
+    return parse
+
+def run_sweep(scenarios:list, workers:int=None, runs:int=None, seed:int=None, on_result=None, start_method:str=None) -> list:
+    """
+        Function running the missions of many scenarios in the same pool of workers and summarizing each scenario.
+
+        Args:
+            scenarios (list): list of expanded scenarios, as returned by load_scenarios.
+            workers (int): number of worker processes. If None, all available cores are used. If 0, missions run in this process.
+            runs (int): optional number of missions of every scenario, overriding the ones of the scenarios.
+            seed (int): optional master seed of every scenario, overriding the ones of the scenarios.
+            on_result (callable): optional function called with scenario index, run index and result of each mission.
+            start_method (str): one of START_METHODS, the way worker processes are started. If None, the default of the platform is used.
+
+        Returns:
+            summaries (list): list of dictionaries with the name of each scenario and its summary statistics.
+    """
+
+    batches = [(to_config(scenario), runs if runs is not None else scenario.get('runs', 1), seed if seed is not None else scenario.get('seed'))
+               for scenario in scenarios]
+    results = [[None] * n_runs for _, n_runs, _ in batches]
+    for batch, index, result in iter_sweep(batches, workers, start_method=start_method):
+        results[batch][index] = result
+        if on_result is not None: on_result(batch, index, result)
+    return [dict(scenario=scenario['name'], **summarize(batch_results)) for scenario, batch_results in zip(scenarios, results)]
+
+def write_summaries(summaries:list, format:str, file) -> None:
+    """
+        Function writing the summaries of a sweep in one of the supported formats.
+
+        Args:
+            summaries (list): list of summaries, as returned by run_sweep.
+            format (str): one of 'table', 'json' or 'csv'.
+            file (file): text file where the summaries are written.
+
+        Raises:
+            ValueError: if the format is not supported.
+    """
+
+    if format == 'json':
+        json.dump(summaries, file, indent=2)
+        file.write('\n')
+    elif format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(('scenario',) + COLUMNS)
+        for summary in summaries: writer.writerow([summary['scenario']] + [summary[column] for column in COLUMNS])
+    elif format == 'table':
+        width = max([len('scenario')] + [len(summary['scenario']) for summary in summaries])
+        file.write(f"{'scenario':{width}} " + ' '.join(f"{column:>18}" for column in COLUMNS) + '\n')
+        for summary in summaries:
+            values = ' '.join(f"{'-':>18}" if summary[column] is None else f"{summary[column]:18.3f}" if isinstance(summary[column], float) else f"{summary[column]:>18}"
+                              for column in COLUMNS)
+            file.write(f"{summary['scenario']:{width}} {values}\n")
+    else: raise ValueError(f"Format {format} is not one of {', '.join(FORMATS)}.")
+
+def main(argv:list=None) -> int:
+    """
+        Function running a sweep of scenarios from the command line.
+        Every scenario is loaded and validated before any mission runs.
+
+        Returns:
+            status (int): 2 if some scenario is not valid, 0 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(prog='sense-plan-act', description="Run sweeps of Sense-Plan-Act missions described by scenario files.")
+    parser.add_argument('scenarios', nargs='+', help="paths of .toml or .json scenario files")
+    parser.add_argument('--workers', type=_count(0), default=None, help="worker processes, 0 to run in this process (default: all cores)")
+    parser.add_argument('--runs', type=_count(1), default=None, help="missions of every scenario, overriding the scenario files")
+    parser.add_argument('--seed', type=int, default=None, help="master seed of every scenario, overriding the scenario files")
+    parser.add_argument('--start-method', choices=START_METHODS, default=None,
+                        help="how worker processes start, forkserver forking them from a process that imported the package once (default: platform)")
+    parser.add_argument('--format', choices=FORMATS, default='table', help="output format (default: table)")
+    parser.add_argument('--output', help="path of the file where summaries are written (default: standard output)")
+    parser.add_argument('--check', action='store_true', help="only validate the scenarios and list them")
+    args = parser.parse_args(argv)
+
+    try: scenarios = load_scenarios(args.scenarios)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    if args.check:
+        for scenario in scenarios: print(scenario['name'])
+        return 0
+
+    summaries = run_sweep(scenarios, args.workers, args.runs, args.seed, start_method=args.start_method)
+    if args.output is None: write_summaries(summaries, args.format, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as file: write_summaries(summaries, args.format, file)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,514 @@
+"""
+    Class representing the Sense-Plan-Act control loop of a robot.
+"""
+
+import time
+from functools import partial
+
+from sense_plan_act.perception import ALL_BLOCKED, BITS, FIELDS, HEADINGS, LazyPerception, Perception
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+OFFSETS = {'left': (-1,0), 'right': (1,0), 'forward': (0,1), 'backward': (0,-1)}
+OPPOSITES = {'left': 'right', 'right': 'left', 'forward': 'backward', 'backward': 'forward'}
+
+class ControlLoop:
+
+    def __init__(self, robot, goal:str=None, rate:float=None, recorder=None, clock=time.perf_counter, sleep=time.sleep,
+                 fusion=None, lazy:bool=False, metrics=None, kinematics=None, faults=None, actuation=None) -> None:
+
+        """
+            Method to initialize the control loop of a robot.
+            Everything the loop needs at each time step is looked up once here: sensors, actuators, the handler
+            of each action and the perceptions, which are updated in place at every time step.
+
+            Args:
+                robot (Robot): robot controlled by the loop.
+                goal (str): string representing the goal of the plan followed by the robot. If None, the goal of the planner is used.
+                rate (float): optional frequency, in time steps per second, of the loop when it runs at fixed rate.
+                recorder (TraceRecorder): optional recorder of perceptions, action and energy of each time step.
+                clock (callable): function returning the current time in seconds.
+                sleep (callable): function waiting for a given number of seconds.
+                fusion (FusionStage): optional stage fusing the readings of the sensors into a belief on the position,
+                                      called after sensing with the displacement commanded since the previous time step.
+                lazy (bool): whether sensors are read on demand. Perceptions are then produced the first time they are
+                             read at a time step, and only the samples of the sensors the plan declares to read are
+                             attached, so a time step only reads the sensors the rules actually evaluated need.
+                             Since sensors are read in a different order, results differ from the ones of eager sensing.
+                metrics (Metrics): optional metrics counting plans, actions, pick ups, energy and latency of each time step.
+                                   Several loops can share the same metrics.
+                kinematics (Kinematics): optional continuous motion model of the robot, placed at the position and
+                                         orientation of the robot. Movements and turns are then integrated at the speeds
+                                         the actuators run at, their duration is added to the time of the mission, and a
+                                         movement whose footprint collides with an obstacle leaves the robot in its cell.
+                faults (FaultInjector): optional injection of faults in the sensors. The loop then runs in degraded mode:
+                                        sensors are read only when available, and unavailable ones are replaced by their
+                                        last known value, the position by the one predicted from the movements commanded,
+                                        and the directions, after a movement, by the way back only. The number of time steps
+                                        since each perception was read is added to the perceptions as 'staleness', and a
+                                        'trapped' action based on stale directions waits for fresh ones instead.
+                actuation (Actuation): optional command queues of the actuators of the robot, which then consume the
+                                       battery as they perform the commands, and the gripper retries a failed pick up.
+                                       Commands are waited for, since the next perceptions depend on them, so results
+                                       are reproducible. At fixed rate, a pick up is waited for one period at most, so
+                                       that the loop keeps its deadlines, and the following time steps sense and plan
+                                       again while the gripper is still trying.
+
+            Returns:
+                ControlLoop: new instance of the ControlLoop class.
+
+            Raises:
+                ValueError: if rate is not positive, faults are injected with lazy sensing, actuation is used with an energy model,
+                            or the footprint of the kinematics collides where the robot starts, so that it could never move.
+        """
+
+        if rate is not None and rate <= 0: raise ValueError(f"Rate must be positive, got {rate}.")
+        if faults is not None and lazy: raise ValueError("Faults cannot be injected with lazy sensing.")
+        if actuation is not None and robot._energy_model is not None: raise ValueError("Actuation cannot be used with an energy model, since actuators consume their flat energy cost.")
+
+        self._robot = robot
+        self._goal = goal if goal is not None else robot._planner._goal
+        self._rate = rate
+        self._recorder = recorder
+        self._clock = clock
+        self._sleep = sleep
+        self._fusion = fusion
+        self._metrics = metrics
+        self._tick_start = 0.0 # Time the current time step started, measured only with metrics
+        self._displacement = (0,0) # Displacement commanded since the last fusion
+        self._kinematics = kinematics
+        self._time = 0.0 # Time taken by movements and turns, measured only with kinematics
+        self._collisions = 0
+        self._collided = {} # Mask of the directions whose movement or turn collided at each position, kept for the whole mission
+
+        # Degraded mode: time steps since each perception was read, and values used while sensors are unavailable
+        self._faults = faults
+        self._staleness = dict.fromkeys(['position', 'target', 'directions'] + list(robot._sensors), 0)
+        self._predicted = None # Position predicted from the last one perceived and the movements commanded since
+        self._moved = (0,0) # Displacement commanded since the last time step
+        self._last_move = None # Direction of the last movement commanded
+        self._mask = None # Last mask of blocked directions read, and position where it was read
+        self._mask_position = None
+        self._degraded_ticks = 0
+
+        self._actuation = actuation
+        self._picking = None # Future of the pick up in progress with actuation
+
+        self._sensors = list(robot._sensors.items())
+        self._gps = robot._sensors['position']
+        self._camera = robot._sensors['camera']
+        self._motor = robot._actuators['motor']
+        self._servo = robot._actuators['servo']
+        self._gripper = robot._actuators['gripper']
+        self._planner = robot._planner
+
+        # With an energy model, actuators run at the energy-optimal speeds and consume what the model predicts
+        self._energy_model = robot._energy_model
+        self._speed = self._energy_model.get_optimal_speed() if self._energy_model is not None else 1.0
+        self._turning_speed = self._energy_model.get_optimal_turning_speed() if self._energy_model is not None else 1.0
+        self._payload = 0.0 # Weight of the object held by the robot
+        if kinematics is not None:
+            kinematics.set_pose(0, *self._gps.get_position(), HEADINGS[robot._orientation])
+            if kinematics.collides(kinematics.get_poses()[0]): raise ValueError(f"Footprint {kinematics._dimensions} collides at the start {self._gps.get_position()}, use a larger cell size.")
+
+        # Handler of each action: each direction either moves the robot or turns it, depending on its orientation
+        self._handlers = {direction: self._move_or_turn for direction in DIRECTIONS}
+        self._handlers['pick_up'] = self._pick_up
+        self._handlers['trapped'] = self._trapped
+
+        self._lazy = lazy
+        self._perceptions = LazyPerception() if lazy else Perception() # Perceptions of the current time step
+        self._table = None # Decision table whose dependencies the sources of lazy perceptions were set for
+        self._found = False
+        self._is_trapped = False
+        self._ticks = 0
+        self._deadline_misses = 0
+
+    def __str__(self) -> str:
+        return f"Control loop of robot {self._robot._name} with goal {self._goal} after {self._ticks} time steps."
+
+    def is_done(self) -> bool:
+        """
+            Method checking whether the mission is over: target is reached, battery expired or the robot is trapped.
+            With an energy model, battery is expired when it cannot pay for any movement.
+        """
+        if self._found or self._is_trapped: return True
+        if self._energy_model is not None: return self._robot._battery_level < self._energy_model.get_min_cost(self._payload)
+        return self._robot._battery_level <= 0
+
+    def step(self) -> str:
+        """
+            Method performing a single time step:
+                1. Get data from sensors.
+                2. Compute next action to perform through planner.
+                3. Execute action with actuators.
+
+            Returns:
+                action (str): string representing the action performed, None if no rule applied.
+        """
+
+        if self._metrics is not None: self._tick_start = self._clock()
+        robot, perceptions = self._robot, self._perceptions
+        planner = self._planner
+        if self._lazy: return self._step_lazy(robot, perceptions, planner)
+        if self._faults is not None: return self._step_degraded(robot, perceptions, planner)
+
+        # Get all sensors data, position and battery level
+        samples = perceptions.samples
+        for type, sensor in self._sensors: samples[type] = sensor.get_all_data()
+        perceptions.battery_level = robot._battery_level
+        perceptions.orientation = robot._orientation
+        if self._energy_model is not None: perceptions['payload'] = self._payload
+        position = perceptions.position = self._gps.get_position()
+
+        # Determine visibility and position of the target, and for each direction whether there are obstacles or not
+        water_is_visible, water_position = self._camera.target_visible(position)
+        if water_is_visible: robot._target_position = water_position
+        perceptions.target = robot._target_position
+        perceptions.blocked = self._camera.get_directions_mask(position)
+        if self._collided: perceptions.blocked |= self._collided.get(position, 0)
+        if self._fusion is not None:
+            self._fusion(perceptions, self._displacement)
+            self._displacement = (0,0)
+
+        # Determine next action according to plan and perceptions, and perform it
+        action = planner.select_action(planner.compile(self._goal), perceptions)
+        return self._act(robot, perceptions, action)
+
+    def _step_lazy(self, robot, perceptions:LazyPerception, planner) -> str:
+        """
+            Method performing a time step reading the sensors on demand, while the plan and the fusion stage evaluate the perceptions.
+        """
+
+        table = planner.compile(self._goal)
+        if table is not self._table: self._set_sources(table)
+        perceptions.begin_tick()
+        perceptions.battery_level = robot._battery_level
+        perceptions.orientation = robot._orientation
+        if self._energy_model is not None: perceptions['payload'] = self._payload
+        if self._fusion is not None:
+            self._fusion(perceptions, self._displacement)
+            self._displacement = (0,0)
+
+        action = planner.select_action(table, perceptions)
+        return self._act(robot, perceptions, action)
+
+    def _step_degraded(self, robot, perceptions:Perception, planner) -> str:
+        """
+            Method performing a time step reading only the available sensors, and falling back on the last known or
+            predicted values of the others instead of waiting for them.
+        """
+
+        faults, staleness = self._faults, self._staleness
+        faults.begin_tick(robot._sensors)
+        degraded = False
+
+        samples = perceptions.samples
+        for type, sensor in self._sensors:
+            if sensor._available:
+                samples[type] = faults.filter(type, 'samples', sensor.get_all_data())
+                staleness[type] = 0
+            else:
+                staleness[type] += 1 # Samples of the last reading are kept
+                degraded = True
+        perceptions.battery_level = robot._battery_level
+        perceptions.orientation = robot._orientation
+        if self._energy_model is not None: perceptions['payload'] = self._payload
+
+        # The camera sees from the true position of the robot, while the planner gets the perceived or predicted one
+        true_position = self._gps.get_position()
+        if self._predicted is not None: self._predicted = (self._predicted[0] + self._moved[0], self._predicted[1] + self._moved[1])
+        self._moved = (0,0)
+        if self._gps._available:
+            position = self._predicted = faults.filter('position', 'position', true_position)
+            staleness['position'] = 0
+        else:
+            position = self._predicted if self._predicted is not None else true_position
+            staleness['position'] += 1
+            degraded = True
+        perceptions.position = position
+
+        camera = self._camera
+        if camera._available:
+            water_is_visible, water_position = camera.target_visible(true_position)
+            if water_is_visible: robot._target_position = faults.filter('camera', 'target', water_position)
+            self._mask = faults.filter('camera', 'directions', camera.get_directions_mask(true_position))
+            self._mask_position = position
+            staleness['target'] = staleness['directions'] = 0
+            perceptions.blocked = self._mask
+        else:
+            staleness['target'] += 1
+            staleness['directions'] += 1
+            degraded = True
+            if self._mask is not None and position == self._mask_position: perceptions.blocked = self._mask
+            elif self._last_move is not None: perceptions.blocked = ALL_BLOCKED & ~BITS[OPPOSITES[self._last_move]]
+            else: perceptions.blocked = ALL_BLOCKED
+        if self._collided: perceptions.blocked |= self._collided.get(true_position, 0)
+        perceptions.target = robot._target_position
+        perceptions['staleness'] = staleness
+
+        if self._fusion is not None:
+            self._fusion(perceptions, self._displacement)
+            self._displacement = (0,0)
+
+        action = planner.select_action(planner.compile(self._goal), perceptions)
+        if action == 'trapped' and staleness['directions'] > 0: action = None # Wait for the camera before giving up
+        if degraded: self._degraded_ticks += 1
+        return self._act(robot, perceptions, action)
+
+    def _set_sources(self, table) -> None:
+        """
+            Method setting the sources of the lazy perceptions for a decision table.
+            Position, target and directions are always available, since the recorder and the fusion stage may read them.
+            Samples are attached only for the sensors the table declares to read, or for all of them if it does not declare.
+        """
+
+        perceptions = self._perceptions
+        perceptions.clear_sources()
+        perceptions.add_source(('position',), self._sense_position)
+        perceptions.add_source(('target',), self._sense_target)
+        perceptions.add_source(DIRECTIONS, self._sense_directions)
+
+        dependencies = table.get_dependencies()
+        samples = perceptions.samples
+        samples.clear()
+        for type, sensor in self._sensors:
+            if type in FIELDS or (dependencies is not None and type not in dependencies): continue
+            samples[type] = None
+            perceptions.add_source((type,), partial(self._sense_samples, type, sensor))
+        self._table = table
+
+    def _sense_samples(self, type:str, sensor, perceptions:LazyPerception) -> None:
+        """
+            Method reading the latest samples of a sensor.
+        """
+        perceptions.samples[type] = sensor.get_all_data()
+
+    def _sense_position(self, perceptions:LazyPerception) -> None:
+        """
+            Method reading the position of the robot from the gps.
+        """
+        perceptions.position = self._gps.get_position()
+
+    def _sense_target(self, perceptions:LazyPerception) -> None:
+        """
+            Method determining with the camera the visibility and position of the target.
+        """
+        water_is_visible, water_position = self._camera.target_visible(perceptions['position'])
+        if water_is_visible: self._robot._target_position = water_position
+        perceptions.target = self._robot._target_position
+
+    def _sense_directions(self, perceptions:LazyPerception) -> None:
+        """
+            Method determining with the camera for each direction whether there are obstacles or not.
+        """
+        position = perceptions['position']
+        perceptions.blocked = self._camera.get_directions_mask(position)
+        if self._collided: perceptions.blocked |= self._collided.get(position, 0)
+
+    def _act(self, robot, perceptions:Perception, action:str) -> str:
+        """
+            Method performing the action selected at a time step, updating the battery and recording the time step.
+        """
+
+        orientation = robot._orientation
+        handler = self._handlers.get(action) if action else None
+        consumed_energy = handler(action) if handler is not None else 0.0
+        if self._energy_model is not None and handler is not None:
+            consumed_energy = self._energy_model.action_cost(action, orientation, self._payload)
+            self._payload = self._energy_model.get_payload(self._gripper.held_object())
+
+        if self._actuation is None: robot.consume_energy(consumed_energy) # With actuation, commands consume it as they are performed
+        if self._recorder is not None: self._recorder.record(self._ticks, perceptions, orientation, action, consumed_energy, self._found)
+        self._ticks += 1
+        if self._metrics is not None: self._record_metrics(action, orientation, consumed_energy)
+        return action
+
+    def _record_metrics(self, action:str, orientation:str, consumed_energy:float) -> None:
+        """
+            Method recording in the metrics the time step just performed.
+        """
+
+        metrics = self._metrics
+        plan = self._planner.compile(self._goal).get_last_plan() if action is not None else None
+        if action == 'pick_up':
+            actuator = 'gripper'
+            # With actuation, only the time step collecting the outcome of a pick up counts it
+            if self._picking is None:
+                metrics.record_pick_up(self._found)
+                if self._found: metrics.record_goal(self._ticks)
+        elif action in OFFSETS: actuator = 'motor' if action == orientation else 'servo'
+        else: actuator = None
+        metrics.record_tick(plan, action, actuator, consumed_energy, self._clock() - self._tick_start)
+
+    def run(self, max_ticks:int=None) -> dict:
+        """
+            Method performing time steps until the mission is over, as fast as possible or at the rate of the loop.
+            At fixed rate, a time step ending after its deadline is counted as a deadline miss, and the following
+            time step starts immediately, at the next deadline not yet passed.
+
+            Args:
+                max_ticks (int): optional integer limiting the number of time steps performed by this call.
+
+            Returns:
+                result (dict): dictionary describing how the mission ended.
+        """
+
+        last = None if max_ticks is None else self._ticks + max_ticks
+        if self._rate is None:
+            while not self.is_done() and (last is None or self._ticks < last): self.step()
+            return self.get_result()
+
+        period, clock = 1.0 / self._rate, self._clock
+        deadline = clock() + period
+        while not self.is_done() and (last is None or self._ticks < last):
+            self.step()
+            now = clock()
+            if now > deadline:
+                self._deadline_misses += 1
+                deadline += period * (int((now - deadline) / period) + 1)
+            else:
+                self._sleep(deadline - now)
+                deadline += period
+        return self.get_result()
+
+    def get_result(self) -> dict:
+        """
+            Method to get the state of the mission.
+
+            Returns:
+                result (dict): dictionary with outcome, battery level, position of robot and target and number of time steps.
+                               With kinematics, it also has the time taken by movements and turns and the number of collisions,
+                               and with faults the number of time steps in which some sensor was not available.
+        """
+        result = {
+            'found': self._found,
+            'trapped': self._is_trapped,
+            'battery_level': self._robot._battery_level,
+            'position': self._gps.get_position(),
+            'target': self._robot._target_position,
+            'ticks': self._ticks
+        }
+        if self._kinematics is not None:
+            result['time'] = self._time
+            result['collisions'] = self._collisions
+        if self._faults is not None: result['degraded_ticks'] = self._degraded_ticks
+        return result
+
+    def get_perceptions(self) -> Perception:
+        """
+            Method to get the perceptions of the last time step. They are updated in place by the following ones.
+        """
+        return self._perceptions
+
+    def get_deadline_misses(self) -> int:
+        """
+            Method to get the number of time steps that ended after their deadline, when running at fixed rate.
+        """
+        return self._deadline_misses
+
+    def _move_or_turn(self, direction:str) -> float:
+        """
+            Method moving the robot forward if direction is its orientation, or turning it towards direction otherwise.
+            With kinematics, the robot stays where it is if its footprint collides, but still consumes the energy, and
+            the direction is perceived blocked at that position for the rest of the mission, so that the planner does
+            not try it again, and a robot whose every direction collided ends trapped.
+        """
+
+        robot, kinematics, actuation = self._robot, self._kinematics, self._actuation
+        if direction == robot._orientation:
+            consumed_energy = self._motor.move_forward(self._speed) if actuation is None else actuation.submit('motor', 'move_forward', self._speed).result()
+            if kinematics is not None and self._integrate(direction, kinematics.move(0, 1.0, self._motor._current_speed)): return consumed_energy
+            self._gps.update_position(direction)
+            self._displacement = self._moved = OFFSETS[direction]
+            self._last_move = direction
+            return consumed_energy
+        consumed_energy = self._servo.turn(direction, self._turning_speed) if actuation is None else actuation.submit('servo', 'turn', direction, self._turning_speed).result()
+        if kinematics is not None and self._integrate(direction, kinematics.turn_to(0, HEADINGS[direction], self._servo._current_turning_speed)): return consumed_energy
+        robot._orientation = direction
+        return consumed_energy
+
+    def _integrate(self, direction:str, motion:tuple) -> bool:
+        """
+            Method adding the duration of a movement or turn of the kinematics to the time of the mission, returning whether it collided.
+            A collision marks the direction as blocked at the position of the robot in the perceptions of the following time steps.
+        """
+        duration, collided = motion
+        self._time += duration
+        if collided:
+            self._collisions += 1
+            position = self._gps.get_position()
+            self._collided[position] = self._collided.get(position, 0) | BITS[direction]
+        return collided
+
+    def _pick_up(self, action:str) -> float:
+        """
+            Method picking up the water, ending the mission if it succeeds.
+            With actuation, the pick up, retried by the gripper in its own thread, is waited for. At fixed rate, it is
+            waited for one period at most, and a pick up action of a following time step waits for it again.
+        """
+
+        if self._actuation is None:
+            self._found, consumed_energy = self._gripper.pick_up('water')
+            return consumed_energy
+
+        picking = self._picking
+        if picking is None: picking = self._picking = self._actuation.submit('gripper', 'pick_up', 'water')
+        try: picking.result(None if self._rate is None else 1.0 / self._rate)
+        except TimeoutError: return 0.0
+        self._picking = None
+        self._found, consumed_energy = picking.result()
+        return consumed_energy
+
+    def _trapped(self, action:str) -> float:
+        """
+            Method ending the mission because the robot cannot move in any direction.
+        """
+        self._is_trapped = True
+        return 0.0
+
+if __name__ == "__main__":
+
+    import numpy as np
+
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    # Test step by step mode
+    loop = ControlLoop(build_robot(DEFAULT_CONFIG, np.random.default_rng(42)))
+    print(loop.step(), loop.step(), loop.get_perceptions()['position'])
+    print(loop)
+
+    # Test as fast as possible mode
+    print(loop.run())
+
+    # Test fixed rate mode, with a rate too high to be met
+    loop = ControlLoop(build_robot(DEFAULT_CONFIG, np.random.default_rng(42)), rate=1e6)
+    print(loop.run(max_ticks=100), loop.get_deadline_misses())
+    loop = ControlLoop(build_robot(DEFAULT_CONFIG, np.random.default_rng(42)), rate=1000)
+    print(loop.run(max_ticks=20), loop.get_deadline_misses())
+
+    # Test lazy sensing: only the perceptions read by the rules evaluated are produced
+    robot = build_robot(DEFAULT_CONFIG, np.random.default_rng(42))
+    loop = ControlLoop(robot, lazy=True)
+    print(robot._planner.get_dependencies('search'))
+    print(loop.step(), sorted(loop.get_perceptions().get_ready()), sorted(loop.get_perceptions().samples))
+    print(loop.run())
+
+    # Test kinematics in a dead end one cell wide, with a footprint 1.5 cells long: the robot drives up the corridor
+    # until its footprint hits the end wall, and cannot turn back without sweeping the walls. Both collisions are
+    # remembered, so every direction ends blocked and the mission ends trapped after two collisions, whatever the seed.
+    import os
+    import tempfile
+    from sense_plan_act.kinematics import Kinematics
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dead_end.txt')
+        with open(path, 'w') as file: file.write('#####\n' + '##.##\n' * 5)
+        for seed in range(3):
+            robot = build_robot(dict(DEFAULT_CONFIG, map={'path': path, 'start': [2, 1]}), np.random.default_rng(seed))
+            kinematics = Kinematics(1, robot._dimensions, robot._sensors['position']._grid_map)
+            result = ControlLoop(robot, kinematics=kinematics).run(max_ticks=2000)
+            print(result['trapped'], result['collisions'], result['ticks'], result['time'])
+
+    # Test actuation: pick ups retried by the gripper in its own thread while the loop keeps running
+    from sense_plan_act.actuation import Actuation
+    robot = build_robot(DEFAULT_CONFIG, np.random.default_rng(42))
+    with Actuation(robot, attempts=3) as actuation: print(ControlLoop(robot, actuation=actuation).run(max_ticks=2000))
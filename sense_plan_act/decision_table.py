@@ -0,0 +1,253 @@
+"""
+    Class representing a subsumption plan compiled into a flat, priority-ordered decision table.
+"""
+
+from sense_plan_act.perception import get_dependencies
+
+class DecisionTable:
+
+    def __init__(self, goal:str, plan:list, plans:dict) -> None:
+
+        """
+            Method to compile a plan into a decision table.
+            Rules whose action is the goal of another plan of the library are expanded in place, so that the
+            entries of the table are checked in the same order as the recursive walk of Planner.select_action.
+
+            Args:
+                goal (str): string representing the goal of the compiled plan.
+                plan (list): list of condition-action rules composing the plan.
+                plans (dict): library of plans used to expand sub-plans.
+
+            Returns:
+                DecisionTable: new instance of the DecisionTable class.
+
+            Raises:
+                ValueError: if the plan refers to itself through its sub-plans.
+        """
+
+        self._goal = goal
+        self._conditions = [] # Distinct conditions, evaluated at most once per time step
+        self._entries = [] # Tuples (guard, skips, action, plan goal)
+        self._uses = [] # Number of rules using each condition
+        self._last = [None] # Goal of the plan that produced the last action
+
+        self._expand(plan, plans, (), (), goal, (goal,))
+
+        # Table is turned into a Python function, falling back to interpreting it if nesting is too deep for the compiler
+        try: self._function = self._generate(plan, plans, goal)
+        except (SyntaxError, RecursionError, MemoryError): self._function = self._interpret
+        self.select = self._function # Bound directly, so a call of select does not go through the method
+
+    def __str__(self) -> str:
+        return f"Decision table for goal {self._goal} with {len(self._entries)} entries and {len(self._conditions)} conditions."
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _intern(self, condition) -> int:
+        """
+            Method returning the index of a condition, adding it to the table if not already present.
+        """
+        for index, known in enumerate(self._conditions):
+            if known is condition or known == condition:
+                self._uses[index] += 1
+                return index
+        self._conditions.append(condition)
+        self._uses.append(1)
+        return len(self._conditions) - 1
+
+    def _expand(self, plan:list, plans:dict, guard:tuple, skips:tuple, goal:str, stack:tuple) -> None:
+        """
+            Method appending to the table the entries of a plan, with the guard of the enclosing rules.
+            When a condition of the guard fails, evaluation jumps to the index stored at the same position in skips.
+            Skips of enclosing rules point to the end of the block of entries they expand to.
+        """
+
+        for condition, action in plan:
+            rule_guard = guard + (self._intern(condition),)
+            rule_skips = skips + (None,)
+            start = len(self._entries)
+
+            if action in plans:
+                if action in stack: raise ValueError(f"Plan {action} refers to itself through {' -> '.join(stack)}.")
+                self._expand(plans[action], plans, rule_guard, rule_skips, action, stack + (action,))
+            else:
+                self._entries.append((rule_guard, rule_skips, action, goal))
+
+            # A failing rule condition skips all the entries the rule expanded to
+            end = len(self._entries)
+            depth = len(guard)
+            for index in range(start, end):
+                entry_guard, entry_skips, entry_action, entry_goal = self._entries[index]
+                entry_skips = entry_skips[:depth] + (end,) + entry_skips[depth+1:]
+                self._entries[index] = (entry_guard, entry_skips, entry_action, entry_goal)
+
+    def _generate(self, plan:list, plans:dict, goal:str):
+        """
+            Method generating the source of a function equivalent to the table and compiling it.
+            Rules become nested if statements. Conditions used by more than one rule are kept in local variables,
+            so that they are evaluated at most once. Rules following an action that may return None inside a
+            sub-plan are placed in the else branch of that action, which gives control back to the enclosing plan.
+        """
+
+        namespace = {'last': self._last}
+        for index, condition in enumerate(self._conditions): namespace[f'condition_{index}'] = condition
+        shared = [index for index, uses in enumerate(self._uses) if uses > 1]
+
+        lines = ['def select(perceptions):']
+        if shared: lines.append('    ' + ' = '.join(f'c_{index}' for index in shared) + ' = None')
+        self._generate_block(plan, plans, goal, False, 1, lines, namespace)
+        lines.append('    return None')
+
+        exec(compile('\n'.join(lines), f'<decision table {goal}>', 'exec'), namespace)
+        return namespace['select']
+
+    def _generate_block(self, plan:list, plans:dict, goal:str, nested:bool, depth:int, lines:list, namespace:dict) -> None:
+        """
+            Method appending to lines the statements of a plan, indented at the given depth.
+        """
+
+        goal_name = f'goal_{len(namespace)}'
+        namespace[goal_name] = goal
+
+        for condition, action in plan:
+            indent = '    ' * depth
+            index = self._intern_index(condition)
+            if self._uses[index] > 1:
+                lines.append(f'{indent}if (c_{index} := bool(condition_{index}(perceptions)) if c_{index} is None else c_{index}):')
+            else:
+                lines.append(f'{indent}if condition_{index}(perceptions):')
+
+            body = indent + '    '
+            if action in plans:
+                self._generate_block(plans[action], plans, action, True, depth + 1, lines, namespace)
+                continue
+
+            action_name = f'action_{len(namespace)}'
+            namespace[action_name] = action
+            lines.append(f'{body}last[0] = {goal_name}')
+            if isinstance(action, str) or not nested:
+                lines.append(f'{body}return {action_name}' if isinstance(action, str) else f'{body}return {action_name}(perceptions)')
+            else:
+                lines.append(f'{body}result = {action_name}(perceptions)')
+                lines.append(f'{body}if result is not None: return result')
+                lines.append(f'{indent}else:')
+                depth += 1
+
+        if lines[-1].endswith(':'): lines.append('    ' * (depth + 1) + 'pass')
+
+    def _intern_index(self, condition) -> int:
+        """
+            Method returning the index of a condition already in the table.
+        """
+        for index, known in enumerate(self._conditions):
+            if known is condition or known == condition: return index
+        raise KeyError(condition)
+
+    def get_goal(self) -> str:
+        """
+            Method to get the goal of the compiled plan.
+        """
+        return self._goal
+
+    def get_last_plan(self) -> str:
+        """
+            Method to get the goal of the plan, or sub-plan, whose rule produced the last selected action.
+        """
+        return self._last[0]
+
+    def get_functions(self) -> list:
+        """
+            Method to get the conditions and the actions of the table, each action given as a string included.
+        """
+        return self._conditions + [entry[2] for entry in self._entries]
+
+    def is_deterministic(self) -> bool:
+        """
+            Method determining whether the action selected only depends on the perceptions, with no rule marked nondeterministic.
+        """
+        return all(getattr(function, 'deterministic', True) for function in self.get_functions())
+
+    def get_dependencies(self) -> frozenset:
+        """
+            Method to get the perceptions read by the conditions and actions of the table, as declared with depends_on.
+
+            Returns:
+                dependencies (frozenset): union of the perceptions read by every rule, None if any of them does not declare them.
+        """
+
+        dependencies = set()
+        for function in self.get_functions():
+            keys = get_dependencies(function)
+            if keys is None: return None
+            dependencies |= keys
+        return frozenset(dependencies)
+
+    def select(self, perceptions:dict):
+        """
+            Method selecting the action to perform given the perceptions just received.
+            Each condition is evaluated at most once and its result is reused by all the entries sharing it.
+            It is replaced, for each table, by the function compiled from the table.
+
+            Args:
+                perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
+
+            Returns:
+                action (str): string representing action to perform at current time step, None if no rule applies.
+        """
+        return self._function(perceptions)
+
+    def _interpret(self, perceptions:dict):
+        """
+            Method selecting the action by walking the entries of the table, used when the table cannot be compiled.
+        """
+
+        results = [None] * len(self._conditions)
+        entries = self._entries
+        conditions = self._conditions
+        n, index = len(entries), 0
+
+        while index < n:
+            guard, skips, action, goal = entries[index]
+
+            # Check the guard, jumping past the entries of the first failing rule
+            next_index = None
+            for position, condition in enumerate(guard):
+                result = results[condition]
+                if result is None: result = results[condition] = bool(conditions[condition](perceptions))
+                if not result:
+                    next_index = skips[position]
+                    break
+            if next_index is not None:
+                index = next_index
+                continue
+
+            self._last[0] = goal
+            if isinstance(action, str): return action
+            action = action(perceptions)
+            if action is not None: return action
+
+            # An action returning None gives control back to the rule following the enclosing sub-plan
+            index = skips[-2] if len(skips) > 1 else n
+
+        return None
+
+if __name__ == "__main__":
+
+    from sense_plan_act.planner import Planner
+
+    planner = Planner('search')
+
+    # Test compilation
+    table = DecisionTable('search', planner.get_plans()['search'], planner.get_plans())
+    print(table)
+
+    # Test selection
+    perceptions = {'battery_level':100, 'position': (10,10), 'left':'blocked', 'right':'free', 'forward':'free', 'backward':'blocked', 'target': (20,10)}
+    print(table.select(perceptions), table.get_last_plan())
+    perceptions['target'] = None
+    print(table.select(perceptions), table.get_last_plan())
+
+    # Test cyclic plans
+    try: DecisionTable('loop', [(planner.check_battery, 'loop')], {'loop': [(planner.check_battery, 'loop')]})
+    except ValueError as error: print(error)
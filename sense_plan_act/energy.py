@@ -0,0 +1,259 @@
+"""
+    Class representing the energy consumed by the actuators of the robot to perform actions.
+"""
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+
+# Quarter turns needed to go from each orientation (rows) to each direction (columns)
+QUARTER_TURNS = [
+    [0, 2, 1, 1],
+    [2, 0, 1, 1],
+    [1, 1, 0, 2],
+    [1, 1, 2, 0]
+]
+
+# Shares of the nominal energy cost of a movement spent against rolling resistance, against drag and
+# while idle, at unit speed and without payload. Rolling grows with weight, drag with the square of the
+# speed, and idle consumption with the time taken, so with the inverse of the speed.
+ROLLING_SHARE = 0.5
+DRAG_SHARE = 0.25
+IDLE_SHARE = 0.25
+
+# Lowest speed chosen as optimal, reached when nothing is consumed while idle
+MIN_SPEED = 0.1
+
+class EnergyModel:
+
+    def __init__(self, actuators:dict, weight:float, payloads:dict=None,
+                 rolling:float=ROLLING_SHARE, drag:float=DRAG_SHARE, idle:float=IDLE_SHARE) -> None:
+
+        """
+            Method to initialize the energy model of a robot.
+            The energy cost of each actuator is its nominal cost, the one of a unit movement, or of a quarter turn,
+            at unit speed without payload. The cost of every action is precomputed, at the energy-optimal speed,
+            for every orientation of the robot.
+
+            Args:
+                actuators (dict): dictionary of Actuator objects, with a motor, a servo and a gripper.
+                weight (float): float representing the weight of the robot.
+                payloads (dict): optional dictionary associating to each object the robot can hold its weight.
+                rolling (float): share of the nominal cost spent against rolling resistance.
+                drag (float): share of the nominal cost spent against drag.
+                idle (float): share of the nominal cost spent while idle.
+
+            Returns:
+                EnergyModel: new instance of the EnergyModel class.
+
+            Raises:
+                ValueError: if weight is not positive, or the shares are negative or do not sum to one.
+        """
+
+        if weight <= 0: raise ValueError(f"Weight must be positive, got {weight}.")
+        if min(rolling, drag, idle) < 0 or abs(rolling + drag + idle - 1) > 1e-9:
+            raise ValueError(f"Shares must be non-negative and sum to one, got {rolling}, {drag}, {idle}.")
+
+        motor, servo, gripper = actuators['motor'], actuators['servo'], actuators['gripper']
+        self._move_cost = motor._energy_cost
+        self._turn_cost = servo._energy_cost
+        self._pick_cost = gripper._energy_cost
+        self._weight = weight
+        self._payloads = payloads if payloads is not None else {}
+        self._rolling, self._drag, self._idle = rolling, drag, idle
+
+        self._speed = self._optimal_speed(motor._max_speed)
+        self._turning_speed = self._optimal_speed(servo._max_turning_speed)
+        self._tables = {} # Cost tables for each payload weight
+        self._limits = {} # Costs of the cheapest movement and of the most expensive action, for each payload weight
+
+    def __str__(self) -> str:
+        return f"Energy model with optimal speed {self._speed:.2f} and turning speed {self._turning_speed:.2f}."
+
+    def _optimal_speed(self, max_speed:float) -> float:
+        """
+            Method computing the speed minimizing the energy per unit of movement, limited by the maximum speed.
+            Drag and idle consumption only depend on speed, so the optimal speed does not depend on the payload.
+        """
+        if self._drag == 0: return max_speed
+        return min(max_speed, max(MIN_SPEED, (self._idle / (2 * self._drag)) ** (1 / 3)))
+
+    def _factor(self, speed:float, payload:float) -> float:
+        """
+            Method computing the factor multiplying the nominal cost of a movement at a given speed and payload.
+        """
+        return self._rolling * (self._weight + payload) / self._weight + self._drag * speed * speed + self._idle / speed
+
+    def get_optimal_speed(self) -> float:
+        """
+            Method to get the energy-optimal speed for moving forward.
+        """
+        return self._speed
+
+    def get_optimal_turning_speed(self) -> float:
+        """
+            Method to get the energy-optimal speed for turning.
+        """
+        return self._turning_speed
+
+    def get_payload(self, object:str) -> float:
+        """
+            Method to get the weight of an object held by the robot, zero if it holds nothing or the object is unknown.
+        """
+        return self._payloads.get(object, 0.0) if object is not None else 0.0
+
+    def move_cost(self, speed:float, distance:float=1.0, payload:float=0.0) -> float:
+        """
+            Method computing the energy needed to move forward.
+
+            Args:
+                speed (float): speed of the movement.
+                distance (float): length of the movement.
+                payload (float): weight of the object held by the robot.
+
+            Returns:
+                energy (float): energy consumed by the motor.
+
+            Raises:
+                ValueError: if speed is not positive.
+        """
+        if speed <= 0: raise ValueError(f"Speed must be positive, got {speed}.")
+        return self._move_cost * distance * self._factor(speed, payload)
+
+    def turn_cost(self, orientation:str, direction:str, speed:float, payload:float=0.0) -> float:
+        """
+            Method computing the energy needed to turn from an orientation to a direction.
+
+            Args:
+                orientation (str): current orientation of the robot.
+                direction (str): direction in which the robot will end its rotation.
+                speed (float): speed of the rotation.
+                payload (float): weight of the object held by the robot.
+
+            Returns:
+                energy (float): energy consumed by the servo.
+
+            Raises:
+                ValueError: if speed is not positive.
+        """
+        if speed <= 0: raise ValueError(f"Speed must be positive, got {speed}.")
+        quarter_turns = QUARTER_TURNS[DIRECTIONS.index(orientation)][DIRECTIONS.index(direction)]
+        return self._turn_cost * quarter_turns * self._factor(speed, payload)
+
+    def pick_up_cost(self) -> float:
+        """
+            Method to get the energy needed to pick up an object.
+        """
+        return self._pick_cost
+
+    def get_table(self, payload:float=0.0) -> list:
+        """
+            Method to get the cost of every action, at the optimal speeds, for every orientation.
+            Tables are computed the first time they are requested for a payload, and then reused.
+
+            Args:
+                payload (float): weight of the object held by the robot.
+
+            Returns:
+                table (list): list associating to each orientation, indexed as DIRECTIONS, a dictionary of action costs.
+                              Moving in the direction of the orientation is a movement, any other direction is a turn.
+        """
+
+        table = self._tables.get(payload)
+        if table is None:
+            table = []
+            for orientation in DIRECTIONS:
+                costs = {direction: self.turn_cost(orientation, direction, self._turning_speed, payload) for direction in DIRECTIONS}
+                costs[orientation] = self.move_cost(self._speed, 1.0, payload)
+                costs['pick_up'] = self._pick_cost
+                costs['trapped'] = 0.0
+                table.append(costs)
+            self._tables[payload] = table
+        return table
+
+    def action_cost(self, action:str, orientation:str, payload:float=0.0) -> float:
+        """
+            Method to get the cost of an action, at the optimal speeds, looking it up in the cost table.
+
+            Args:
+                action (str): string representing the action.
+                orientation (str): current orientation of the robot.
+                payload (float): weight of the object held by the robot.
+
+            Returns:
+                energy (float): energy consumed to perform the action, zero for unknown actions.
+        """
+        return self.get_table(payload)[DIRECTIONS.index(orientation)].get(action, 0.0)
+
+    def step_cost(self, direction:str, orientation:str, payload:float=0.0) -> float:
+        """
+            Method to get the cost of moving by one cell towards a direction, turning first if it is not the orientation.
+
+            Args:
+                direction (str): direction of the movement.
+                orientation (str): current orientation of the robot.
+                payload (float): weight of the object held by the robot.
+
+            Returns:
+                energy (float): energy consumed by turning, if needed, and moving.
+        """
+        table = self.get_table(payload)
+        move = table[DIRECTIONS.index(direction)][direction]
+        return move if direction == orientation else table[DIRECTIONS.index(orientation)][direction] + move
+
+    def can_afford(self, action:str, orientation:str, battery_level:float, payload:float=0.0) -> bool:
+        """
+            Method determining whether the battery can pay for an action.
+        """
+        return self.action_cost(action, orientation, payload) <= battery_level
+
+    def _get_limits(self, payload:float) -> tuple:
+        """
+            Method to get the costs of the cheapest movement and of the most expensive action, computed once for each payload.
+        """
+        limits = self._limits.get(payload)
+        if limits is None:
+            table = self.get_table(payload)
+            limits = self._limits[payload] = (
+                min((costs[direction] for costs in table for direction in DIRECTIONS if costs[direction] > 0), default=0.0),
+                max(cost for costs in table for cost in costs.values()))
+        return limits
+
+    def get_min_cost(self, payload:float=0.0) -> float:
+        """
+            Method to get the cost of the cheapest action moving or turning the robot.
+        """
+        return self._get_limits(payload)[0]
+
+    def get_max_cost(self, payload:float=0.0) -> float:
+        """
+            Method to get the cost of the most expensive action: with a battery at least this level, every action is affordable.
+        """
+        return self._get_limits(payload)[1]
+
+if __name__ == "__main__":
+
+    from sense_plan_act.actuator import Actuator
+
+    actuators = {'motor': Actuator('motor', 10.0, 2.0, 1.0), 'gripper': Actuator('gripper', 2.0, 1.0, 0.2),
+                 'servo': Actuator('servo', 3.0, 3.0, 0.5)}
+    model = EnergyModel(actuators, 20, {'water': 5.0})
+    print(model)
+
+    # Test costs against the nominal ones, at unit speed
+    print(model.move_cost(1.0), model.turn_cost('forward', 'left', 1.0), model.turn_cost('forward', 'backward', 1.0))
+
+    # Test effect of speed and payload
+    for speed in (0.5, model.get_optimal_speed(), 1.0, 2.0): print(f"{speed:.2f} {model.move_cost(speed):.3f}")
+    print(model.move_cost(1.0, payload=model.get_payload('water')))
+
+    # Test cost tables and affordability
+    print(model.get_table()[DIRECTIONS.index('forward')])
+    print(model.can_afford('backward', 'forward', 0.8), model.get_min_cost())
+    print(model.step_cost('left', 'forward'), model.step_cost('forward', 'forward'))
+
+    # Test missions with and without energy model
+    import numpy as np
+
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot, run_mission
+    for config in (DEFAULT_CONFIG, dict(DEFAULT_CONFIG, energy={'payloads': {'water': 5.0}})):
+        results = [run_mission(build_robot(config, np.random.default_rng(seed)), 'search') for seed in range(100)]
+        print(sum(result['found'] for result in results), sum(result['battery_level'] for result in results) / len(results))
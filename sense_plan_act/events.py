@@ -0,0 +1,269 @@
+"""
+    Classes implementing the logging of the events generated by sensors and actuators.
+"""
+
+import queue
+import struct
+import sys
+import threading
+import time
+
+# Levels of the events, as in the logging module
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+DISABLED = 100
+
+# Kinds of events
+MOVE_FORWARD = 0
+TURN = 1
+PICK_UP = 2
+PICK_UP_DONE = 3
+PICK_UP_FAILED = 4
+PUT_DOWN = 5
+PUT_DOWN_SKIPPED = 6
+SENSOR_READ = 7
+
+# Human-readable messages of each kind of event, formatted with value and detail of the event
+MESSAGES = {
+    MOVE_FORWARD: "Moving forward at speed {value}.",
+    TURN: "Turning {detail} at speed {value}.",
+    PICK_UP: "Picking up {detail} from the environment.",
+    PICK_UP_DONE: "Operation completed successfully. Now holding {detail}",
+    PICK_UP_FAILED: "Operation failed, retry.",
+    PUT_DOWN: "Put down {detail} completed.",
+    PUT_DOWN_SKIPPED: "Nothing to put down. Operation skipped.",
+    SENSOR_READ: "Sensor {source} collected {value:.0f} samples."
+}
+
+class NullSink:
+    """
+        Sink discarding all the events.
+    """
+
+    def write(self, events:list) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class ConsoleSink:
+
+    def __init__(self, stream=None) -> None:
+
+        """
+            Method to initialize a sink printing events as human-readable messages.
+
+            Args:
+                stream (file): stream where messages are written. If None, standard output is used.
+
+            Returns:
+                ConsoleSink: new instance of the ConsoleSink class.
+        """
+
+        self._stream = stream
+
+    def write(self, events:list) -> None:
+        stream = self._stream if self._stream is not None else sys.stdout
+        for _, _, kind, source, value, detail in events:
+            stream.write(MESSAGES[kind].format(source=source, value=value, detail=detail) + '\n')
+
+    def close(self) -> None:
+        stream = self._stream if self._stream is not None else sys.stdout
+        stream.flush()
+
+class BinaryFileSink:
+
+    # Each record is: timestamp, level, kind, source id, value, detail id. Ids are 32 bits, so that logs with many
+    # distinct details, such as positions, never run out of them
+    RECORD = struct.Struct('<dBBIdI')
+    # Strings are stored once, in records with this kind, followed by their utf-8 bytes
+    STRING = 255
+
+    def __init__(self, path:str) -> None:
+
+        """
+            Method to initialize a sink writing events in a compact binary file.
+            Sources and details are interned: each distinct string is written only once.
+
+            Args:
+                path (str): path of the file to write.
+
+            Returns:
+                BinaryFileSink: new instance of the BinaryFileSink class.
+        """
+
+        self._file = open(path, 'wb')
+        self._strings = {None: 0}
+
+    def _intern(self, string) -> int:
+        """
+            Method returning the id of a string, writing it to the file the first time it is seen.
+        """
+
+        index = self._strings.get(string)
+        if index is None:
+            index = self._strings[string] = len(self._strings)
+            data = str(string).encode()
+            self._file.write(self.RECORD.pack(0.0, 0, self.STRING, index, float(len(data)), 0) + data)
+        return index
+
+    def write(self, events:list) -> None:
+        pack, intern = self.RECORD.pack, self._intern
+        records = [pack(timestamp, level, kind, intern(source), float(value), intern(detail))
+                   for timestamp, level, kind, source, value, detail in events]
+        self._file.write(b''.join(records))
+
+    def close(self) -> None:
+        self._file.close()
+
+def read_binary_log(path:str) -> list:
+    """
+        Function reading the events written by a BinaryFileSink.
+
+        Args:
+            path (str): path of the file to read.
+
+        Returns:
+            events (list): list of tuples (timestamp, level, kind, source, value, detail).
+    """
+
+    record = BinaryFileSink.RECORD
+    strings = {0: None}
+    events = []
+    with open(path, 'rb') as file: data = file.read()
+
+    offset = 0
+    while offset < len(data):
+        timestamp, level, kind, source, value, detail = record.unpack_from(data, offset)
+        offset += record.size
+        if kind == BinaryFileSink.STRING:
+            strings[source] = data[offset:offset+int(value)].decode()
+            offset += int(value)
+        else:
+            events.append((timestamp, level, kind, strings[source], value, strings[detail]))
+    return events
+
+class EventLog:
+
+    def __init__(self, sink=None, level:int=INFO, capacity:int=1024, async_flush:bool=False) -> None:
+
+        """
+            Method to initialize an event log.
+            Events are kept in a bounded buffer and written to the sink when the buffer is full or on flush.
+            Events below the level of the log are discarded as soon as they are emitted.
+            The log is thread-safe: sensors and actuators running in different threads, such as the workers of an
+            Actuation, can share it, and their events are buffered and written in the order they were emitted.
+
+            Args:
+                sink: object with write and close methods receiving the events. If None, events are discarded.
+                level (int): minimum level of the events kept.
+                capacity (int): maximum number of events kept in memory before writing them to the sink.
+                async_flush (bool): True if events are written to the sink by a background thread.
+
+            Returns:
+                EventLog: new instance of the EventLog class.
+        """
+
+        self._sink = sink if sink is not None else NullSink()
+        self.level = level if sink is not None else DISABLED
+        self._capacity = capacity
+        self._buffer = []
+        self._lock = threading.RLock() # Guards the buffer and the order of the writes, emit flushing while holding it
+
+        self._queue = None
+        self._writer = None
+        if async_flush:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def __str__(self) -> str:
+        return f"Event log with level {self.level} and {len(self._buffer)} buffered events."
+
+    def emit(self, level:int, kind:int, source:str, value:float=0.0, detail:str=None) -> None:
+        """
+            Method recording an event.
+
+            Args:
+                level (int): level of the event.
+                kind (int): kind of the event, one of the constants of this module.
+                source (str): string representing the sensor or actuator that generated the event.
+                value (float): float associated to the event, for example a speed.
+                detail (str): optional string associated to the event, for example a direction.
+        """
+
+        if level < self.level: return
+        with self._lock:
+            self._buffer.append((time.time(), level, kind, source, value, detail))
+            if len(self._buffer) >= self._capacity: self.flush()
+
+    def flush(self) -> None:
+        """
+            Method writing the buffered events to the sink, directly or through the background thread.
+        """
+
+        with self._lock:
+            if not self._buffer: return
+            events, self._buffer = self._buffer, []
+            if self._queue is not None: self._queue.put(events)
+            else: self._sink.write(events)
+
+    def _write_loop(self) -> None:
+        """
+            Method run by the background thread, writing batches of events until it receives None.
+        """
+
+        while True:
+            events = self._queue.get()
+            if events is None: break
+            self._sink.write(events)
+
+    def close(self) -> None:
+        """
+            Method flushing all the events and closing the sink.
+        """
+
+        self.flush()
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._sink.close()
+
+# Log used by sensors and actuators when none is given: it discards every event
+NULL_LOG = EventLog()
+
+if __name__ == "__main__":
+
+    import os
+    import tempfile
+    import timeit
+
+    # Test console sink
+    log = EventLog(ConsoleSink(), INFO, capacity=2)
+    log.emit(INFO, MOVE_FORWARD, 'motor', 1.0)
+    log.emit(DEBUG, SENSOR_READ, 'camera', 1)
+    log.emit(INFO, TURN, 'servo', 0.5, 'left')
+    log.close()
+
+    # Test binary sink with asynchronous flush
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'events.bin')
+        log = EventLog(BinaryFileSink(path), DEBUG, async_flush=True)
+        for _ in range(1000): log.emit(INFO, TURN, 'servo', 0.5, 'left')
+        log.close()
+        events = read_binary_log(path)
+        print(len(events), events[0][2:], os.path.getsize(path))
+
+        # Test that events emitted by many threads at once are neither lost nor duplicated
+        from concurrent.futures import ThreadPoolExecutor
+        log = EventLog(BinaryFileSink(path), DEBUG, capacity=7)
+        with ThreadPoolExecutor(8) as pool: list(pool.map(lambda index: log.emit(INFO, TURN, 'servo', float(index)), range(10000)))
+        log.close()
+        values = sorted(event[4] for event in read_binary_log(path))
+        print(values == [float(index) for index in range(10000)])
+
+    # Test cost of disabled events
+    print(f"{timeit.timeit(lambda: NULL_LOG.emit(INFO, MOVE_FORWARD, 'motor', 1.0), number=100000) * 10:.3f} us per disabled event")
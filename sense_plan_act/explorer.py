@@ -0,0 +1,199 @@
+"""
+    Class representing a frontier-based exploration strategy, usable as action of the condition-action rules of a plan.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from sense_plan_act.grid_map import DIRECTIONS
+
+class FrontierExplorer:
+
+    # Perceptions read at each call, as declared by the depends_on decorator for the rules of the Planner
+    deterministic = False # Choices depend on the knowledge gathered at previous calls, so they are never cached
+    dependencies = frozenset(['position', 'orientation', *DIRECTIONS])
+
+    def __init__(self, grid_map=None, shape:tuple=None, origin:tuple=(0,0)) -> None:
+
+        """
+            Method to initialize the explorer.
+            The explorer remembers, in a bitset, the cells visited by the robot, and keeps the frontier: the cells
+            perceived free next to a visited cell but not visited yet. At each time step it moves to an adjacent
+            frontier cell if there is one, and otherwise follows a shortest path, through visited cells, to the
+            nearest frontier cell.
+
+            Args:
+                grid_map (GridMap): optional map of the world, of which only the size is used.
+                shape (tuple): number of cells along x and y of the world, used when no map is given.
+                origin (tuple): x,y position of the first cell of the world, used when no map is given.
+
+            Returns:
+                FrontierExplorer: new instance of the FrontierExplorer class.
+
+            Raises:
+                ValueError: if neither a map nor a shape is given.
+        """
+
+        if grid_map is None and shape is None: raise ValueError("Explorer needs either a map or the shape of the world.")
+
+        self._width, self._height = grid_map.get_shape() if grid_map is not None else shape
+        self._origin = (0,0) if grid_map is not None else origin
+
+        # Cells are stored flat, surrounded by a border, so that neighbours are index offsets, as in PathPlanner
+        self._stride = self._height + 2
+        size = (self._width + 2) * self._stride
+        self._visited = bytearray((size + 7) // 8) # One bit for each cell
+        self._n_visited = 0
+        self._frontier = set() # Flat indices of the cells known to be free and not visited yet
+        self._steps = {'left': -self._stride, 'right': self._stride, 'forward': 1, 'backward': -1}
+        self._directions = {step: direction for direction, step in self._steps.items()}
+        self._path = deque() # Cells to go through to reach the frontier cell chosen last
+
+    def __str__(self) -> str:
+        return f"Explorer on {self._width}x{self._height} cells, {self._n_visited} visited and {len(self._frontier)} in the frontier."
+
+    def __call__(self, perceptions:dict) -> str:
+        """
+            Method determining the direction for next move towards the nearest unexplored cell.
+
+            Args:
+                perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
+
+            Returns:
+                direction (str): string defining the direction for next move of the robot, 'trapped' if all
+                    directions are blocked, None if the robot is outside the world.
+        """
+
+        cell = self._index(perceptions['position'])
+        if cell is None: return None
+        self._visit(cell, perceptions)
+
+        # Prefer an adjacent cell never visited, keeping the orientation when possible to save turns
+        orientation = perceptions.get('orientation')
+        free = [direction for direction in DIRECTIONS if perceptions[direction] == 'free' and self._inside(cell + self._steps[direction])]
+        unvisited = [direction for direction in free if not self._is_visited(cell + self._steps[direction])]
+        if unvisited:
+            self._path.clear()
+            return orientation if orientation in unvisited else unvisited[0]
+
+        # Otherwise go on towards the frontier cell chosen before, or towards the nearest one
+        path = self._path
+        if path and path[0] == cell: path.popleft()
+        if not path or path[-1] not in self._frontier or self._directions.get(path[0] - cell) not in free:
+            path.clear()
+            path.extend(self._nearest_frontier(cell))
+        if path: return self._directions[path[0] - cell]
+
+        # Without a reachable frontier, the world is explored: any free direction is fine
+        if free: return free[0]
+        return 'trapped' if all(perceptions[direction] != 'free' for direction in DIRECTIONS) else None
+
+    def _index(self, position:tuple) -> int:
+        """
+            Method returning the flat index of a position, None if it is outside the world.
+        """
+        x, y = position[0] - self._origin[0], position[1] - self._origin[1]
+        if not (0 <= x < self._width and 0 <= y < self._height): return None
+        return (x+1) * self._stride + (y+1)
+
+    def _inside(self, index:int) -> bool:
+        """
+            Method determining if a flat index belongs to the world and not to its border.
+        """
+        x, y = divmod(index, self._stride)
+        return 1 <= x <= self._width and 1 <= y <= self._height
+
+    def _is_visited(self, index:int) -> bool:
+        """
+            Method reading the bit of a cell in the visited bitset.
+        """
+        return self._visited[index >> 3] >> (index & 7) & 1
+
+    def _visit(self, cell:int, perceptions:dict) -> None:
+        """
+            Method marking a cell as visited and updating the frontier with the states of its neighbours.
+        """
+
+        if not self._is_visited(cell):
+            self._visited[cell >> 3] |= 1 << (cell & 7)
+            self._n_visited += 1
+            self._frontier.discard(cell)
+
+        for direction, step in self._steps.items():
+            neighbour = cell + step
+            if perceptions[direction] == 'free':
+                if self._inside(neighbour) and not self._is_visited(neighbour): self._frontier.add(neighbour)
+            else: self._frontier.discard(neighbour)
+
+    def _nearest_frontier(self, cell:int) -> list:
+        """
+            Method finding with a breadth-first search, through visited cells, the shortest path to a frontier cell.
+
+            Returns:
+                path (list): flat indices of the cells of the path, excluding the starting one, empty if no frontier cell is reachable.
+        """
+
+        if not self._frontier: return []
+        parents = {cell: None}
+        queue = deque([cell])
+        while queue:
+            index = queue.popleft()
+            for step in self._directions:
+                neighbour = index + step
+                if neighbour in parents: continue
+                if neighbour in self._frontier:
+                    path = [neighbour]
+                    while index != cell:
+                        path.append(index)
+                        index = parents[index]
+                    return path[::-1]
+                if self._is_visited(neighbour):
+                    parents[neighbour] = index
+                    queue.append(neighbour)
+        return []
+
+    def get_visited_count(self) -> int:
+        """
+            Method to get the number of cells visited by the robot.
+        """
+        return self._n_visited
+
+    def get_frontier(self) -> list:
+        """
+            Method to get the x,y positions of the cells in the frontier.
+        """
+        return [(index // self._stride - 1 + self._origin[0], index % self._stride - 1 + self._origin[1]) for index in self._frontier]
+
+    def get_visited(self) -> np.ndarray:
+        """
+            Method to get the visited cells as a boolean array, indexed as visited[x,y].
+        """
+        size = (self._width + 2) * self._stride
+        bits = np.unpackbits(np.frombuffer(bytes(self._visited), dtype=np.uint8), bitorder='little')[:size]
+        return bits.reshape(self._width + 2, self._stride)[1:-1, 1:-1].astype(bool)
+
+if __name__ == "__main__":
+
+    from sense_plan_act.grid_map import GridMap
+    from sense_plan_act.control_loop import ControlLoop
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    grid_map = GridMap.random(60, 60, 0.2, np.random.default_rng(1), target=(59,59))
+
+    # Test coverage of the map per unit of battery, with the default wonder plan and with the explorer
+    for explore in (False, True):
+        robot = build_robot(DEFAULT_CONFIG, np.random.default_rng(0))
+        for sensor in robot._sensors.values(): sensor._grid_map = grid_map
+        if explore:
+            explorer = FrontierExplorer(grid_map)
+            robot._planner.add_plan('wonder', [(robot._planner.check_battery, explorer)])
+        loop = ControlLoop(robot)
+        cells = set()
+        while not loop.is_done():
+            loop.step()
+            cells.add(robot._sensors['position'].get_position())
+        print(f"Explorer: {explore}, cells visited: {len(cells)}, per unit of battery: {len(cells) / (100 - robot._battery_level):.2f}")
+
+    print(explorer)
+    print(explorer.get_visited().sum() == explorer.get_visited_count(), len(explorer.get_frontier()))
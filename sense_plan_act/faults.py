@@ -0,0 +1,202 @@
+"""
+    Class representing the injection of faults in the sensors of a robot: dropouts, latency spikes, stuck values and noise bursts.
+"""
+
+import time
+
+import numpy as np
+
+FAULTS = ('dropout', 'latency', 'stuck', 'burst')
+
+# Settings of the faults of a sensor and their default values. Probabilities are the ones of a fault starting at a time step.
+DEFAULT_PROFILE = {
+    'dropout': 0.0,         # Probability that the sensor becomes unavailable
+    'dropout_ticks': 5,     # Time steps the sensor stays unavailable
+    'latency': 0.0,         # Probability that reading the sensor takes longer
+    'latency_spike': 1e-3,  # Additional time, in seconds, taken by a read with a latency spike
+    'stuck': 0.0,           # Probability that the sensor gets stuck on its current values
+    'stuck_ticks': 10,      # Time steps the sensor stays stuck
+    'burst': 0.0,           # Probability of a burst of noise
+    'burst_ticks': 5,       # Time steps a burst of noise lasts
+    'burst_noise': 1.0      # Standard deviation of the Gaussian noise added to samples and positions during a burst
+}
+
+class FaultInjector:
+
+    def __init__(self, profiles:dict, rng:np.random.Generator=None, sleep=time.sleep) -> None:
+
+        """
+            Method to initialize the injection of faults in the sensors of a robot.
+            At each time step, begin_tick draws for each sensor which faults start: a dropout makes the sensor
+            unavailable, through Sensor._available, until it is restored some time steps later, and a latency spike
+            delays the time step. Readings passed through filter are then kept at the values they had when the
+            sensor got stuck, or perturbed with Gaussian noise during a burst.
+
+            Args:
+                profiles (dict): dictionary associating to the name of each sensor, as in Robot._sensors, a dictionary
+                                 with some of the settings of DEFAULT_PROFILE. Sensors not listed never fail.
+                rng (np.random.Generator): optional random generator drawing the faults. If None, a new one is created.
+                sleep (callable): function waiting for a given number of seconds, called for latency spikes.
+
+            Returns:
+                FaultInjector: new instance of the FaultInjector class.
+
+            Raises:
+                ValueError: if a setting is unknown, a probability is not between 0 and 1, durations are not positive
+                            integers, or latency spike and noise are negative.
+        """
+
+        self._profiles = {}
+        for name, profile in profiles.items():
+            unknown = [key for key in profile if key not in DEFAULT_PROFILE]
+            if unknown: raise ValueError(f"Unknown fault settings {', '.join(unknown)} for sensor {name}.")
+            profile = dict(DEFAULT_PROFILE, **profile)
+            for fault in FAULTS:
+                if not 0 <= profile[fault] <= 1: raise ValueError(f"Probability of {fault} of sensor {name} must be between 0 and 1, got {profile[fault]}.")
+            for key in ('dropout_ticks', 'stuck_ticks', 'burst_ticks'):
+                if not isinstance(profile[key], int) or profile[key] < 1: raise ValueError(f"{key} of sensor {name} must be a positive integer, got {profile[key]}.")
+            if profile['latency_spike'] < 0 or profile['burst_noise'] < 0: raise ValueError(f"Latency spike and noise of sensor {name} must not be negative.")
+            self._profiles[name] = profile
+
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._sleep = sleep
+
+        # Remaining time steps of the faults in progress of each sensor, and values of the stuck readings
+        self._dropout = dict.fromkeys(self._profiles, 0)
+        self._stuck = dict.fromkeys(self._profiles, 0)
+        self._burst = dict.fromkeys(self._profiles, 0)
+        self._stuck_values = {} # Values of the readings of stuck sensors, keyed by sensor name and kind of reading
+        self._counts = dict.fromkeys(FAULTS, 0) # Faults started since the injector was created
+        self._delay = 0.0 # Total time added by latency spikes
+
+    def __str__(self) -> str:
+        return f"Fault injector on sensors {', '.join(self._profiles)}, faults started: {self._counts}."
+
+    def begin_tick(self, sensors:dict) -> float:
+        """
+            Method starting and ending the faults of the sensors at the beginning of a time step.
+
+            Args:
+                sensors (dict): dictionary of Sensor objects of the robot, keyed by name.
+
+            Returns:
+                delay (float): time, in seconds, added to the time step by latency spikes.
+        """
+
+        delay = 0.0
+        counts = self._counts
+        for name, profile in self._profiles.items():
+            sensor = sensors.get(name)
+            if sensor is None: continue
+            dropout, latency, stuck, burst = self._rng.random(4)
+
+            if self._dropout[name] > 0:
+                self._dropout[name] -= 1
+                if self._dropout[name] == 0: sensor.restore_sensor()
+            if self._dropout[name] == 0 and dropout < profile['dropout']:
+                self._dropout[name] = profile['dropout_ticks']
+                sensor.set_unavailable()
+                counts['dropout'] += 1
+
+            if self._stuck[name] > 0:
+                self._stuck[name] -= 1
+                if self._stuck[name] == 0: self._release(name)
+            if self._stuck[name] == 0 and stuck < profile['stuck']:
+                self._stuck[name] = profile['stuck_ticks']
+                counts['stuck'] += 1
+
+            if self._burst[name] > 0: self._burst[name] -= 1
+            if self._burst[name] == 0 and burst < profile['burst']:
+                self._burst[name] = profile['burst_ticks']
+                counts['burst'] += 1
+
+            if latency < profile['latency'] and sensor._available:
+                delay += profile['latency_spike']
+                counts['latency'] += 1
+
+        if delay > 0:
+            self._sleep(delay)
+            self._delay += delay
+        return delay
+
+    def _release(self, name:str) -> None:
+        """
+            Method forgetting the stuck readings of a sensor.
+        """
+        for key in [key for key in self._stuck_values if key[0] == name]: del self._stuck_values[key]
+
+    def filter(self, name:str, kind:str, value):
+        """
+            Method applying to a reading the faults in progress of the sensor it comes from.
+            A stuck sensor returns the value of its first reading of each kind since it got stuck. During a burst,
+            Gaussian noise is added to arrays of samples and to positions, rounded to the nearest cell.
+
+            Args:
+                name (str): name of the sensor, as in Robot._sensors.
+                kind (str): kind of the reading, such as 'samples', 'position' or 'directions', since a sensor may give many.
+                value: value of the reading.
+
+            Returns:
+                value: value of the reading with the faults applied.
+        """
+
+        if self._stuck.get(name, 0) > 0:
+            key = (name, kind)
+            if key in self._stuck_values: return self._stuck_values[key]
+            self._stuck_values[key] = value.copy() if isinstance(value, np.ndarray) else value
+            return value
+
+        if self._burst.get(name, 0) > 0 and value is not None:
+            noise = self._profiles[name]['burst_noise']
+            if isinstance(value, np.ndarray): return value + self._rng.normal(0.0, noise, value.shape)
+            if isinstance(value, tuple): return tuple(int(round(coordinate + error)) for coordinate, error in zip(value, self._rng.normal(0.0, noise, len(value))))
+        return value
+
+    def is_faulty(self, name:str) -> bool:
+        """
+            Method determining whether a sensor has a fault in progress.
+        """
+        return self._dropout.get(name, 0) > 0 or self._stuck.get(name, 0) > 0 or self._burst.get(name, 0) > 0
+
+    def get_counts(self) -> dict:
+        """
+            Method to get the number of faults of each kind started since the injector was created.
+        """
+        return dict(self._counts)
+
+    def get_delay(self) -> float:
+        """
+            Method to get the total time, in seconds, added by latency spikes.
+        """
+        return self._delay
+
+if __name__ == "__main__":
+
+    from sense_plan_act.control_loop import ControlLoop
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    # Test faults of a single sensor, without waiting for latency spikes
+    from sense_plan_act.sensor import Sensor
+    gps = Sensor('position', 1.0, 1, np.random.default_rng(0))
+    faults = FaultInjector({'position': {'dropout': 0.2, 'dropout_ticks': 2, 'stuck': 0.1, 'burst': 0.1, 'latency': 0.1}},
+                           np.random.default_rng(1), sleep=lambda seconds: None)
+    readings = []
+    for tick in range(20):
+        faults.begin_tick({'position': gps})
+        gps.update_position('forward')
+        readings.append(faults.filter('position', 'position', gps.get_position()) if gps.is_available() else None)
+    print(readings)
+    print(faults, f"{faults.get_delay() * 1e3:.0f} ms")
+
+    # Test how success and throughput of missions degrade as the camera and the gps fail more often
+    for dropout in (0.0, 0.02, 0.05, 0.1, 0.2):
+        profiles = {'camera': {'dropout': dropout, 'stuck': dropout / 4, 'latency': dropout / 10, 'latency_spike': 1e-4},
+                    'position': {'dropout': dropout, 'burst': dropout / 4}}
+        results, start = [], time.perf_counter()
+        for seed in range(100):
+            rng = np.random.default_rng(seed)
+            results.append(ControlLoop(build_robot(DEFAULT_CONFIG, rng), faults=FaultInjector(profiles, rng)).run(max_ticks=1000))
+        elapsed = time.perf_counter() - start
+        ticks = sum(result['ticks'] for result in results)
+        print(f"Dropout {dropout}: success {np.mean([result['found'] for result in results]):.2f}, "
+              f"degraded {sum(result['degraded_ticks'] for result in results) / ticks:.2f} of {ticks} time steps, {ticks / elapsed:.0f} time steps/s")
@@ -0,0 +1,260 @@
+"""
+    Class simulating a whole fleet of robots executing the search plan at the same time.
+"""
+
+import numpy as np
+
+from sense_plan_act.sensor import TARGET_POSITION, TARGET_PROBABILITY, BLOCKED_PROBABILITY
+
+# Actions are encoded as integers: directions are indexed as in Planner._directions
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+PICK_UP = 4
+TRAPPED = 5
+NO_ACTION = -1
+
+# Displacement on the x,y plane associated to each direction, as in Sensor.update_position
+OFFSETS = np.array([(-1,0), (1,0), (0,1), (0,-1)], dtype=np.int64)
+
+class FleetSimulator:
+
+    def __init__(self, n_robots:int, sample_sizes:dict, move_cost:float, turn_cost:float, pick_cost:float,
+                 rng:np.random.Generator=None) -> None:
+
+        """
+            Method to initialize a fleet of identical robots, all starting in the initial state of a Robot.
+
+            Args:
+                n_robots (int): integer representing the number of robots in the fleet.
+                sample_sizes (dict): dictionary associating to each sensor type its maximum number of samples.
+                move_cost (float): float representing the energy consumed by the motor to move forward.
+                turn_cost (float): float representing the energy consumed by the servo to turn.
+                pick_cost (float): float representing the energy consumed by the gripper to pick up.
+                rng (np.random.Generator): random generator used for all the extractions.
+
+            Returns:
+                FleetSimulator: new instance of the FleetSimulator class.
+
+            Raises:
+                ValueError: if n_robots is not positive.
+        """
+
+        if n_robots <= 0: raise ValueError(f"Fleet needs at least one robot, got {n_robots}.")
+
+        self._n_robots = n_robots
+        self._rng = rng if rng is not None else np.random.default_rng()
+
+        self._move_cost = move_cost
+        self._turn_cost = turn_cost
+        self._pick_cost = pick_cost
+
+        # Samples of all sensors are drawn in one call and then split in per-sensor views
+        self._sample_sizes = dict(sample_sizes)
+        self._n_samples = sum(self._sample_sizes.values())
+        self._samples = np.empty((0, self._n_samples))
+
+        # State of the robots, one row for each robot
+        self._positions = np.zeros((n_robots, 2), dtype=np.int64)
+        self._orientations = np.full(n_robots, DIRECTIONS.index('forward'), dtype=np.int64)
+        self._battery_levels = np.full(n_robots, 100.0)
+        self._target_known = np.zeros(n_robots, dtype=bool)
+        self._targets = np.zeros((n_robots, 2), dtype=np.int64)
+
+        # Stop conditions and statistics
+        self._found = np.zeros(n_robots, dtype=bool)
+        self._trapped = np.zeros(n_robots, dtype=bool)
+        self._active = np.ones(n_robots, dtype=bool)
+        self._ticks = np.zeros(n_robots, dtype=np.int64)
+
+    @classmethod
+    def from_robot(cls, robot, n_robots:int, rng:np.random.Generator=None) -> 'FleetSimulator':
+        """
+            Method to build a fleet of copies of a given robot, as configured in main.py.
+
+            Args:
+                robot (Robot): robot whose sensors and actuators are replicated.
+                n_robots (int): integer representing the number of robots in the fleet.
+                rng (np.random.Generator): random generator used for all the extractions.
+
+            Returns:
+                fleet (FleetSimulator): new instance of the FleetSimulator class.
+        """
+
+        sample_sizes = {type: sensor._max_samples for type, sensor in robot._sensors.items()}
+        return cls(n_robots, sample_sizes,
+                   robot._actuators['motor']._energy_cost,
+                   robot._actuators['servo']._energy_cost,
+                   robot._actuators['gripper']._energy_cost,
+                   rng)
+
+    def __str__(self) -> str:
+        return f"Fleet of {self._n_robots} robots, {int(self._active.sum())} still active."
+
+    def get_samples(self) -> dict:
+        """
+            Method to get the sensor samples drawn at last time step for the robots still active at that step.
+
+            Returns:
+                samples (dict): dictionary associating to each sensor type an array of shape (active robots, max samples).
+        """
+
+        samples, start = {}, 0
+        for type, size in self._sample_sizes.items():
+            samples[type] = self._samples[:, start:start+size]
+            start += size
+        return samples
+
+    def step(self) -> int:
+        """
+            Method performing a single Sense-Plan-Act time step for all the active robots of the fleet.
+            Extractions are performed in the same order as the scalar loop of main.py, so that a fleet of
+            one robot reproduces exactly the Robot/Planner path when sensors and gripper share the same generator.
+
+            Returns:
+                n_active (int): number of robots that took part to the time step.
+        """
+
+        active = np.flatnonzero(self._active)
+        n = active.size
+        if n == 0: return 0
+
+        # Sense: sensor samples, target visibility and state of the four directions
+        self._samples = self._rng.uniform(1, 100, (n, self._n_samples))
+        visible = self._rng.binomial(1, TARGET_PROBABILITY, n).astype(bool)
+        blocked = self._rng.binomial(1, BLOCKED_PROBABILITY, (n, len(DIRECTIONS))).astype(bool)
+
+        self._targets[active[visible]] = TARGET_POSITION
+        self._target_known[active[visible]] = True
+
+        positions = self._positions[active]
+        targets = self._targets[active]
+        target_known = self._target_known[active]
+        battery = self._battery_levels[active]
+        free = ~blocked
+
+        # Plan: rules of 'search' evaluated as masks, in order of priority
+        has_battery = battery != 0
+        reached = target_known & (np.abs(positions - targets).sum(axis=1) == 1)
+        go = ~reached & target_known & has_battery
+        wonder = ~reached & ~target_known & has_battery
+
+        actions = np.full(n, NO_ACTION, dtype=np.int64)
+        actions[reached] = PICK_UP
+
+        # 'wonder': first free direction in fixed order
+        any_free = free.any(axis=1)
+        first_free = np.where(any_free, free.argmax(axis=1), TRAPPED)
+        actions[wonder] = first_free[wonder]
+
+        # 'go': free direction minimizing manhattan distance to target, ties broken in fixed order
+        if go.any():
+            neighbours = positions[go, None, :] + OFFSETS[None, :, :]
+            distances = np.abs(neighbours - targets[go, None, :]).sum(axis=2)
+            order = np.argsort(distances, axis=1, kind='stable')
+            sorted_free = np.take_along_axis(free[go], order, axis=1)
+            best = order[np.arange(order.shape[0]), sorted_free.argmax(axis=1)]
+            actions[go] = np.where(sorted_free.any(axis=1), best, TRAPPED)
+
+        # Act: move, turn, pick up or stop as trapped
+        energy = np.zeros(n)
+        orientations = self._orientations[active]
+        is_direction = (actions >= 0) & (actions < len(DIRECTIONS))
+
+        move = is_direction & (actions == orientations)
+        energy[move] = self._move_cost
+        self._positions[active[move]] += OFFSETS[actions[move]]
+
+        turn = is_direction & ~move
+        energy[turn] = self._turn_cost
+        self._orientations[active[turn]] = actions[turn]
+
+        pick = actions == PICK_UP
+        if pick.any():
+            energy[pick] = self._pick_cost
+            self._found[active[pick]] = self._rng.random(int(pick.sum())) < 0.5
+
+        self._trapped[active[actions == TRAPPED]] = True
+
+        self._battery_levels[active] = battery - energy
+        self._ticks[active] += 1
+        self._active[active] = (self._battery_levels[active] > 0) & ~self._found[active] & ~self._trapped[active]
+
+        return n
+
+    def run(self, max_ticks:int=None) -> dict:
+        """
+            Method simulating the fleet until every robot has found the target, is trapped or has no battery left.
+
+            Args:
+                max_ticks (int): optional integer limiting the number of time steps simulated.
+
+            Returns:
+                results (dict): dictionary of per-robot arrays describing the final state of the fleet.
+        """
+
+        ticks = 0
+        while (max_ticks is None or ticks < max_ticks) and self.step() > 0: ticks += 1
+        return self.get_results()
+
+    def get_results(self) -> dict:
+        """
+            Method to get the current state of all the robots of the fleet.
+
+            Returns:
+                results (dict): dictionary of per-robot arrays describing the state of the fleet.
+        """
+
+        return {
+            'position': self._positions.copy(),
+            'orientation': self._orientations.copy(),
+            'battery_level': self._battery_levels.copy(),
+            'target_known': self._target_known.copy(),
+            'target': self._targets.copy(),
+            'found': self._found.copy(),
+            'trapped': self._trapped.copy(),
+            'ticks': self._ticks.copy()
+        }
+
+if __name__ == "__main__":
+
+    from sense_plan_act.robot import Robot
+    from sense_plan_act.sensor import Sensor
+    from sense_plan_act.planner import Planner
+    from sense_plan_act.actuator import Actuator
+
+    # Test equivalence with the scalar path of main.py for a fleet of a single robot
+    seed = 7
+    rng = np.random.default_rng(seed)
+    sensors = {'position': Sensor('position', 1.0, 10, rng), 'camera': Sensor('camera', 0.0, 1, rng),
+               'battery_level': Sensor('battery_level', 0.0, 1, rng)}
+    actuators = {'motor': Actuator('motor', 10.0, 2.0, 1.0), 'gripper': Actuator('gripper', 2.0, 1.0, 0.2, rng),
+                 'servo': Actuator('servo', 3.0, 3.0, 0.5)}
+    robot = Robot('Scalar', (1.5, 0.3), 20, sensors, actuators, Planner('search'))
+
+    camera, gps = sensors['camera'], sensors['position']
+    found = trapped = False
+    while robot._battery_level > 0 and not found and not trapped:
+        perceptions = {type: sensor.get_all_data() for type, sensor in sensors.items()}
+        perceptions['battery_level'] = robot._battery_level
+        is_visible, position = camera.target_visible()
+        robot._target_position = position if is_visible else robot._target_position
+        perceptions.update(camera.get_directions_state())
+        perceptions['target'] = robot._target_position
+        perceptions['position'] = gps.get_position()
+        action = robot._planner.select_action(robot._planner.compute_subsumption_plan('search'), perceptions)
+        if action == robot._orientation: energy = actuators['motor'].move_forward(1.0); gps.update_position(action)
+        elif action in DIRECTIONS: energy = actuators['servo'].turn(action, 1.0); robot._orientation = action
+        elif action == 'pick_up': found, energy = actuators['gripper'].pick_up('water')
+        else: trapped, energy = True, 0.0
+        robot.set_battery_level(robot._battery_level - energy)
+
+    fleet = FleetSimulator.from_robot(robot, 1, np.random.default_rng(seed))
+    results = fleet.run()
+    print(results['position'][0], gps.get_position())
+    print(results['battery_level'][0], robot._battery_level)
+    print(results['found'][0], found, results['trapped'][0], trapped)
+
+    # Test a large fleet
+    fleet = FleetSimulator(10000, {'position': 10, 'camera': 1}, 1.0, 0.5, 0.2, np.random.default_rng(0))
+    results = fleet.run()
+    print(fleet)
+    print(f"Found: {results['found'].mean()}, trapped: {results['trapped'].mean()}, ticks: {results['ticks'].mean()}")
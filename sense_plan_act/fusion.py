@@ -0,0 +1,345 @@
+"""
+    Classes implementing the fusion of sensor readings into a belief on the position of the robot.
+"""
+
+import numpy as np
+
+from sense_plan_act.perception import Perception, directions_mask
+
+# Probability that the camera perceives the state of a direction wrongly
+DIRECTION_ERROR = 0.05
+
+class KalmanFilter:
+
+    def __init__(self, n_filters:int=1, initial=(0,0), motion_noise:float=0.1, measurement_noise:float=1.0,
+                 initial_variance:float=1.0) -> None:
+
+        """
+            Method to initialize a batch of Kalman filters estimating x,y positions, one for each robot.
+            All the filters are updated together with array operations, so a whole fleet costs about as much as a robot.
+
+            Args:
+                n_filters (int): integer representing the number of filters in the batch.
+                initial: initial x,y position, either the same for all filters or an array with one row for each filter.
+                motion_noise (float): standard deviation of the error of each movement.
+                measurement_noise (float): standard deviation of the error of position measurements.
+                initial_variance (float): variance of the initial position along each axis.
+
+            Returns:
+                KalmanFilter: new instance of the KalmanFilter class.
+
+            Raises:
+                ValueError: if n_filters is not positive.
+        """
+
+        if n_filters <= 0: raise ValueError(f"Number of filters must be positive, got {n_filters}.")
+
+        self._mean = np.empty((n_filters, 2))
+        self._mean[:] = initial
+        self._covariance = np.zeros((n_filters, 2, 2))
+        self._covariance[:, [0, 1], [0, 1]] = initial_variance
+        self._motion_variance = motion_noise ** 2
+        self._measurement_variance = measurement_noise ** 2
+
+    def __str__(self) -> str:
+        return f"Batch of {len(self._mean)} Kalman filters."
+
+    def predict(self, displacement) -> None:
+        """
+            Method moving the estimates by the displacement commanded to the robots, increasing their uncertainty.
+
+            Args:
+                displacement: x,y displacement, either the same for all filters or an array with one row for each filter.
+        """
+        self._mean += displacement
+        self._covariance[:, [0, 1], [0, 1]] += self._motion_variance
+
+    def update(self, position, ranges=None, blocked=None, max_range:float=None) -> None:
+        """
+            Method correcting the estimates with position measurements.
+            Ranges and directions, which are not linear in the position, are only used by the ParticleFilter.
+
+            Args:
+                position: measured x,y position, either the same for all filters or an array with one row for each filter.
+        """
+
+        if position is None: return
+        covariance = self._covariance
+        innovation = np.asarray(position, dtype=np.float64) - self._mean
+        gain = covariance @ np.linalg.inv(covariance + self._measurement_variance * np.eye(2))
+        self._mean += np.einsum('nij,nj->ni', gain, np.broadcast_to(innovation, self._mean.shape))
+        self._covariance = covariance - gain @ covariance
+
+    def get_mean(self) -> np.ndarray:
+        """
+            Method to get the estimated position of every robot, one row for each filter.
+        """
+        return self._mean
+
+    def get_covariance(self) -> np.ndarray:
+        """
+            Method to get the covariance of the estimate of every robot, one 2x2 matrix for each filter.
+        """
+        return self._covariance
+
+    def get_estimate(self, index:int=0) -> tuple:
+        """
+            Method to get estimated position and covariance of a robot.
+        """
+        return self._mean[index], self._covariance[index]
+
+class ParticleFilter:
+
+    def __init__(self, grid_map, n_particles:int=2000, rng:np.random.Generator=None, initial=(0,0), motion_noise:float=0.1,
+                 measurement_noise:float=1.0, range_noise:float=1.0, initial_spread:float=0.5) -> None:
+
+        """
+            Method to initialize a particle filter estimating the x,y position of a robot on a map.
+            Each particle is a possible position. Particles are moved with the robot and weighted by how well the
+            readings of gps, ultra sound and camera expected from their position match the actual ones.
+            All the operations act on the whole array of particles at once.
+
+            Args:
+                grid_map (GridMap): map of the world, used to compute the readings expected from each particle.
+                n_particles (int): integer representing the number of particles.
+                rng (np.random.Generator): random generator used for noise and resampling.
+                initial (tuple): initial x,y position of the robot.
+                motion_noise (float): standard deviation of the error of each movement.
+                measurement_noise (float): standard deviation of the error of position measurements.
+                range_noise (float): standard deviation of the error of range measurements.
+                initial_spread (float): standard deviation of the initial particles around the initial position.
+
+            Returns:
+                ParticleFilter: new instance of the ParticleFilter class.
+
+            Raises:
+                ValueError: if n_particles is not positive.
+        """
+
+        if n_particles <= 0: raise ValueError(f"Number of particles must be positive, got {n_particles}.")
+
+        self._grid_map = grid_map
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._motion_noise = motion_noise
+        self._measurement_noise = measurement_noise
+        self._range_noise = range_noise
+        self._particles = np.asarray(initial, dtype=np.float64) + self._rng.normal(0.0, initial_spread, (n_particles, 2))
+        self._weights = np.full(n_particles, 1.0 / n_particles)
+        self._resamplings = 0
+
+    def __str__(self) -> str:
+        return f"Particle filter with {len(self._particles)} particles, resampled {self._resamplings} times."
+
+    def predict(self, displacement) -> None:
+        """
+            Method moving every particle by the displacement commanded to the robot, plus the noise of the movement.
+
+            Args:
+                displacement: x,y displacement of the robot.
+        """
+        self._particles += displacement
+        self._particles += self._rng.normal(0.0, self._motion_noise, self._particles.shape)
+
+    def _cells(self) -> tuple:
+        """
+            Method returning the indices, in the padded grid of the map, of the cells of the particles.
+            Particles outside the map fall on its blocked border.
+        """
+        width, height = self._grid_map.get_shape()
+        cells = np.rint(self._particles).astype(np.int64) + 1
+        return np.clip(cells[:, 0], 0, width + 1), np.clip(cells[:, 1], 0, height + 1)
+
+    def update(self, position=None, ranges:np.ndarray=None, blocked:int=None, max_range:float=np.inf) -> None:
+        """
+            Method weighting the particles with the readings of the sensors, and resampling them when
+            most of the weight is concentrated on few of them. Particles inside obstacles get no weight.
+
+            Args:
+                position: measured x,y position, None if not available.
+                ranges (np.ndarray): measured distances of the nearest obstacle in each direction, None if not available.
+                blocked (int): mask of the directions perceived blocked, None if not available.
+                max_range (float): maximum distance measured by the range sensor.
+        """
+
+        x, y = self._cells()
+        padded = self._grid_map._padded
+        with np.errstate(divide='ignore'): log_weights = np.log(self._weights)
+        log_weights[padded[x, y] != 0] = -np.inf
+
+        if position is not None:
+            deviation = self._particles - np.asarray(position, dtype=np.float64)
+            log_weights -= np.einsum('ij,ij->i', deviation, deviation) / (2 * self._measurement_noise ** 2)
+
+        if ranges is not None:
+            expected = np.minimum(self._grid_map.get_range_table()[:, x, y], max_range)
+            deviation = expected - np.asarray(ranges)[:, None]
+            log_weights -= np.einsum('ij,ij->j', deviation, deviation) / (2 * self._range_noise ** 2)
+
+        if blocked is not None:
+            mismatches = np.zeros(len(x), dtype=np.int64)
+            for bit, (dx, dy) in enumerate(((-1,0), (1,0), (0,1), (0,-1))):
+                expected = padded[np.clip(x + dx, 0, padded.shape[0] - 1), np.clip(y + dy, 0, padded.shape[1] - 1)] != 0
+                mismatches += expected != bool(blocked & (1 << bit))
+            log_weights += mismatches * np.log(DIRECTION_ERROR)
+
+        best = log_weights.max()
+        if not np.isfinite(best):
+            # No particle is consistent with the readings: start again around the measured position
+            center = position if position is not None else self._particles.mean(axis=0)
+            self._particles = np.asarray(center, dtype=np.float64) + self._rng.normal(0.0, self._measurement_noise, self._particles.shape)
+            self._weights.fill(1.0 / len(self._weights))
+            return
+
+        weights = np.exp(log_weights - best)
+        weights /= weights.sum()
+        self._weights = weights
+        if 1.0 / np.dot(weights, weights) < len(weights) / 2: self._resample()
+
+    def _resample(self) -> None:
+        """
+            Method drawing a new set of particles, with systematic resampling, in proportion to their weights.
+        """
+        n = len(self._weights)
+        cumulative = np.cumsum(self._weights)
+        cumulative[-1] = 1.0
+        indices = np.searchsorted(cumulative, (self._rng.random() + np.arange(n)) / n)
+        self._particles = self._particles[indices]
+        self._weights = np.full(n, 1.0 / n)
+        self._resamplings += 1
+
+    def get_particles(self) -> np.ndarray:
+        """
+            Method to get the x,y positions of the particles.
+        """
+        return self._particles
+
+    def get_estimate(self, index:int=0) -> tuple:
+        """
+            Method to get the weighted mean and covariance of the particles.
+        """
+        mean = self._weights @ self._particles
+        deviation = self._particles - mean
+        return mean, (deviation.T * self._weights) @ deviation
+
+class FusionStage:
+
+    def __init__(self, robot, filter, replace_position:bool=True) -> None:
+
+        """
+            Method to initialize the stage fusing, between sensing and planning, the readings of the sensors of a robot.
+            Readings are taken from the gps, named 'position', from the ultra sound, if any, and from the directions
+            perceived by the camera. The belief is added to the perceptions as 'belief', a tuple (mean, covariance).
+
+            Args:
+                robot (Robot): robot whose sensors are read.
+                filter (KalmanFilter or ParticleFilter): filter keeping the belief on the position of the robot.
+                replace_position (bool): True if the position perceived by the planner is replaced by the estimated one.
+
+            Returns:
+                FusionStage: new instance of the FusionStage class.
+        """
+
+        self._gps = robot._sensors['position']
+        self._ultra_sound = robot._sensors.get('ultra_sound')
+        self._filter = filter
+        self._replace_position = replace_position
+
+    def __str__(self) -> str:
+        return f"Fusion stage with: {self._filter}"
+
+    def __call__(self, perceptions:dict, displacement:tuple=(0,0)) -> np.ndarray:
+        """
+            Method updating the belief with the movement since the last time step and the latest readings.
+
+            Args:
+                perceptions (dict): perceptions of the current time step, updated with the belief.
+                displacement (tuple): x,y displacement commanded to the robot since the last time step.
+
+            Returns:
+                mean (np.ndarray): estimated x,y position of the robot.
+        """
+
+        self._filter.predict(displacement)
+
+        # Readings are simulated from the true position of the robot, known to its gps, skipping the sensors not available
+        position = self._gps.get_position()
+        ranges, max_range = None, np.inf
+        if self._ultra_sound is not None and self._ultra_sound._available:
+            ranges, max_range = self._ultra_sound.measure_ranges(position), self._ultra_sound._range
+        blocked = perceptions.get_blocked() if isinstance(perceptions, Perception) else directions_mask(perceptions)
+        self._filter.update(self._gps.measure_position(position) if self._gps._available else None, ranges, blocked, max_range)
+
+        mean, covariance = self._filter.get_estimate()
+        perceptions['belief'] = (mean, covariance)
+        if self._replace_position: perceptions['position'] = (int(round(mean[0])), int(round(mean[1])))
+        return mean
+
+if __name__ == "__main__":
+
+    import time
+
+    from sense_plan_act.grid_map import GridMap
+    from sense_plan_act.sensor import Sensor
+
+    rng = np.random.default_rng(0)
+    grid_map = GridMap.random(40, 40, 0.2, rng)
+
+    # Test batched Kalman filter on a fleet of robots moving forward with a noisy gps
+    kalman = KalmanFilter(10000, measurement_noise=2.0)
+    truth = np.zeros((10000, 2))
+    start = time.perf_counter()
+    for _ in range(50):
+        truth[:, 1] += 1
+        kalman.predict((0, 1))
+        kalman.update(truth + rng.normal(0.0, 2.0, truth.shape))
+    print(kalman, f"{(time.perf_counter() - start) / 50 * 1e3:.2f} ms per step")
+    print(f"Error: {np.abs(kalman.get_mean() - truth).mean():.3f}, gps error: {np.abs(rng.normal(0.0, 2.0, truth.shape)).mean():.3f}")
+
+    # Test particle filter fusing a noisy gps, the ultra sound and the camera along a random walk
+    gps = Sensor('position', 1.0, 1, rng, grid_map, noise=2.0)
+    ultra_sound = Sensor('ultra_sound', 10.0, 1, rng, grid_map, noise=0.5)
+    free = np.argwhere(grid_map.get_cells() == 0)
+    position = tuple(int(value) for value in free[0])
+    gps.set_position(position)
+    particles = ParticleFilter(grid_map, 2000, rng, position, range_noise=0.5, measurement_noise=2.0)
+    kalman = KalmanFilter(1, position, measurement_noise=2.0)
+
+    errors = {'gps': [], 'kalman': [], 'particles': []}
+    elapsed = 0.0
+    offsets = {'left': (-1,0), 'right': (1,0), 'forward': (0,1), 'backward': (0,-1)}
+    for _ in range(200):
+        state = grid_map.get_directions_state(position)
+        direction = rng.choice([direction for direction, value in state.items() if value == 'free'] or ['left'])
+        displacement = offsets[direction] if state[direction] == 'free' else (0,0)
+        position = (position[0] + displacement[0], position[1] + displacement[1])
+        gps.set_position(position)
+        measurement = gps.measure_position()
+
+        kalman.predict(displacement)
+        kalman.update(measurement)
+        start = time.perf_counter()
+        particles.predict(displacement)
+        particles.update(measurement, ultra_sound.measure_ranges(position), grid_map.get_directions_mask(position), 10.0)
+        elapsed += time.perf_counter() - start
+
+        errors['gps'].append(np.hypot(*(measurement - position)))
+        errors['kalman'].append(np.hypot(*(kalman.get_estimate()[0] - position)))
+        errors['particles'].append(np.hypot(*(particles.get_estimate()[0] - position)))
+
+    print(particles, f"{elapsed / 200 * 1e6:.0f} us per step")
+    print({source: round(float(np.mean(values[20:])), 3) for source, values in errors.items()})
+
+    # Test the stage in the control loop of a robot with a noisy gps
+    from sense_plan_act.control_loop import ControlLoop
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    grid_map.set_target((int(free[-1][0]), int(free[-1][1])))
+    robot = build_robot(DEFAULT_CONFIG, rng)
+    robot._sensors['position']._noise = 2.0
+    for sensor in robot._sensors.values():
+        sensor._grid_map = grid_map
+        sensor.set_position(tuple(int(value) for value in free[0]))
+    stage = FusionStage(robot, ParticleFilter(grid_map, 2000, rng, tuple(free[0]), measurement_noise=2.0))
+    loop = ControlLoop(robot, fusion=stage)
+    for _ in range(30): loop.step()
+    print(loop.get_perceptions()['position'], robot._sensors['position'].get_position())
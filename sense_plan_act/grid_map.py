@@ -0,0 +1,287 @@
+"""
+    Class representing the map of the world as an occupancy grid.
+"""
+
+import numpy as np
+
+FREE = 0
+BLOCKED = 1
+
+# Displacement on the x,y plane associated to each direction, as in Sensor.update_position
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+OFFSETS = {'left': (-1,0), 'right': (1,0), 'forward': (0,1), 'backward': (0,-1)}
+
+class GridMap:
+
+    def __init__(self, cells:np.ndarray, target:tuple=None) -> None:
+
+        """
+            Method to initialize a map from an occupancy grid.
+            Cells are indexed as cells[x,y], so that positions of sensors can be used directly as indices.
+            Anything outside the grid is considered blocked.
+
+            Args:
+                cells (np.ndarray): 2D array whose non-zero values mark blocked cells.
+                target (tuple): optional x,y position of the target.
+
+            Returns:
+                GridMap: new instance of the GridMap class.
+
+            Raises:
+                ValueError: if cells is not a 2D array.
+        """
+
+        cells = np.asarray(cells)
+        if cells.ndim != 2: raise ValueError(f"Occupancy grid must be 2D, got {cells.ndim} dimensions.")
+
+        # Grid is surrounded by a border of blocked cells, so neighbours never need bound checks
+        width, height = cells.shape
+        self._padded = np.ones((width+2, height+2), dtype=np.uint8)
+        self._padded[1:-1, 1:-1] = cells != 0
+        self._cells = self._padded[1:-1, 1:-1]
+
+        self._target = None
+        self._distances = None # Euclidean distance of each cell from the target
+        self._ranges = None # Free cells before the nearest obstacle in each direction, computed when first needed
+        if target is not None: self.set_target(target)
+
+    def __str__(self) -> str:
+        width, height = self._cells.shape
+        return f"Map of {width}x{height} cells, {int(self._cells.sum())} blocked. Target is at: {self._target}"
+
+    @classmethod
+    def random(cls, width:int, height:int, density:float, rng:np.random.Generator=None,
+               target:tuple=None, start:tuple=(0,0)) -> 'GridMap':
+        """
+            Method generating a map with obstacles placed at random.
+
+            Args:
+                width (int): integer representing the number of cells along x.
+                height (int): integer representing the number of cells along y.
+                density (float): float representing the probability of a cell to be blocked.
+                rng (np.random.Generator): random generator used to place the obstacles.
+                target (tuple): optional x,y position of the target, always left free.
+                start (tuple): x,y position of the robot at the beginning, always left free.
+
+            Returns:
+                grid_map (GridMap): new instance of the GridMap class.
+        """
+
+        rng = rng if rng is not None else np.random.default_rng()
+        cells = (rng.random((width, height)) < density).astype(np.uint8)
+        for position in (start, target):
+            if position is not None and 0 <= position[0] < width and 0 <= position[1] < height:
+                cells[position] = FREE
+        return cls(cells, target)
+
+    @classmethod
+    def load(cls, path:str, target:tuple=None) -> 'GridMap':
+        """
+            Method loading a map from a file.
+            Supported formats are .npy arrays, .npz archives with bit-packed cells as written by save,
+            and text files where '#' marks a blocked cell and any other character a free one.
+            In text files the first line is the row with the highest y.
+
+            Args:
+                path (str): path of the file to load.
+                target (tuple): optional x,y position of the target.
+
+            Returns:
+                grid_map (GridMap): new instance of the GridMap class.
+        """
+
+        if path.endswith('.npy'): return cls(np.load(path), target) # Copied into the padded grid, so not memory mapped
+
+        if path.endswith('.npz'):
+            with np.load(path) as archive:
+                shape = tuple(archive['shape'])
+                cells = np.unpackbits(archive['cells'], count=shape[0]*shape[1]).reshape(shape)
+            return cls(cells, target)
+
+        with open(path) as file:
+            rows = [line.rstrip('\n') for line in file if line.strip()]
+        width = max(len(row) for row in rows)
+        cells = np.array([[char == '#' for char in row.ljust(width)] for row in rows], dtype=np.uint8)
+        return cls(cells[::-1].T, target)
+
+    def save(self, path:str) -> None:
+        """
+            Method saving the map to a file, in one of the formats supported by load.
+
+            Args:
+                path (str): path of the file to write.
+        """
+
+        if path.endswith('.npy'): np.save(path, self._cells)
+        elif path.endswith('.npz'): np.savez_compressed(path, cells=np.packbits(self._cells), shape=np.array(self._cells.shape))
+        else:
+            with open(path, 'w') as file:
+                for row in self._cells.T[::-1]: file.write(''.join('#' if cell else '.' for cell in row) + '\n')
+
+    def get_shape(self) -> tuple:
+        """
+            Method to get the size of the map as number of cells along x and y.
+        """
+        return self._cells.shape
+
+    def get_cells(self) -> np.ndarray:
+        """
+            Method to get the occupancy grid, indexed as cells[x,y].
+        """
+        return self._cells
+
+    def get_target(self) -> tuple:
+        """
+            Method to get the x,y position of the target, None if the map has no target.
+        """
+        return self._target
+
+    def set_target(self, target:tuple) -> None:
+        """
+            Method placing the target on the map and precomputing the distance field used for its visibility.
+
+            Args:
+                target (tuple): x,y position of the target.
+        """
+
+        xt, yt = target
+        width, height = self._cells.shape
+        x, y = np.ogrid[0:width, 0:height]
+        self._target = (int(xt), int(yt))
+        self._distances = np.hypot(x - xt, y - yt).astype(np.float32)
+
+    def is_blocked(self, position:tuple) -> bool:
+        """
+            Method determining if a cell is blocked. Cells outside the map are blocked.
+
+            Args:
+                position (tuple): x,y position of the cell.
+
+            Returns:
+                blocked (bool): True if the cell is blocked, False otherwise.
+        """
+
+        x, y = position
+        width, height = self._cells.shape
+        if not (-1 <= x <= width and -1 <= y <= height): return True
+        return bool(self._padded[x+1, y+1])
+
+    def get_directions_state(self, position:tuple) -> dict:
+        """
+            Method determining for each possible movement direction whether it is free or blocked.
+
+            Args:
+                position (tuple): x,y position of the robot.
+
+            Returns:
+                directions_state (dict): dictionary associating to each direction either 'free' or 'blocked' state.
+        """
+
+        x, y = position
+        width, height = self._cells.shape
+        if not (0 <= x < width and 0 <= y < height): return {direction: 'blocked' for direction in DIRECTIONS}
+
+        padded = self._padded
+        return {'left': 'blocked' if padded[x, y+1] else 'free',
+                'right': 'blocked' if padded[x+2, y+1] else 'free',
+                'forward': 'blocked' if padded[x+1, y+2] else 'free',
+                'backward': 'blocked' if padded[x+1, y] else 'free'}
+
+    def get_directions_mask(self, position:tuple) -> int:
+        """
+            Method determining which movement directions are blocked, packed in the bits of an integer.
+
+            Args:
+                position (tuple): x,y position of the robot.
+
+            Returns:
+                blocked (int): mask where bit i is set when DIRECTIONS[i] is blocked.
+        """
+
+        x, y = position
+        width, height = self._cells.shape
+        if not (0 <= x < width and 0 <= y < height): return 15
+
+        padded = self._padded
+        return (bool(padded[x, y+1]) | bool(padded[x+2, y+1]) << 1 | bool(padded[x+1, y+2]) << 2 | bool(padded[x+1, y]) << 3)
+
+    def get_range_table(self) -> np.ndarray:
+        """
+            Method to get, for each cell and direction, the number of free cells before the nearest obstacle.
+            The table is computed the first time it is requested, sweeping the grid once for each direction.
+
+            Returns:
+                ranges (np.ndarray): array indexed as ranges[direction, x+1, y+1], with directions ordered as DIRECTIONS.
+        """
+
+        if self._ranges is None:
+            padded = self._padded.astype(bool)
+            width, height = padded.shape
+            ranges = np.zeros((4,) + padded.shape, dtype=np.int32)
+            left, right, forward, backward = ranges
+            for x in range(1, width - 1): left[x] = np.where(padded[x-1], 0, left[x-1] + 1)
+            for x in range(width - 2, 0, -1): right[x] = np.where(padded[x+1], 0, right[x+1] + 1)
+            for y in range(height - 2, 0, -1): forward[:, y] = np.where(padded[:, y+1], 0, forward[:, y+1] + 1)
+            for y in range(1, height - 1): backward[:, y] = np.where(padded[:, y-1], 0, backward[:, y-1] + 1)
+            self._ranges = ranges
+        return self._ranges
+
+    def get_ranges(self, position:tuple) -> np.ndarray:
+        """
+            Method determining, for each direction, the number of free cells between a position and the nearest obstacle.
+
+            Args:
+                position (tuple): x,y position of the robot.
+
+            Returns:
+                ranges (np.ndarray): array of four distances, ordered as DIRECTIONS, all zero outside the map.
+        """
+
+        x, y = position
+        width, height = self._cells.shape
+        if not (0 <= x < width and 0 <= y < height): return np.zeros(4)
+        return self.get_range_table()[:, x+1, y+1].astype(np.float64)
+
+    def target_visible(self, position:tuple, range:float) -> bool:
+        """
+            Method determining if the target is within a given range from a position.
+
+            Args:
+                position (tuple): x,y position of the robot.
+                range (float): float representing the range of the sensor looking for the target.
+
+            Returns:
+                is_visible (bool): True if the map has a target within range, False otherwise.
+        """
+
+        if self._distances is None: return False
+        x, y = position
+        width, height = self._cells.shape
+        if not (0 <= x < width and 0 <= y < height): return False
+        return bool(self._distances[x, y] <= range)
+
+if __name__ == "__main__":
+
+    import os
+    import tempfile
+
+    # Test random generation
+    grid_map = GridMap.random(40, 30, 0.2, np.random.default_rng(0), target=(25,20))
+    print(grid_map)
+
+    # Test queries
+    print(grid_map.get_directions_state((0,0)))
+    print(grid_map.is_blocked((-1,0)), grid_map.is_blocked((25,20)))
+    print(grid_map.target_visible((0,0), 10.0), grid_map.target_visible((22,18), 10.0))
+
+    # Test save and load in all formats
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ['map.npy', 'map.npz', 'map.txt']:
+            path = os.path.join(directory, name)
+            grid_map.save(path)
+            loaded = GridMap.load(path, (25,20))
+            print(name, np.array_equal(loaded.get_cells(), grid_map.get_cells()))
+
+    # Test a map with millions of cells
+    large_map = GridMap.random(2000, 2000, 0.3, np.random.default_rng(1), target=(1000,1000))
+    print(large_map)
@@ -0,0 +1,55 @@
+"""
+    Class representing the allocation of the identifiers of robots and sensors.
+"""
+
+import os
+import threading
+
+class IdAllocator:
+
+    def __init__(self, start:int=0) -> None:
+
+        """
+            Method to initialize an allocator of consecutive integer identifiers.
+            Identifiers are allocated under a lock, so that robots and sensors built by many threads at once never
+            share one. They are unique within a process: a process forked from another one, such as a worker of
+            a batch, goes on from the identifiers already allocated, with a new lock, since the lock of the parent
+            may have been held by a thread that does not exist in the child.
+
+            Args:
+                start (int): first identifier allocated.
+
+            Returns:
+                IdAllocator: new instance of the IdAllocator class.
+        """
+
+        self._next = start
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'): os.register_at_fork(after_in_child=self._reset_lock)
+
+    def __str__(self) -> str:
+        return f"Allocator of identifiers, next is {self._next}."
+
+    def _reset_lock(self) -> None:
+        """
+            Method replacing the lock in a forked process.
+        """
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        """
+            Method allocating a new identifier.
+        """
+        with self._lock:
+            identifier = self._next
+            self._next += 1
+        return identifier
+
+if __name__ == "__main__":
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Test that identifiers allocated by many threads at once are all different
+    allocator = IdAllocator()
+    with ThreadPoolExecutor(8) as pool: identifiers = list(pool.map(lambda _: allocator.allocate(), range(100000)))
+    print(len(set(identifiers)) == len(identifiers), allocator)
@@ -0,0 +1,279 @@
+"""
+    Class representing the continuous motion of one or more robots, with float poses and footprint-aware collisions.
+"""
+
+import math
+
+import numpy as np
+
+from sense_plan_act.perception import HEADINGS
+
+# Turning speeds below this value, in radians per second, are integrated as straight movements
+STRAIGHT = 1e-9
+
+class Kinematics:
+
+    def __init__(self, n_robots:int=1, dimensions:tuple=(1.0, 1.0), grid_map=None, initial=(0.0, 0.0, HEADINGS['forward']),
+                 dt:float=0.05, cell_size:float=1.0) -> None:
+
+        """
+            Method to initialize the kinematic model of a batch of robots.
+            Each robot has a pose x,y,heading in continuous space, where the center of cell (i,j) of the map is at
+            x=i, y=j, and moves as a unicycle: it drives forward at a speed while turning at a turning speed.
+            Poses of all the robots are integrated together with array operations. The footprint of a robot is a
+            rectangle, as long as the first of its dimensions along its heading and as wide as the second one, and
+            collides when any of its points falls in a blocked cell of the map or outside of it.
+
+            Args:
+                n_robots (int): integer representing the number of robots in the batch.
+                dimensions (tuple): length and width of the footprint of the robots, as Robot._dimensions.
+                grid_map (GridMap): optional map of the obstacles. If None, robots never collide.
+                initial: initial pose x,y,heading, either the same for all robots or an array with one row for each robot.
+                dt (float): default duration, in seconds, of the steps in which turns and movements are checked for collisions.
+                cell_size (float): size of a cell of the map in the unit of the dimensions.
+
+            Returns:
+                Kinematics: new instance of the Kinematics class.
+
+            Raises:
+                ValueError: if n_robots, the dimensions, dt or cell_size are not positive.
+        """
+
+        if n_robots <= 0: raise ValueError(f"Number of robots must be positive, got {n_robots}.")
+        if min(dimensions) <= 0: raise ValueError(f"Dimensions must be positive, got {dimensions}.")
+        if dt <= 0: raise ValueError(f"Time step must be positive, got {dt}.")
+        if cell_size <= 0: raise ValueError(f"Cell size must be positive, got {cell_size}.")
+
+        self._poses = np.empty((n_robots, 3))
+        self._poses[:] = initial
+        self._dimensions = tuple(dimensions)
+        self._dt = dt
+
+        # Points of the footprint in the frame of the robot, x along the heading, no further apart than half a cell
+        length, width = dimensions[0] / cell_size, dimensions[1] / cell_size
+        along = np.linspace(-length / 2, length / 2, max(2, math.ceil(length * 2) + 1))
+        across = np.linspace(-width / 2, width / 2, max(2, math.ceil(width * 2) + 1))
+        self._footprint = np.array([(a, b) for a in along for b in across])
+
+        # Cells surrounded by a blocked border, so that points outside the map collide
+        self._blocked = None
+        if grid_map is not None:
+            cells = grid_map.get_cells()
+            self._blocked = np.ones((cells.shape[0] + 2, cells.shape[1] + 2), dtype=bool)
+            self._blocked[1:-1, 1:-1] = cells != 0
+
+    def __str__(self) -> str:
+        return f"Kinematics of {len(self._poses)} robots with footprint {self._dimensions[0]}x{self._dimensions[1]}."
+
+    def __len__(self) -> int:
+        return len(self._poses)
+
+    def get_poses(self) -> np.ndarray:
+        """
+            Method to get the poses of the robots, as an array with one row x,y,heading for each robot.
+        """
+        return self._poses
+
+    def set_pose(self, index:int, x:float, y:float, heading:float) -> None:
+        """
+            Method to place a robot of the batch.
+        """
+        self._poses[index] = (x, y, heading)
+
+    def collides(self, poses:np.ndarray) -> np.ndarray:
+        """
+            Method determining which poses make the footprint overlap a blocked cell or leave the map.
+
+            Args:
+                poses (np.ndarray): array of poses, with x,y,heading on the last axis.
+
+            Returns:
+                collides (np.ndarray): boolean array with the shape of poses without its last axis.
+        """
+
+        poses = np.asarray(poses, dtype=float)
+        if self._blocked is None: return np.zeros(poses.shape[:-1], dtype=bool)
+
+        cos, sin = np.cos(poses[..., 2:3]), np.sin(poses[..., 2:3])
+        along, across = self._footprint[:, 0], self._footprint[:, 1]
+        x = poses[..., 0:1] + cos * along - sin * across
+        y = poses[..., 1:2] + sin * along + cos * across
+
+        # Each point is in the cell whose center is nearest, shifted by one for the border
+        width, height = self._blocked.shape
+        i = np.clip(np.floor(x + 1.5).astype(np.int64), 0, width - 1)
+        j = np.clip(np.floor(y + 1.5).astype(np.int64), 0, height - 1)
+        return self._blocked[i, j].any(axis=-1)
+
+    @staticmethod
+    def integrate(poses:np.ndarray, speeds, turning_speeds, dt:float) -> np.ndarray:
+        """
+            Method integrating exactly the motion of unicycles at constant speed and turning speed for a time step.
+
+            Args:
+                poses (np.ndarray): array of poses, with x,y,heading on the last axis.
+                speeds: forward speeds, broadcast against the poses without their last axis.
+                turning_speeds: turning speeds in radians per second, positive counterclockwise, broadcast as speeds.
+                dt (float): duration of the time step in seconds.
+
+            Returns:
+                poses (np.ndarray): new array of poses after the time step.
+        """
+
+        poses = np.asarray(poses, dtype=float)
+        x, y, heading = poses[..., 0], poses[..., 1], poses[..., 2]
+        speeds = np.asarray(speeds, dtype=float)
+        turning = np.asarray(turning_speeds, dtype=float)
+        new_heading = heading + turning * dt
+
+        # Along an arc the displacement is (sin(h1) - sin(h0), cos(h0) - cos(h1)) * v / w, which tends to the straight line
+        straight = np.abs(turning) < STRAIGHT
+        safe = np.where(straight, 1.0, turning)
+        dx = np.where(straight, speeds * dt * np.cos(heading), speeds / safe * (np.sin(new_heading) - np.sin(heading)))
+        dy = np.where(straight, speeds * dt * np.sin(heading), speeds / safe * (np.cos(heading) - np.cos(new_heading)))
+
+        result = np.empty(np.broadcast_shapes(poses.shape, dx.shape + (3,)))
+        result[..., 0] = x + dx
+        result[..., 1] = y + dy
+        result[..., 2] = (new_heading + math.pi) % (2 * math.pi) - math.pi
+        return result
+
+    def step(self, speeds, turning_speeds, dt:float) -> np.ndarray:
+        """
+            Method moving all the robots for a time step. Robots whose footprint would collide stay where they are.
+
+            Args:
+                speeds: forward speed of each robot, or the same for all of them.
+                turning_speeds: turning speed of each robot in radians per second, or the same for all of them.
+                dt (float): duration of the time step in seconds.
+
+            Returns:
+                collided (np.ndarray): boolean array, True for the robots stopped by a collision.
+        """
+
+        poses = self.integrate(self._poses, speeds, turning_speeds, dt)
+        collided = self.collides(poses)
+        self._poses[~collided] = poses[~collided]
+        return collided
+
+    def rollout(self, initial, speeds:np.ndarray, turning_speeds:np.ndarray, dt:float) -> tuple:
+        """
+            Method simulating many candidate trajectories at once, without changing the poses of the robots.
+            A trajectory stops at its first collision and keeps its last free pose for the rest of the horizon.
+
+            Args:
+                initial: initial pose x,y,heading, either the same for all trajectories or one row for each of them.
+                speeds (np.ndarray): array (trajectories, steps) of forward speeds.
+                turning_speeds (np.ndarray): array (trajectories, steps) of turning speeds, in radians per second.
+                dt (float): duration of each step in seconds.
+
+            Returns:
+                poses (np.ndarray): array (trajectories, steps + 1, 3) of the poses along each trajectory.
+                collision (np.ndarray): integer array with the step of the first collision of each trajectory, -1 if none.
+        """
+
+        speeds = np.atleast_2d(np.asarray(speeds, dtype=float))
+        turning_speeds = np.broadcast_to(np.asarray(turning_speeds, dtype=float), speeds.shape)
+        n, steps = speeds.shape
+
+        poses = np.empty((n, steps + 1, 3))
+        poses[:, 0] = initial
+        collision = np.full(n, -1)
+        active = np.ones(n, dtype=bool)
+        for step in range(steps):
+            current = poses[:, step]
+            moved = self.integrate(current, speeds[:, step], turning_speeds[:, step], dt)
+            hit = active & self.collides(moved)
+            collision[hit] = step
+            active &= ~hit
+            poses[:, step + 1] = np.where(active[:, None], moved, current)
+        return poses, collision
+
+    def turn_to(self, index:int, heading:float, turning_speed:float, dt:float=None) -> tuple:
+        """
+            Method turning a robot in place, along the shortest way, until it faces a heading.
+
+            Args:
+                index (int): integer identifying the robot in the batch.
+                heading (float): heading to reach, in radians.
+                turning_speed (float): turning speed in radians per second.
+                dt (float): duration of the steps in which the rotation is checked for collisions. If None, the default one is used.
+
+            Returns:
+                duration (float): time taken by the rotation in seconds, until the collision if there is one.
+                collided (bool): True if the footprint hit an obstacle while turning, in which case the robot goes back to its pose.
+
+            Raises:
+                ValueError: if turning_speed is not positive.
+        """
+
+        if turning_speed <= 0: raise ValueError(f"Turning speed must be positive, got {turning_speed}.")
+        pose = self._poses[index]
+        angle = (heading - pose[2] + math.pi) % (2 * math.pi) - math.pi
+        return self._sweep(index, 0.0, math.copysign(turning_speed, angle), float(abs(angle)) / turning_speed, dt)
+
+    def move(self, index:int, distance:float, speed:float, dt:float=None) -> tuple:
+        """
+            Method moving a robot straight along its heading for a distance.
+
+            Args:
+                index (int): integer identifying the robot in the batch.
+                distance (float): distance to travel, in cells.
+                speed (float): forward speed in cells per second.
+                dt (float): duration of the steps in which the movement is checked for collisions. If None, the default one is used.
+
+            Returns:
+                duration (float): time taken by the movement in seconds, until the collision if there is one.
+                collided (bool): True if the footprint hit an obstacle, in which case the robot goes back to its pose.
+
+            Raises:
+                ValueError: if speed is not positive.
+        """
+
+        if speed <= 0: raise ValueError(f"Speed must be positive, got {speed}.")
+        return self._sweep(index, speed, 0.0, distance / speed, dt)
+
+    def _sweep(self, index:int, speed:float, turning_speed:float, duration:float, dt:float) -> tuple:
+        """
+            Method integrating the motion of a robot for a duration, checking all the intermediate poses at once.
+        """
+
+        if duration <= 0: return 0.0, False
+        if dt is None: dt = self._dt
+        steps = max(1, math.ceil(duration / dt))
+        times = np.minimum(np.arange(1, steps + 1) * dt, duration)
+        poses = self.integrate(self._poses[index], speed, turning_speed, times)
+        hits = np.flatnonzero(self.collides(poses))
+        if hits.size: return float(times[hits[0]]), True
+        self._poses[index] = poses[-1]
+        return duration, False
+
+if __name__ == "__main__":
+
+    import time
+
+    from sense_plan_act.grid_map import GridMap
+
+    # Test exact integration against many small steps
+    kinematics = Kinematics(1, (1.5, 0.3))
+    pose = np.array([0.0, 0.0, 0.0])
+    exact = Kinematics.integrate(pose, 1.0, 0.5, 2.0)
+    small = pose
+    for _ in range(2000): small = Kinematics.integrate(small, 1.0, 0.5, 0.001)
+    print(np.round(exact, 4), np.abs(exact - small).max() < 1e-6)
+
+    # Test a turn and a movement of one cell, with and without obstacles
+    print(kinematics.turn_to(0, HEADINGS['right'], 1.0, 0.05), kinematics.move(0, 1.0, 0.5, 0.05), np.round(kinematics.get_poses()[0], 3))
+    cells = np.zeros((5, 5), dtype=np.uint8)
+    cells[3, 2] = 1
+    blocked = Kinematics(1, (1.5, 0.3), GridMap(cells), initial=(1.0, 2.0, 0.0))
+    print(blocked.move(0, 1.0, 1.0), blocked.move(0, 0.5, 1.0), np.round(blocked.get_poses()[0], 3), blocked.collides(np.array([[2.0, 2.0, math.pi / 2]])))
+
+    # Test batched rollouts of candidate speeds and turning speeds on a random map
+    grid_map = GridMap.random(50, 50, 0.1, np.random.default_rng(0), start=(25, 25))
+    fleet = Kinematics(1, (1.5, 0.3), grid_map, initial=(25.0, 25.0, 0.0))
+    rng = np.random.default_rng(1)
+    speeds, turning = rng.uniform(0.1, 2.0, (4096, 1)).repeat(20, axis=1), rng.uniform(-1, 1, (4096, 1)).repeat(20, axis=1)
+    start = time.perf_counter()
+    poses, collision = fleet.rollout(fleet.get_poses()[0], speeds, turning, 0.1)
+    print(f"{len(poses)} trajectories of 20 steps in {1000 * (time.perf_counter() - start):.1f} ms, {int((collision >= 0).sum())} collide")
@@ -0,0 +1,247 @@
+"""
+    Class representing the counters and histograms describing what robots did during their missions.
+"""
+
+from bisect import bisect_left
+import os
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+
+# Default labels known in advance, so that counters are allocated once. Others are added the first time they are seen.
+PLANS = ('search', 'go', 'wonder')
+ACTIONS = tuple(DIRECTIONS) + ('pick_up', 'trapped')
+ACTUATORS = ('motor', 'servo', 'gripper')
+
+# Upper bounds of the buckets of the histograms, the last bucket being unbounded
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1)
+TICKS_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Label of the time steps where no rule applied
+NONE = 'none'
+
+class Metrics:
+
+    def __init__(self, plans:tuple=PLANS, actions:tuple=ACTIONS, actuators:tuple=ACTUATORS, labels:dict=None,
+                 latency_buckets:tuple=LATENCY_BUCKETS, ticks_buckets:tuple=TICKS_BUCKETS) -> None:
+
+        """
+            Method to initialize the metrics of one or more control loops.
+            Every counter is a slot of a list allocated here, indexed through a dictionary of labels, so that
+            recording a time step only increments numbers. Loops without metrics do not record anything.
+
+            Args:
+                plans (tuple): goals of the plans whose time steps are counted.
+                actions (tuple): actions whose choices are counted.
+                actuators (tuple): actuators whose energy is summed.
+                labels (dict): optional labels added to every metric exported in Prometheus format, such as the robot name.
+                latency_buckets (tuple): increasing upper bounds, in seconds, of the buckets of the latency histogram.
+                ticks_buckets (tuple): increasing upper bounds of the buckets of the histogram of time steps to reach the goal.
+
+            Returns:
+                Metrics: new instance of the Metrics class.
+
+            Raises:
+                ValueError: if the bounds of a histogram are not increasing.
+        """
+
+        for buckets in (latency_buckets, ticks_buckets):
+            if any(low >= high for low, high in zip(buckets, buckets[1:])): raise ValueError(f"Bucket bounds must be increasing, got {buckets}.")
+
+        self._labels = dict(labels) if labels is not None else {}
+        self._plans = {plan: index for index, plan in enumerate((NONE,) + tuple(plans))}
+        self._actions = {action: index for index, action in enumerate((NONE,) + tuple(actions))}
+        self._actuators = {actuator: index for index, actuator in enumerate(actuators)}
+        self._latency_buckets = tuple(latency_buckets)
+        self._ticks_buckets = tuple(ticks_buckets)
+        self.reset()
+
+    def __str__(self) -> str:
+        return f"Metrics of {self._ticks} time steps, {self._pick_up_successes}/{self._pick_ups} successful pick ups, {self._trapped} trapped."
+
+    def reset(self) -> None:
+        """
+            Method setting every counter and histogram to zero.
+        """
+
+        self._ticks = 0
+        self._plan_ticks = [0] * len(self._plans)
+        self._action_counts = [0] * len(self._actions)
+        self._energy = [0.0] * len(self._actuators)
+        self._pick_ups = 0
+        self._pick_up_successes = 0
+        self._trapped = 0
+        self._latency_counts = [0] * (len(self._latency_buckets) + 1)
+        self._latency_sum = 0.0
+        self._goal_counts = [0] * (len(self._ticks_buckets) + 1)
+        self._goal_sum = 0
+
+    def _index(self, labels:dict, counts:list, label:str, zero) -> int:
+        """
+            Method returning the slot of a label not allocated in advance, adding it.
+        """
+        index = labels[label] = len(labels)
+        counts.append(zero)
+        return index
+
+    def record_tick(self, plan:str, action:str, actuator:str, energy:float, latency:float) -> None:
+        """
+            Method recording a time step of a control loop.
+
+            Args:
+                plan (str): goal of the plan, or sub-plan, whose rule produced the action, None if no rule applied.
+                action (str): action performed, None if no rule applied.
+                actuator (str): actuator that performed the action, None if no actuator was used.
+                energy (float): energy consumed by the action.
+                latency (float): duration of the time step in seconds.
+        """
+
+        self._ticks += 1
+        index = self._plans.get(plan if plan is not None else NONE)
+        if index is None: index = self._index(self._plans, self._plan_ticks, plan, 0)
+        self._plan_ticks[index] += 1
+
+        index = self._actions.get(action if action is not None else NONE)
+        if index is None: index = self._index(self._actions, self._action_counts, action, 0)
+        self._action_counts[index] += 1
+        if action == 'trapped': self._trapped += 1
+
+        if actuator is not None:
+            index = self._actuators.get(actuator)
+            if index is None: index = self._index(self._actuators, self._energy, actuator, 0.0)
+            self._energy[index] += energy
+
+        self._latency_counts[bisect_left(self._latency_buckets, latency)] += 1
+        self._latency_sum += latency
+
+    def record_pick_up(self, success:bool) -> None:
+        """
+            Method recording an attempt to pick up the target.
+        """
+        self._pick_ups += 1
+        if success: self._pick_up_successes += 1
+
+    def record_goal(self, ticks:int) -> None:
+        """
+            Method recording the number of time steps a mission took to reach its goal.
+        """
+        self._goal_counts[bisect_left(self._ticks_buckets, ticks)] += 1
+        self._goal_sum += ticks
+
+    def get_pick_up_rate(self) -> float:
+        """
+            Method to get the share of successful pick ups, None if the robot never tried.
+        """
+        return self._pick_up_successes / self._pick_ups if self._pick_ups else None
+
+    def snapshot(self) -> dict:
+        """
+            Method to get a copy of the current values of every metric.
+
+            Returns:
+                snapshot (dict): dictionary of counters, energy by actuator and histograms, as lists of (upper bound, cumulative count).
+        """
+
+        def cumulative(bounds:tuple, counts:list) -> list:
+            total, buckets = 0, []
+            for bound, count in zip(bounds + (float('inf'),), counts):
+                total += count
+                buckets.append((bound, total))
+            return buckets
+
+        return {
+            'ticks': self._ticks,
+            'plan_ticks': {plan: self._plan_ticks[index] for plan, index in self._plans.items()},
+            'actions': {action: self._action_counts[index] for action, index in self._actions.items()},
+            'energy': {actuator: self._energy[index] for actuator, index in self._actuators.items()},
+            'pick_ups': self._pick_ups,
+            'pick_up_successes': self._pick_up_successes,
+            'pick_up_rate': self.get_pick_up_rate(),
+            'trapped': self._trapped,
+            'tick_latency': {'buckets': cumulative(self._latency_buckets, self._latency_counts), 'sum': self._latency_sum, 'count': self._ticks},
+            'ticks_to_goal': {'buckets': cumulative(self._ticks_buckets, self._goal_counts), 'sum': self._goal_sum, 'count': sum(self._goal_counts)}
+        }
+
+    def to_prometheus(self, prefix:str='sense_plan_act') -> str:
+        """
+            Method formatting every metric in the Prometheus text exposition format.
+
+            Args:
+                prefix (str): string prepended to the name of every metric.
+
+            Returns:
+                text (str): metrics, one sample per line, with HELP and TYPE comments.
+        """
+
+        snapshot = self.snapshot()
+        lines = []
+
+        def labels(**extra) -> str:
+            pairs = {**self._labels, **extra}
+            if not pairs: return ''
+            return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + '}'
+
+        def metric(name:str, kind:str, help:str, samples:list) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, sample_labels, value in samples: lines.append(f"{prefix}_{name}{suffix}{labels(**sample_labels)} {value}")
+
+        def histogram(name:str, help:str, values:dict) -> None:
+            samples = [('_bucket', {'le': '+Inf' if bound == float('inf') else repr(float(bound))}, count) for bound, count in values['buckets']]
+            metric(name, 'histogram', help, samples + [('_sum', {}, values['sum']), ('_count', {}, values['count'])])
+
+        metric('ticks_total', 'counter', "Time steps performed, by plan whose rule produced the action.",
+               [('', {'plan': plan}, count) for plan, count in snapshot['plan_ticks'].items()])
+        metric('actions_total', 'counter', "Actions chosen by the planner.",
+               [('', {'action': action}, count) for action, count in snapshot['actions'].items()])
+        metric('energy_total', 'counter', "Energy consumed by each actuator.",
+               [('', {'actuator': actuator}, energy) for actuator, energy in snapshot['energy'].items()])
+        metric('pick_ups_total', 'counter', "Attempts to pick up the target.", [('', {}, snapshot['pick_ups'])])
+        metric('pick_up_successes_total', 'counter', "Successful attempts to pick up the target.", [('', {}, snapshot['pick_up_successes'])])
+        metric('trapped_total', 'counter', "Time steps ending a mission because the robot is trapped.", [('', {}, snapshot['trapped'])])
+        histogram('tick_latency_seconds', "Duration of the time steps.", snapshot['tick_latency'])
+        histogram('ticks_to_goal', "Time steps taken by the missions reaching their goal.", snapshot['ticks_to_goal'])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path:str, prefix:str='sense_plan_act') -> None:
+        """
+            Method writing the metrics to a file in the Prometheus text format, as read by the textfile collector.
+            The file is replaced at once, so a reader never sees it half written.
+
+            Args:
+                path (str): path of the file to write.
+                prefix (str): string prepended to the name of every metric.
+        """
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as file: file.write(self.to_prometheus(prefix))
+        os.replace(temporary, path)
+
+def _escape(value) -> str:
+    """
+        Function escaping backslashes, quotes and new lines in the value of a Prometheus label.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+if __name__ == "__main__":
+
+    import time
+
+    import numpy as np
+
+    from sense_plan_act.control_loop import ControlLoop
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    # Test metrics shared by the control loops of many missions
+    metrics = Metrics(labels={'robot': DEFAULT_CONFIG['name']})
+    for seed in range(50): ControlLoop(build_robot(DEFAULT_CONFIG, np.random.default_rng(seed)), metrics=metrics).run()
+    print(metrics)
+    snapshot = metrics.snapshot()
+    print(snapshot['plan_ticks'], snapshot['actions'], snapshot['pick_up_rate'])
+    print({actuator: round(energy, 1) for actuator, energy in snapshot['energy'].items()}, snapshot['ticks_to_goal']['count'])
+    print('\n'.join(metrics.to_prometheus().splitlines()[:8]))
+
+    # Test overhead of metrics on whole missions
+    for enabled in (False, True):
+        start = time.perf_counter()
+        for seed in range(200): ControlLoop(build_robot(DEFAULT_CONFIG, np.random.default_rng(seed)), metrics=Metrics() if enabled else None).run()
+        print(f"Metrics: {enabled}, {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,120 @@
+"""
+    Functions to build a robot from a configuration and to run a search mission with it.
+"""
+
+import numpy as np
+
+from sense_plan_act.robot import Robot
+from sense_plan_act.sensor import Sensor
+from sense_plan_act.planner import Planner
+from sense_plan_act.actuator import Actuator
+from sense_plan_act.energy import EnergyModel
+from sense_plan_act.grid_map import GridMap
+from sense_plan_act.control_loop import ControlLoop
+
+# Configuration of the robot used in main.py
+DEFAULT_CONFIG = {
+    'name': 'WaterFinder',
+    'dimensions': (1.5, 0.3),
+    'weight': 20,
+    'goal': 'search',
+    'sensors': {
+        'position': {'type': 'position', 'range': 1.0, 'max_samples': 10},
+        'camera': {'type': 'camera', 'range': 0.0, 'max_samples': 1},
+        'ultra_sound': {'type': 'ultra_sound', 'range': 100.0, 'max_samples': 10},
+        'temperature': {'type': 'temperature', 'range': 10.0, 'max_samples': 5},
+        'battery_level': {'type': 'battery_level', 'range': 0.0, 'max_samples': 1}
+    },
+    'actuators': {
+        'motor': {'type': 'motor', 'max_speed': 10.0, 'max_turning_speed': 2.0, 'energy_cost': 1.0},
+        'gripper': {'type': 'gripper', 'max_speed': 2.0, 'max_turning_speed': 1.0, 'energy_cost': 0.2},
+        'servo': {'type': 'servo', 'max_speed': 3.0, 'max_turning_speed': 3.0, 'energy_cost': 0.5}
+    },
+    'max_ticks': None
+}
+
+def build_map(config:dict) -> GridMap:
+    """
+        Function building the map of the world from its configuration.
+
+        Args:
+            config (dict): dictionary with either the 'path' of a map file, or the 'width', 'height' and optional
+                           'density' and 'seed' of a random map. Optional 'target' and 'start' are x,y positions
+                           of the target and of the robot, the latter always left free in random maps.
+
+        Returns:
+            grid_map (GridMap): new instance of the GridMap class.
+    """
+
+    target = tuple(config['target']) if config.get('target') is not None else None
+    if 'path' in config: return GridMap.load(config['path'], target)
+    rng = np.random.default_rng(config.get('seed', 0))
+    return GridMap.random(config['width'], config['height'], config.get('density', 0.2), rng, target, tuple(config.get('start', (0,0))))
+
+def build_robot(config:dict, rng=None, events=None) -> Robot:
+    """
+        Function building a robot, with its sensors, actuators and planner, from a configuration.
+
+        Args:
+            config (dict): dictionary describing the robot, in the same form as DEFAULT_CONFIG. An optional 'energy'
+                           dictionary holds the arguments, such as payloads, of the EnergyModel of the robot, an
+                           optional 'explorer' dictionary, with shape and origin of the world, replaces the wonder plan
+                           with a FrontierExplorer, an optional 'lookahead' dictionary, with the arguments of a
+                           LookaheadPlanner, replaces the go plan with it, and an optional 'map' dictionary, as accepted
+                           by build_map, gives the sensors a map of the world, where the robot starts from the 'start'
+                           position of the map. Explorer and lookahead planner only know the size of the map.
+            rng (np.random.Generator): optional random generator shared by sensors and actuators.
+            events (EventLog): optional log receiving the events of sensors and actuators.
+
+        Returns:
+            robot (Robot): new instance of the Robot class.
+    """
+
+    grid_map = build_map(config['map']) if config.get('map') is not None else None
+    sensors = {name: Sensor(sensor['type'], sensor['range'], sensor['max_samples'], rng, grid_map, events)
+               for name, sensor in config['sensors'].items()}
+    if grid_map is not None:
+        for sensor in sensors.values(): sensor.set_position(tuple(config['map'].get('start', (0,0))))
+    actuators = {name: Actuator(actuator['type'], actuator['max_speed'], actuator['max_turning_speed'], actuator['energy_cost'], rng, events)
+                 for name, actuator in config['actuators'].items()}
+    planner = Planner(config['goal'])
+    explorer = config.get('explorer')
+    if explorer is not None:
+        from sense_plan_act.explorer import FrontierExplorer # Optional strategies are imported only when configured
+        explorer = FrontierExplorer(**explorer) if explorer or grid_map is None else FrontierExplorer(grid_map)
+        planner.add_plan('wonder', [(planner.check_battery, explorer)])
+    energy = config.get('energy')
+    energy_model = EnergyModel(actuators, config['weight'], **energy) if energy is not None else None
+    lookahead = config.get('lookahead')
+    if lookahead is not None:
+        from sense_plan_act.mpc import LookaheadPlanner
+        if grid_map is not None and 'shape' not in lookahead: lookahead = dict(lookahead, shape=grid_map.get_shape())
+        planner.add_plan('go', [(planner.check_battery, LookaheadPlanner(actuators, energy_model=energy_model, rng=rng, **lookahead))])
+    return Robot(config['name'], tuple(config['dimensions']), config['weight'], sensors, actuators, planner, energy_model)
+
+def run_mission(robot:Robot, goal:str, max_ticks:int=None, recorder=None, faults=None) -> dict:
+    """
+        Function simulating Sense-Plan-Act for some time-steps, as fast as possible, through a ControlLoop.
+        When target is reached, battery expires or the robot is trapped stop.
+
+        Args:
+            robot (Robot): robot performing the mission.
+            goal (str): string representing the goal of the plan followed by the robot.
+            max_ticks (int): optional integer limiting the number of time steps.
+            recorder (TraceRecorder): optional recorder of perceptions, action and energy of each time step.
+            faults (FaultInjector): optional injection of faults in the sensors, running the loop in degraded mode.
+
+        Returns:
+            result (dict): dictionary describing how the mission ended.
+    """
+
+    return ControlLoop(robot, goal, recorder=recorder, faults=faults).run(max_ticks)
+
+if __name__ == "__main__":
+
+    import numpy as np
+
+    # Test a seeded mission, twice to check reproducibility
+    for _ in range(2):
+        robot = build_robot(DEFAULT_CONFIG, np.random.default_rng(42))
+        print(run_mission(robot, DEFAULT_CONFIG['goal']))
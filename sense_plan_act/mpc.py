@@ -0,0 +1,248 @@
+"""
+    Class representing a lookahead planner choosing actions by model-predictive control, usable as action of the condition-action rules of a plan.
+"""
+
+import itertools
+
+import numpy as np
+
+from sense_plan_act.grid_map import DIRECTIONS
+from sense_plan_act.path_planner import PathPlanner
+
+OFFSETS = np.array([(-1,0), (1,0), (0,1), (0,-1)]) # Offset of each direction, indexed as DIRECTIONS
+
+# Weights of the terms of the cost of a sequence of actions
+DISTANCE_WEIGHT = 1.0
+ENERGY_WEIGHT = 0.1
+RISK_WEIGHT = 10.0
+
+class LookaheadPlanner:
+
+    # Perceptions read at each call, as declared by the depends_on decorator for the rules of the Planner
+    deterministic = False # Choices depend on the knowledge and the best sequence of previous calls, so they are never cached
+    dependencies = frozenset(['position', 'target', 'orientation', 'battery_level', 'payload', *DIRECTIONS])
+
+    def __init__(self, actuators:dict, grid_map=None, shape:tuple=None, origin:tuple=(0,0), horizon:int=5,
+                 n_candidates:int=256, energy_model=None, prior:float=0.2, rng:np.random.Generator=None,
+                 distance_weight:float=DISTANCE_WEIGHT, energy_weight:float=ENERGY_WEIGHT, risk_weight:float=RISK_WEIGHT) -> None:
+
+        """
+            Method to initialize the lookahead planner.
+            At each call, the planner scores candidate sequences of horizon actions, all of them rolled out together
+            on the grid as the control loop would perform them: a direction equal to the orientation moves the
+            robot by one cell, any other direction turns it. The cost of a sequence sums the distances to the target
+            after each action, so that getting closer early is preferred, the energy the actuators consume and the
+            risk of moving into blocked cells, and the first action of the cheapest sequence is performed.
+            Distances are the ones of the distance field of a PathPlanner, following the cells not known to be blocked,
+            so that the robot does not get stuck in dead ends, or manhattan distances if the target cannot be reached.
+            Moving into a direction perceived blocked is never chosen as first action.
+            Candidates are all the sequences when they are at most n_candidates, and otherwise random sequences,
+            warm-started from the best sequence of the previous call shifted by one action, and variations of it.
+            The planner keeps its own knowledge of the obstacles, updated with the perceived directions.
+
+            Args:
+                actuators (dict): dictionary of Actuator objects, with the motor and the servo whose energy costs are used.
+                grid_map (GridMap): optional map of the world with the obstacles known in advance.
+                shape (tuple): number of cells along x and y of the world, used when no map is given.
+                origin (tuple): x,y position of the first cell of the world, used when no map is given.
+                horizon (int): number of actions of each candidate sequence.
+                n_candidates (int): maximum number of candidate sequences scored at each call.
+                energy_model (EnergyModel): optional energy model predicting the cost of each action, as the control loop does.
+                prior (float): probability that a cell never perceived is blocked, used when no map is given.
+                rng (np.random.Generator): optional random generator sampling the candidate sequences.
+                distance_weight (float): weight of the distances to the target in the cost of a sequence.
+                energy_weight (float): weight of the energy in the cost of a sequence.
+                risk_weight (float): weight of the expected number of collisions in the cost of a sequence.
+
+            Returns:
+                LookaheadPlanner: new instance of the LookaheadPlanner class.
+
+            Raises:
+                ValueError: if neither a map nor a shape is given, horizon or n_candidates are not positive, or prior is not a probability.
+        """
+
+        if grid_map is None and shape is None: raise ValueError("Lookahead planner needs either a map or the shape of the world.")
+        if horizon <= 0: raise ValueError(f"Horizon must be positive, got {horizon}.")
+        if n_candidates <= 0: raise ValueError(f"Number of candidates must be positive, got {n_candidates}.")
+        if not 0 <= prior <= 1: raise ValueError(f"Prior must be between 0 and 1, got {prior}.")
+
+        cells = grid_map.get_cells() if grid_map is not None else None
+        self._width, self._height = cells.shape if cells is not None else shape
+        self._origin = (0,0) if grid_map is not None else origin
+
+        # Probability that each cell is blocked, surrounded by a blocked border so that leaving the world is a collision
+        self._risk = np.ones((self._width+2, self._height+2))
+        self._risk[1:-1, 1:-1] = (cells != 0) if cells is not None else prior
+        self._path_planner = PathPlanner(grid_map, shape, origin)
+        self._distances = np.full((self._width+2, self._height+2), np.inf) # Distance field, border included
+
+        self._motor, self._servo = actuators['motor'], actuators['servo']
+        self._energy_model = energy_model
+        self._horizon = horizon
+        self._n_candidates = n_candidates
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self._weights = (distance_weight, energy_weight, risk_weight)
+
+        # When every sequence fits in the budget, they are enumerated once
+        self._all = None
+        if 4 ** horizon <= n_candidates: self._all = np.array(list(itertools.product(range(4), repeat=horizon)), dtype=np.intp)
+        self._best = None # Best sequence of the previous call, as indices of DIRECTIONS
+        self._best_cost = None
+
+    def __str__(self) -> str:
+        return f"Lookahead planner on {self._width}x{self._height} cells, with horizon {self._horizon} and {self._n_candidates} candidates."
+
+    def __call__(self, perceptions:dict) -> str:
+        """
+            Method determining the direction for next action as the first one of the cheapest candidate sequence.
+
+            Args:
+                perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
+
+            Returns:
+                direction (str): string defining the direction for next action of the robot, 'trapped' if all
+                    directions are blocked, None if there is no target or the robot is outside the world.
+        """
+
+        target = perceptions['target']
+        position = perceptions['position']
+        x, y = position[0] - self._origin[0] + 1, position[1] - self._origin[1] + 1
+        if target is None or not (1 <= x <= self._width and 1 <= y <= self._height): return None
+
+        # Update knowledge of the obstacles around the robot
+        risk = self._risk
+        for index, direction in enumerate(DIRECTIONS):
+            dx, dy = OFFSETS[index]
+            if 1 <= x+dx <= self._width and 1 <= y+dy <= self._height: risk[x+dx, y+dy] = perceptions[direction] == 'blocked'
+        if all(perceptions[direction] != 'free' for direction in DIRECTIONS): return 'trapped'
+
+        # The path planner updates the same knowledge, and repairs its distance field
+        self._path_planner(perceptions)
+        distances = self._distances
+        field = self._path_planner.get_distance_field()
+        if field is not None and field[x-1, y-1] < np.inf: distances[1:-1, 1:-1] = field
+        else:
+            xt, yt = target[0] - self._origin[0] + 1, target[1] - self._origin[1] + 1
+            xs, ys = np.indices(distances.shape)
+            distances[:] = np.abs(xs - xt) + np.abs(ys - yt)
+
+        orientation = DIRECTIONS.index(perceptions.get('orientation', 'forward'))
+        costs = self._action_costs(perceptions.get('payload', 0.0))
+        candidates = self._candidates()
+        total = self.rollout(candidates, (x, y), orientation, distances, costs)
+
+        # The first action must be affordable with the battery left, and must not move into a perceived obstacle
+        first = candidates[:, 0]
+        total[costs[orientation, first] > perceptions['battery_level']] = np.inf
+        if perceptions[DIRECTIONS[orientation]] != 'free': total[first == orientation] = np.inf
+        best = int(np.argmin(total))
+        if not np.isfinite(total[best]): return 'trapped'
+        self._best, self._best_cost = candidates[best], float(total[best])
+        return DIRECTIONS[self._best[0]]
+
+    def _action_costs(self, payload:float) -> np.ndarray:
+        """
+            Method returning the energy of each direction (columns) from each orientation (rows), as consumed by the control loop.
+        """
+        if self._energy_model is not None:
+            table = self._energy_model.get_table(payload)
+            return np.array([[table[orientation][direction] for direction in DIRECTIONS] for orientation in range(4)])
+        costs = np.full((4, 4), float(self._servo._energy_cost))
+        np.fill_diagonal(costs, self._motor._energy_cost)
+        return costs
+
+    def _candidates(self) -> np.ndarray:
+        """
+            Method returning the candidate sequences of this call, as an array (candidates, horizon) of indices of DIRECTIONS.
+        """
+
+        if self._all is not None: return self._all
+        rng, horizon = self._rng, self._horizon
+        candidates = rng.integers(0, 4, (self._n_candidates, horizon))
+        if self._best is not None:
+            # Previous best sequence shifted by one action, completed by each direction, and variations changing one action
+            warm = np.append(self._best[1:], 0)
+            n_warm = min(self._n_candidates, 4 + self._n_candidates // 4)
+            candidates[:n_warm] = warm
+            candidates[:4, -1] = np.arange(4)[:min(4, n_warm)]
+            rows = np.arange(4, n_warm)
+            candidates[rows, rng.integers(0, horizon, len(rows))] = rng.integers(0, 4, len(rows))
+        return candidates
+
+    def rollout(self, candidates:np.ndarray, position:tuple, orientation:int, distances:np.ndarray, costs:np.ndarray) -> np.ndarray:
+        """
+            Method scoring many sequences of actions at once, performing them on the knowledge of the planner.
+            A movement into a cell known to be blocked leaves the robot where it is, a movement into an unknown cell
+            is assumed to succeed, and both add to the risk the probability that the cell is blocked.
+
+            Args:
+                candidates (np.ndarray): array (candidates, horizon) of indices of DIRECTIONS.
+                position (tuple): x,y index of the robot in the knowledge of the planner, border included.
+                orientation (int): index in DIRECTIONS of the orientation of the robot.
+                distances (np.ndarray): distance of each cell from the target, indexed as the knowledge of the planner.
+                costs (np.ndarray): energy of each direction (columns) from each orientation (rows).
+
+            Returns:
+                cost (np.ndarray): cost of each sequence.
+        """
+
+        n, horizon = candidates.shape
+        risk = self._risk
+        x, y = np.full(n, position[0]), np.full(n, position[1])
+        orientations = np.full(n, orientation)
+        distance = np.zeros(n)
+        energy = np.zeros(n)
+        collisions = np.zeros(n)
+        for step in range(horizon):
+            direction = candidates[:, step]
+            energy += costs[orientations, direction]
+            move = direction == orientations
+            nx, ny = x + move * OFFSETS[direction, 0], y + move * OFFSETS[direction, 1]
+            probability = np.where(move, risk[nx, ny], 0.0)
+            collisions += probability
+            free = probability < 1
+            x, y = np.where(free, nx, x), np.where(free, ny, y)
+            orientations = direction
+            distance += distances[x, y]
+
+        distance_weight, energy_weight, risk_weight = self._weights
+        return distance_weight * distance + energy_weight * energy + risk_weight * collisions
+
+    def get_best_sequence(self) -> list:
+        """
+            Method to get the best sequence of the last call, as a list of directions, None before the first call.
+        """
+        return None if self._best is None else [DIRECTIONS[direction] for direction in self._best]
+
+    def get_best_cost(self) -> float:
+        """
+            Method to get the cost of the best sequence of the last call, None before the first call.
+        """
+        return self._best_cost
+
+if __name__ == "__main__":
+
+    import time
+
+    from sense_plan_act.actuator import Actuator
+    from sense_plan_act.grid_map import GridMap
+    from sense_plan_act.planner import Planner
+
+    actuators = {'motor': Actuator('motor', 2.0, 0.0, 1.5), 'servo': Actuator('servo', 0.0, 1.0, 0.5)}
+    grid_map = GridMap.random(40, 30, 0.25, np.random.default_rng(5), target=(25,20))
+
+    # Test registration as plan and action selection, with all the sequences enumerated
+    lookahead = LookaheadPlanner(actuators, grid_map, horizon=4)
+    print(lookahead)
+    planner = Planner('search')
+    planner.add_plan('go', [(planner.check_battery, lookahead)])
+    perceptions = {'battery_level': 100, 'position': (0,0), 'target': (25,20), 'orientation': 'forward'}
+    perceptions.update(grid_map.get_directions_state((0,0)))
+    print(planner.select_action(planner.compile('search'), perceptions), lookahead.get_best_sequence(), round(lookahead.get_best_cost(), 2))
+
+    # Test sampled candidates warm-started from the previous call, and time of a call
+    lookahead = LookaheadPlanner(actuators, shape=(40,30), horizon=8, n_candidates=512, rng=np.random.default_rng(0))
+    print(lookahead(perceptions), lookahead.get_best_sequence())
+    start = time.perf_counter()
+    for _ in range(200): lookahead(perceptions)
+    print(lookahead.get_best_sequence(), f"{1e6 * (time.perf_counter() - start) / 200:.0f} us per call")
@@ -0,0 +1,283 @@
+"""
+    Class representing a global path planner, usable as action of the condition-action rules of a plan.
+"""
+
+import heapq
+from array import array
+
+import numpy as np
+
+from sense_plan_act.grid_map import DIRECTIONS
+
+INF = float('inf')
+
+class PathPlanner:
+
+    # Perceptions read at each call, as declared by the depends_on decorator for the rules of the Planner
+    deterministic = False # Choices depend on the knowledge gathered at previous calls, so they are never cached
+    dependencies = frozenset(['position', 'target', *DIRECTIONS])
+
+    def __init__(self, grid_map=None, shape:tuple=None, origin:tuple=(0,0)) -> None:
+
+        """
+            Method to initialize the path planner.
+            The planner keeps its own knowledge of the obstacles, starting from the given map or from an empty
+            world, and updates it with the state of the directions perceived by the robot.
+
+            Args:
+                grid_map (GridMap): optional map of the world with the obstacles known in advance.
+                shape (tuple): number of cells along x and y of the world, used when no map is given.
+                origin (tuple): x,y position of the first cell of the world, used when no map is given.
+
+            Returns:
+                PathPlanner: new instance of the PathPlanner class.
+
+            Raises:
+                ValueError: if neither a map nor a shape is given.
+        """
+
+        if grid_map is None and shape is None: raise ValueError("Path planner needs either a map or the shape of the world.")
+
+        cells = grid_map.get_cells() if grid_map is not None else np.zeros(shape, dtype=np.uint8)
+        self._origin = (0,0) if grid_map is not None else origin
+        self._width, self._height = cells.shape
+
+        # Cells are stored flat, surrounded by a blocked border, so that neighbours are index offsets
+        self._stride = self._height + 2
+        padded = np.ones((self._width+2, self._height+2), dtype=np.uint8)
+        padded[1:-1, 1:-1] = cells != 0
+        self._blocked = bytearray(padded.tobytes())
+        self._steps = {'left': -self._stride, 'right': self._stride, 'forward': 1, 'backward': -1}
+
+        self._target = None
+        self._distances = None # Distance of each cell from the target, following free cells
+
+    def __str__(self) -> str:
+        return f"Path planner on {self._width}x{self._height} cells. Target is at: {self._target}"
+
+    def __call__(self, perceptions:dict) -> str:
+        """
+            Method determining the direction for next move along a shortest path to the target.
+            Obstacles perceived around the robot are added to the knowledge of the planner, and the distance
+            field is repaired instead of being recomputed.
+
+            Args:
+                perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
+
+            Returns:
+                direction (str): string defining the direction for next move of the robot, 'trapped' if all
+                    directions are blocked, None if there is no target or it cannot be reached.
+        """
+
+        target = perceptions['target']
+        cell = self._index(perceptions['position'])
+        if target is None or cell is None or self._index(target) is None: return None
+
+        # Update knowledge of the obstacles around the robot
+        changed = []
+        for direction in DIRECTIONS:
+            neighbour = cell + self._steps[direction]
+            blocked = perceptions[direction] == 'blocked'
+            if self._blocked[neighbour] != blocked and self._inside(neighbour):
+                self._blocked[neighbour] = blocked
+                changed.append(neighbour)
+
+        if tuple(target) != self._target: self._compute_distances(tuple(target))
+        elif changed: self._repair(changed)
+
+        distances = self._distances
+        best, best_distance = None, INF
+        for direction in DIRECTIONS:
+            if perceptions[direction] != 'free': continue
+            distance = distances[cell + self._steps[direction]]
+            if distance < best_distance: best, best_distance = direction, distance
+
+        if best is None and all(perceptions[direction] != 'free' for direction in DIRECTIONS): return 'trapped'
+        return best
+
+    def _index(self, position:tuple) -> int:
+        """
+            Method returning the flat index of a position, None if it is outside the world.
+        """
+        x, y = position[0] - self._origin[0], position[1] - self._origin[1]
+        if not (0 <= x < self._width and 0 <= y < self._height): return None
+        return (x+1) * self._stride + (y+1)
+
+    def _position(self, index:int) -> tuple:
+        """
+            Method returning the x,y position of a flat index.
+        """
+        x, y = divmod(index, self._stride)
+        return (x - 1 + self._origin[0], y - 1 + self._origin[1])
+
+    def _inside(self, index:int) -> bool:
+        """
+            Method determining if a flat index belongs to the world and not to its border.
+        """
+        x, y = divmod(index, self._stride)
+        return 1 <= x <= self._width and 1 <= y <= self._height
+
+    def _neighbours(self, index:int) -> tuple:
+        """
+            Method returning the flat indices of the four neighbours of a cell.
+        """
+        return (index - self._stride, index + self._stride, index + 1, index - 1)
+
+    def _dijkstra(self, heap:list) -> None:
+        """
+            Method relaxing the distance field starting from the cells in the heap, until no distance improves.
+        """
+
+        distances, blocked = self._distances, self._blocked
+        stride = self._stride
+        while heap:
+            distance, index = heapq.heappop(heap)
+            if distance > distances[index]: continue
+            distance += 1
+            for neighbour in (index - stride, index + stride, index + 1, index - 1):
+                if not blocked[neighbour] and distance < distances[neighbour]:
+                    distances[neighbour] = distance
+                    heapq.heappush(heap, (distance, neighbour))
+
+    def _compute_distances(self, target:tuple) -> None:
+        """
+            Method computing from scratch the distance field of a target with a reverse Dijkstra search.
+        """
+
+        self._target = target
+        self._distances = array('d', [INF]) * len(self._blocked)
+        index = self._index(target)
+        self._distances[index] = 0.0
+        self._dijkstra([(0.0, index)])
+
+    def _repair(self, changed:list) -> None:
+        """
+            Method repairing the distance field after some cells changed their state, as done by D* Lite.
+            Cells whose shortest path went through a newly blocked cell are raised to infinity and then
+            recomputed from their neighbours, while newly freed cells are simply relaxed.
+
+            Args:
+                changed (list): flat indices of the cells whose state changed.
+        """
+
+        distances, blocked = self._distances, self._blocked
+        target = self._index(self._target)
+
+        # Raise the cells that are no longer supported by a neighbour one step closer to the target
+        stack, raised = [], []
+        for index in changed:
+            if blocked[index] and distances[index] < INF:
+                distances[index] = INF
+                stack.extend(self._neighbours(index))
+        while stack:
+            index = stack.pop()
+            distance = distances[index]
+            if distance == INF or index == target: continue
+            if any(distances[neighbour] == distance - 1 for neighbour in self._neighbours(index)): continue
+            distances[index] = INF
+            raised.append(index)
+            stack.extend(self._neighbours(index))
+
+        # Seed raised and freed cells from their consistent neighbours
+        heap = []
+        for index in raised + [index for index in changed if not blocked[index]]:
+            if blocked[index]: continue
+            distance = min(distances[neighbour] for neighbour in self._neighbours(index)) + 1
+            if distance < distances[index]:
+                distances[index] = distance
+                heapq.heappush(heap, (distance, index))
+        self._dijkstra(heap)
+
+    def get_distance_field(self) -> np.ndarray:
+        """
+            Method to get the distance of each cell from the current target, indexed as field[x,y].
+
+            Returns:
+                field (np.ndarray): array of distances, infinite for cells from which the target cannot be reached.
+        """
+
+        if self._distances is None: return None
+        field = np.frombuffer(self._distances, dtype=np.float64).reshape(self._width+2, self._height+2)
+        return field[1:-1, 1:-1]
+
+    def set_blocked(self, position:tuple, blocked:bool=True) -> None:
+        """
+            Method to change the knowledge of the planner about a cell, repairing the distance field.
+
+            Args:
+                position (tuple): x,y position of the cell.
+                blocked (bool): True if the cell is blocked, False if it is free.
+        """
+
+        index = self._index(position)
+        if index is None or self._blocked[index] == blocked: return
+        self._blocked[index] = blocked
+        if self._distances is not None: self._repair([index])
+
+    def find_path(self, start:tuple, goal:tuple) -> list:
+        """
+            Method computing a shortest path between two positions with A* search and manhattan distance heuristic.
+
+            Args:
+                start (tuple): x,y position where the path starts.
+                goal (tuple): x,y position where the path ends.
+
+            Returns:
+                path (list): list of x,y positions from start to goal, None if goal cannot be reached.
+        """
+
+        source, destination = self._index(start), self._index(goal)
+        if source is None or destination is None or self._blocked[destination]: return None
+
+        stride, blocked = self._stride, self._blocked
+        xg, yg = divmod(destination, stride)
+        heuristic = lambda index: abs(index // stride - xg) + abs(index % stride - yg)
+
+        costs = {source: 0}
+        parents = {source: None}
+        heap = [(heuristic(source), 0, source)]
+        while heap:
+            _, cost, index = heapq.heappop(heap)
+            if index == destination: break
+            if cost > costs[index]: continue
+            cost += 1
+            for neighbour in (index - stride, index + stride, index + 1, index - 1):
+                if not blocked[neighbour] and cost < costs.get(neighbour, INF):
+                    costs[neighbour] = cost
+                    parents[neighbour] = index
+                    heapq.heappush(heap, (cost + heuristic(neighbour), cost, neighbour))
+        else:
+            return None
+
+        path = []
+        while index is not None:
+            path.append(self._position(index))
+            index = parents[index]
+        return path[::-1]
+
+if __name__ == "__main__":
+
+    from sense_plan_act.grid_map import GridMap
+    from sense_plan_act.planner import Planner
+
+    grid_map = GridMap.random(40, 30, 0.25, np.random.default_rng(5), target=(25,20))
+    path_planner = PathPlanner(grid_map)
+    print(path_planner)
+
+    # Test A* search
+    path = path_planner.find_path((0,0), (25,20))
+    print(path if path is None else len(path) - 1)
+
+    # Test registration as plan and action selection
+    planner = Planner('search')
+    planner.add_plan('go', [(planner.check_battery, path_planner)])
+    perceptions = {'battery_level': 100, 'position': (0,0), 'target': (25,20)}
+    perceptions.update(grid_map.get_directions_state((0,0)))
+    print(planner.select_action(planner.compile('search'), perceptions))
+    print(path_planner.get_distance_field()[0,0])
+
+    # Test incremental repair against a computation from scratch
+    for position in path[1:6]: path_planner.set_blocked(position)
+    repaired = path_planner.get_distance_field().copy()
+    path_planner._compute_distances((25,20))
+    print(np.array_equal(repaired, path_planner.get_distance_field()))
@@ -0,0 +1,291 @@
+"""
+    Class representing the perceptions received by the planner at a time step.
+"""
+
+from collections.abc import MutableMapping
+import math
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+
+# Heading, in radians from the x axis, of each direction: forward is +y as in Sensor.update_position
+HEADINGS = {'left': math.pi, 'right': 0.0, 'forward': math.pi / 2, 'backward': -math.pi / 2}
+
+# Bit of the mask of blocked directions associated to each direction
+BITS = {direction: 1 << index for index, direction in enumerate(DIRECTIONS)}
+ALL_BLOCKED = (1 << len(DIRECTIONS)) - 1
+
+# Perceptions stored as attributes rather than as samples of a sensor
+FIELDS = ('position', 'target', 'battery_level', 'orientation')
+
+class Perception(MutableMapping):
+
+    __slots__ = ('position', 'target', 'battery_level', 'orientation', 'blocked', 'samples', '_extra')
+
+    def __init__(self, position:tuple=(0,0), target:tuple=None, battery_level:float=100, blocked:int=0, samples:dict=None,
+                 orientation:str='forward') -> None:
+
+        """
+            Method to initialize the perceptions of a time step.
+            Perceptions are kept in slots, with the state of the four directions packed in the bits of an integer,
+            and can be read and written with the same string keys as a dictionary, so existing rules keep working.
+
+            Args:
+                position (tuple): x,y position of the robot.
+                target (tuple): x,y position of the target, None if unknown.
+                battery_level (float): float representing the battery level of the robot.
+                blocked (int): mask of blocked directions, where bit i is set when DIRECTIONS[i] is blocked.
+                samples (dict): dictionary associating to each sensor the view of its latest samples.
+                orientation (str): current orientation of the robot.
+
+            Returns:
+                Perception: new instance of the Perception class.
+        """
+
+        self.position = position
+        self.target = target
+        self.battery_level = battery_level
+        self.orientation = orientation
+        self.blocked = blocked
+        self.samples = samples if samples is not None else {}
+        self._extra = None # Dictionary of perceptions of any other kind, created only when needed
+
+    def __repr__(self) -> str:
+        return f"Perception({dict(self)})"
+
+    def __getitem__(self, key:str):
+        bit = BITS.get(key)
+        if bit is not None: return 'blocked' if self.blocked & bit else 'free'
+        if key == 'position': return self.position
+        if key == 'target': return self.target
+        if key == 'battery_level': return self.battery_level
+        if key == 'orientation': return self.orientation
+        if key in self.samples: return self.samples[key]
+        if self._extra is not None and key in self._extra: return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key:str, value) -> None:
+        bit = BITS.get(key)
+        if bit is not None:
+            if value == 'blocked': self.blocked |= bit
+            else: self.blocked &= ~bit
+        elif key in FIELDS: setattr(self, key, value)
+        elif key in self.samples: self.samples[key] = value
+        else:
+            if self._extra is None: self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key:str) -> None:
+        if key in self.samples: del self.samples[key]
+        elif self._extra is not None and key in self._extra: del self._extra[key]
+        else: raise KeyError(f"Perception {key} cannot be removed.")
+
+    def __iter__(self):
+        yield from FIELDS
+        yield from DIRECTIONS
+        for key in self.samples:
+            if key not in FIELDS: yield key
+        if self._extra is not None: yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def is_free(self, direction:str) -> bool:
+        """
+            Method determining whether a direction is free, without building its state string.
+
+            Args:
+                direction (str): one of the four directions.
+
+            Returns:
+                is_free (bool): True if the direction is free, False if blocked.
+        """
+        return not self.blocked & BITS[direction]
+
+    def is_trapped(self) -> bool:
+        """
+            Method determining whether all the directions are blocked.
+        """
+        return self.blocked == ALL_BLOCKED
+
+    def get_blocked(self) -> int:
+        """
+            Method to get the mask of blocked directions, where bit i is set when DIRECTIONS[i] is blocked.
+        """
+        return self.blocked
+
+class LazyPerception(Perception):
+
+    __slots__ = ('_sources', '_ready')
+
+    def __init__(self, **kwargs) -> None:
+
+        """
+            Method to initialize perceptions produced on demand.
+            Each perception can be given a source: a function producing it, possibly together with other
+            perceptions, such as the four directions given by a single camera read. A source is called the first
+            time one of its perceptions is read at a time step, and its values are kept until the next time step.
+
+            Args:
+                kwargs: initial perceptions, as for Perception.
+
+            Returns:
+                LazyPerception: new instance of the LazyPerception class.
+        """
+
+        super().__init__(**kwargs)
+        self._sources = {} # Tuple (keys, function) producing each perception
+        self._ready = set() # Perceptions already produced at the current time step
+
+    def add_source(self, keys:tuple, produce) -> None:
+        """
+            Method to set the source of some perceptions.
+
+            Args:
+                keys (tuple): perceptions produced together by the source.
+                produce (callable): function called with the perceptions, setting the values of keys.
+        """
+        source = (tuple(keys), produce)
+        for key in source[0]: self._sources[key] = source
+
+    def clear_sources(self) -> None:
+        """
+            Method removing the sources of all the perceptions.
+        """
+        self._sources.clear()
+
+    def begin_tick(self) -> None:
+        """
+            Method starting a new time step: perceptions with a source will be produced again when read.
+        """
+        self._ready.clear()
+
+    def load(self, key:str) -> None:
+        """
+            Method producing a perception, and the others of the same source, unless already produced at this time step.
+        """
+        if key in self._ready: return
+        source = self._sources.get(key)
+        if source is None: return
+        keys, produce = source
+        self._ready.update(keys) # Marked first, so that a source can read the perceptions it sets
+        produce(self)
+
+    def get_ready(self) -> frozenset:
+        """
+            Method to get the perceptions with a source already produced at the current time step.
+        """
+        return frozenset(self._ready)
+
+    def __getitem__(self, key:str):
+        if key not in self._ready and key in self._sources: self.load(key)
+        return Perception.__getitem__(self, key)
+
+    def __setitem__(self, key:str, value) -> None:
+        if key not in self._ready and key in self._sources: self.load(key) # A perception set before being read is not produced again
+        Perception.__setitem__(self, key, value)
+
+    def is_free(self, direction:str) -> bool:
+        self.load(direction)
+        return not self.blocked & BITS[direction]
+
+    def is_trapped(self) -> bool:
+        self.load(DIRECTIONS[0])
+        return self.blocked == ALL_BLOCKED
+
+    def get_blocked(self) -> int:
+        self.load(DIRECTIONS[0])
+        return self.blocked
+
+def depends_on(*keys, coarse:tuple=()):
+    """
+        Function returning a decorator declaring the perceptions read by a condition or an action of a rule.
+        Declarations let the sensing layer attach only the sensors a plan needs, and the planner cache its choices.
+
+        Args:
+            keys (str): perceptions read by the decorated function.
+            coarse (tuple): perceptions the function only reads through their coarse state, so that the planner cache
+                            can treat as equal the perceptions with the same coarse state: battery_level only compared
+                            with the energy needed by actions, position and target only through the offset between
+                            them, and whether the target is known.
+
+        Returns:
+            decorator (callable): function setting the attributes dependencies and coarse of the decorated function and returning it.
+    """
+
+    def decorator(function):
+        function.dependencies = frozenset(keys)
+        function.coarse = frozenset(coarse)
+        return function
+    return decorator
+
+def nondeterministic(function):
+    """
+        Function decorating a condition or an action whose result does not only depend on the perceptions, because it
+        is random or keeps a state, so that the planner never caches the choices of a plan using it.
+    """
+    function.deterministic = False
+    return function
+
+def get_dependencies(function) -> frozenset:
+    """
+        Function to get the perceptions read by a condition or an action of a rule.
+
+        Args:
+            function (callable | str): condition or action of a rule. Actions given as strings read no perception.
+
+        Returns:
+            dependencies (frozenset): perceptions read by the function, None if it does not declare them.
+    """
+    if isinstance(function, str): return frozenset()
+    return getattr(function, 'dependencies', None)
+
+def directions_mask(directions_state:dict) -> int:
+    """
+        Function packing a dictionary of direction states, as returned by Sensor.get_directions_state, in a mask.
+
+        Args:
+            directions_state (dict): dictionary associating to each direction either 'free' or 'blocked' state.
+
+        Returns:
+            blocked (int): mask of blocked directions, where bit i is set when DIRECTIONS[i] is blocked.
+    """
+
+    blocked = 0
+    for direction, bit in BITS.items():
+        if directions_state[direction] == 'blocked': blocked |= bit
+    return blocked
+
+if __name__ == "__main__":
+
+    import sys
+
+    from sense_plan_act.planner import Planner
+
+    # Test dictionary compatibility
+    perception = Perception((3,4), None, 80.0, directions_mask({'left': 'blocked', 'right': 'free', 'forward': 'blocked', 'backward': 'free'}))
+    print(perception)
+    print(perception['left'], perception['right'], perception.is_free('forward'), perception.get('temperature'))
+    perception['target'] = (3,5)
+    perception['in_front'] = 'water'
+    perception['left'] = 'free'
+    print(perception.blocked, perception['target'], 'in_front' in perception, len(perception))
+
+    # Test planner and rules added with add_plan
+    planner = Planner('search')
+    planner.add_plan('get_water', [(lambda perceptions: perceptions['in_front'] == 'water', 'take_water')])
+    print(planner.select_action(planner.compile('search'), perception), planner.select_action(planner.compile('get_water'), perception))
+
+    # Test size compared to a dictionary of the same perceptions
+    print(sys.getsizeof(perception), sys.getsizeof(dict(perception)))
+
+    # Test lazy perceptions: a source is called once per time step, the first time one of its perceptions is read
+    calls = []
+    lazy = LazyPerception()
+    lazy.add_source(DIRECTIONS, lambda perceptions: calls.append('camera') or setattr(perceptions, 'blocked', BITS['left']))
+    lazy.add_source(('position',), lambda perceptions: calls.append('gps') or setattr(perceptions, 'position', (1,2)))
+    print(lazy['left'], lazy['right'], lazy.is_free('forward'), calls)
+    lazy.begin_tick()
+    print(lazy['position'], lazy.get_ready(), calls)
+
+    # Test dependencies declared by the rules of the planner
+    print(sorted(planner.get_dependencies('search')), planner.get_dependencies('get_water'))
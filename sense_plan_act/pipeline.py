@@ -0,0 +1,282 @@
+"""
+    Classes implementing an asynchronous sensing pipeline, where each sensor produces data at its own rate.
+"""
+
+import asyncio
+import inspect
+import time
+
+class PerceptionStore:
+
+    def __init__(self) -> None:
+
+        """
+            Method to initialize a store keeping only the latest value of each perception.
+
+            Returns:
+                PerceptionStore: new instance of the PerceptionStore class.
+        """
+
+        self._values = {}
+        self._timestamps = {}
+
+    def __str__(self) -> str:
+        return f"Store with perceptions: {', '.join(self._values)}"
+
+    def update(self, key:str, value) -> None:
+        """
+            Method replacing the value of a perception.
+
+            Args:
+                key (str): string representing the name of the perception.
+                value: new value of the perception.
+        """
+        self._values[key] = value
+        self._timestamps[key] = time.monotonic()
+
+    def update_many(self, values:dict) -> None:
+        """
+            Method replacing the values of several perceptions at once.
+
+            Args:
+                values (dict): dictionary associating to the name of each perception its new value.
+        """
+        now = time.monotonic()
+        self._values.update(values)
+        for key in values: self._timestamps[key] = now
+
+    def get(self, key:str, default=None):
+        """
+            Method to get the latest value of a perception, or a default if it has never been produced.
+        """
+        return self._values.get(key, default)
+
+    def get_age(self, key:str) -> float:
+        """
+            Method to get the number of seconds since a perception was last updated, None if it never was.
+        """
+        timestamp = self._timestamps.get(key)
+        return None if timestamp is None else time.monotonic() - timestamp
+
+    def snapshot(self) -> dict:
+        """
+            Method to get the latest value of all the perceptions, without waiting for any sensor.
+
+            Returns:
+                perceptions (dict): copy of the dictionary of perceptions.
+        """
+        return dict(self._values)
+
+class SensePipeline:
+
+    def __init__(self, store:PerceptionStore=None) -> None:
+
+        """
+            Method to initialize an empty pipeline.
+
+            Args:
+                store (PerceptionStore): store where perceptions are published. If None, a new one is created.
+
+            Returns:
+                SensePipeline: new instance of the SensePipeline class.
+        """
+
+        self._store = store if store is not None else PerceptionStore()
+        self._sources = [] # Tuples (key, read, rate, blocking, merge)
+        self._tasks = []
+        self._reads = {} # Number of completed reads for each source
+        self._failures = {} # Number of reads that raised an exception for each source
+        self._errors = {} # Last exception raised by each source
+
+    def __str__(self) -> str:
+        return f"Pipeline with {len(self._sources)} sources, {'running' if self._tasks else 'stopped'}."
+
+    @classmethod
+    def from_robot(cls, robot, rates:dict=None, blocking:tuple=('camera', 'ultra_sound')) -> 'SensePipeline':
+        """
+            Method building a pipeline producing the same perceptions as the loop in main.py.
+
+            Args:
+                robot (Robot): robot whose sensors feed the pipeline.
+                rates (dict): dictionary associating to each perception its frequency in Hz. Missing ones run at 10 Hz.
+                blocking (tuple): perceptions whose reads are slow and are performed in a separate thread.
+
+            Returns:
+                pipeline (SensePipeline): new instance of the SensePipeline class.
+        """
+
+        rates = rates if rates is not None else {}
+        pipeline = cls()
+        gps = robot._sensors['position']
+        camera = robot._sensors['camera']
+
+        def read_target():
+            is_visible, position = camera.target_visible(gps.get_position())
+            if is_visible: robot._target_position = position
+            return robot._target_position
+
+        for type, sensor in robot._sensors.items():
+            if type in ('position', 'battery_level'): continue
+            pipeline.add_source(type, sensor.get_all_data, rates.get(type, 10.0), type in blocking)
+        pipeline.add_source('position', gps.get_position, rates.get('position', 10.0))
+        pipeline.add_source('battery_level', lambda: robot._battery_level, rates.get('battery_level', 10.0))
+        pipeline.add_source('target', read_target, rates.get('target', 10.0), 'camera' in blocking)
+        pipeline.add_source('directions', lambda: camera.get_directions_state(gps.get_position()),
+                            rates.get('directions', 10.0), 'camera' in blocking, merge=True)
+        return pipeline
+
+    def get_store(self) -> PerceptionStore:
+        """
+            Method to get the store where perceptions are published.
+        """
+        return self._store
+
+    def get_reads(self) -> dict:
+        """
+            Method to get the number of reads completed by each source since the pipeline started.
+        """
+        return dict(self._reads)
+
+    def get_failures(self) -> dict:
+        """
+            Method to get the number of reads of each source that raised an exception since the pipeline started.
+        """
+        return dict(self._failures)
+
+    def get_errors(self) -> dict:
+        """
+            Method to get the last exception raised by each source that failed, such as SensorUnavailable.
+        """
+        return dict(self._errors)
+
+    def add_source(self, key:str, read, rate:float, blocking:bool=False, merge:bool=False) -> None:
+        """
+            Method adding a producer of perceptions to the pipeline.
+
+            Args:
+                key (str): string representing the name of the perception produced.
+                read (callable): function without arguments returning the new value, or a coroutine function.
+                rate (float): float representing the frequency of the reads in Hz.
+                blocking (bool): True if read is slow, so that it is performed in a separate thread and does not stall the other sources.
+                merge (bool): True if read returns a dictionary of perceptions to publish, instead of a single value.
+
+            Raises:
+                ValueError: if rate is not positive.
+        """
+
+        if rate <= 0: raise ValueError(f"Rate of {key} must be positive, got {rate}.")
+        self._sources.append((key, read, rate, blocking, merge))
+
+    async def _produce(self, key:str, read, rate:float, blocking:bool, merge:bool) -> None:
+        """
+            Method reading a source at its own rate and publishing its values, until cancelled.
+            If a read lasts longer than the period, the following one starts immediately, without catching up.
+            A read raising an exception, such as an unavailable sensor, is counted as a failure and the store keeps
+            the last value published, whose age tells how stale it is, until a read of a following period succeeds.
+        """
+
+        loop = asyncio.get_running_loop()
+        period = 1.0 / rate
+        next_time = loop.time()
+        while True:
+            try:
+                value = await loop.run_in_executor(None, read) if blocking else read()
+                if inspect.isawaitable(value): value = await value
+            except Exception as error:
+                self._failures[key] = self._failures.get(key, 0) + 1
+                self._errors[key] = error
+            else:
+                if merge: self._store.update_many(value)
+                else: self._store.update(key, value)
+                self._reads[key] = self._reads.get(key, 0) + 1
+
+            next_time = max(next_time + period, loop.time())
+            await asyncio.sleep(next_time - loop.time())
+
+    def start(self) -> None:
+        """
+            Method starting a producer task for each source. It must be called from a running event loop.
+        """
+
+        if self._tasks: return
+        self._tasks = [asyncio.create_task(self._produce(*source)) for source in self._sources]
+
+    async def stop(self) -> None:
+        """
+            Method stopping all the producers and waiting for them to terminate.
+        """
+
+        for task in self._tasks: task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(self, duration:float) -> dict:
+        """
+            Method running the pipeline for a given time.
+
+            Args:
+                duration (float): float representing the number of seconds to run.
+
+            Returns:
+                perceptions (dict): latest value of all the perceptions when the pipeline stops.
+        """
+
+        self.start()
+        try: await asyncio.sleep(duration)
+        finally: await self.stop()
+        return self._store.snapshot()
+
+if __name__ == "__main__":
+
+    from sense_plan_act.robot import Robot
+    from sense_plan_act.sensor import Sensor
+    from sense_plan_act.planner import Planner
+
+    sensors = {'position': Sensor('position', 1.0, 10), 'camera': Sensor('camera', 0.0, 1),
+               'ultra_sound': Sensor('ultra_sound', 100.0, 10)}
+    robot = Robot('WaterFinder', (1.5, 0.3), 20, sensors, {}, Planner('search'))
+
+    # Slow camera: each read takes 0.2 seconds
+    camera_read = sensors['camera'].get_all_data
+    def slow_camera():
+        time.sleep(0.2)
+        return camera_read()
+    sensors['camera'].get_all_data = slow_camera
+
+    pipeline = SensePipeline.from_robot(robot, {'position': 100.0, 'camera': 20.0, 'directions': 50.0})
+    print(pipeline)
+
+    async def control(rate:float, duration:float) -> list:
+        # Control loop reading the store without waiting for the sensors
+        plan = robot._planner.compile('search')
+        store = pipeline.get_store()
+        latencies = []
+        pipeline.start()
+        await asyncio.sleep(0.05)
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            start = time.monotonic()
+            robot._planner.select_action(plan, store.snapshot())
+            latencies.append(time.monotonic() - start)
+            await asyncio.sleep(1.0 / rate)
+        await pipeline.stop()
+        return latencies
+
+    latencies = asyncio.run(control(100.0, 1.0))
+    print(f"Control ticks: {len(latencies)}, max latency: {max(latencies)*1000:.3f} ms")
+    print(pipeline.get_reads())
+
+    # Test that a sensor dropping out is counted as failing, and read again once restored
+    async def dropout() -> None:
+        pipeline.start()
+        await asyncio.sleep(0.1)
+        sensors['ultra_sound'].set_unavailable()
+        await asyncio.sleep(0.1)
+        age = pipeline.get_store().get_age('ultra_sound')
+        sensors['ultra_sound'].restore_sensor()
+        await asyncio.sleep(0.1)
+        await pipeline.stop()
+        print(f"Failures: {pipeline.get_failures()}, {pipeline.get_errors()}, age during dropout: {age:.2f} s")
+
+    asyncio.run(dropout())
+    print(pipeline.get_reads())
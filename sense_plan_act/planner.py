@@ -2,7 +2,10 @@
     Class representing the planner used by the robot.
 """
 
-import random
+from collections import OrderedDict
+
+from sense_plan_act.decision_table import DecisionTable
+from sense_plan_act.perception import DIRECTIONS, Perception, depends_on, directions_mask
 
 class Planner:
     
@@ -21,13 +24,22 @@ class Planner:
         self._directions = ['left','right','forward','backward']
 
         self._goal: str = goal
+        target_known = depends_on('target', coarse=('target',))(lambda perceptions: perceptions['target'])
         self._plans = {
             'wonder': [(self.check_battery, self.choose_dir)],
             'go': [(self.check_battery, self.choose_best_dir)],
-            'search': [(self.target_reached, 'pick_up'),(lambda perceptions: perceptions['target'],'go'), (self.check_battery,'wonder')]
+            'search': [(self.target_reached, 'pick_up'),(target_known,'go'), (self.check_battery,'wonder')]
         }
-        self._rules = [(lambda perceptions: perceptions['target'],'go'), (self.check_battery,'wonder')]
-    
+        self._rules = [(target_known,'go'), (self.check_battery,'wonder')]
+        self._compiled = {} # Decision tables compiled for the goals of the library
+        self._energy_model = None # Optional energy model used to reject the actions the battery cannot pay for
+
+        # Optional cache of the actions selected in each perceived state, disabled until set_cache is called
+        self._cache = None
+        self._cache_size = 0
+        self._cache_keys = {} # Function computing the state of the perceptions read by each compiled table, False if not cacheable
+        self._hits = self._misses = self._bypasses = 0
+
     def get_plans(self) -> dict:
         """
             Method to get all available plans for the robot.
@@ -40,14 +52,147 @@ class Planner:
 
     def add_plan(self, goal:str, rules:list) -> None:
         """
-            Method to add a plan in the to the library of plans
+            Method to add a plan in the to the library of plans.
+            Compiled decision tables are discarded, since any of them may refer to the changed plan.
 
             Args:
                 goal (str): string for the goal of the new plan.
-                rules (list): list of condition-action rules composing the plan. 
+                rules (list): list of condition-action rules composing the plan.
         """
         self._plans[goal] = rules
-    
+        self._compiled.clear()
+        self._clear_cache()
+
+    def set_energy_model(self, energy_model) -> None:
+        """
+            Method to set the energy model used to check the battery and to skip the directions the robot cannot afford.
+
+            Args:
+                energy_model (EnergyModel): energy model of the robot, or None to only check that the battery is not empty.
+        """
+        self._energy_model = energy_model
+        self._clear_cache()
+
+    def set_cache(self, size:int=1024) -> None:
+        """
+            Method enabling a bounded cache of the actions selected by compiled plans, or disabling it.
+            Actions are cached for the state of the perceptions the plan reads, as declared with depends_on: directions,
+            coarse states of battery, position and target, and the exact value of any other perception. Plans with a
+            rule not declaring its perceptions, or marked nondeterministic, are never cached. When the cache is full,
+            the state used least recently is dropped. The cache is cleared when the library of plans changes.
+
+            Args:
+                size (int): maximum number of states in the cache, 0 to disable it.
+
+            Raises:
+                ValueError: if size is negative.
+        """
+
+        if size < 0: raise ValueError(f"Cache size must not be negative, got {size}.")
+        self._cache_size = size
+        self._cache = OrderedDict() if size else None
+        self._cache_keys.clear()
+        self._hits = self._misses = self._bypasses = 0
+
+    def _clear_cache(self) -> None:
+        """
+            Method discarding the cached actions, which may not be the ones the changed plans would select.
+        """
+        if self._cache is not None: self._cache.clear()
+        self._cache_keys.clear()
+
+    def get_cache_stats(self) -> dict:
+        """
+            Method to get the number of cache hits, misses and bypasses, by plans that cannot be cached, and the hit rate.
+        """
+        looked_up = self._hits + self._misses
+        return {'hits': self._hits, 'misses': self._misses, 'bypasses': self._bypasses, 'size': len(self._cache) if self._cache is not None else 0,
+                'hit_rate': self._hits / looked_up if looked_up else 0.0}
+
+    def _coarse_battery(self, perceptions:dict):
+        """
+            Method returning the coarse state of the battery: whether it is not empty, or with an energy model its level
+            up to the cost of the most expensive action, above which every action is affordable.
+        """
+        if self._energy_model is None: return perceptions['battery_level'] != 0
+        return min(perceptions['battery_level'], self._energy_model.get_max_cost(perceptions.get('payload', 0.0)))
+
+    def _state_function(self, table:DecisionTable):
+        """
+            Method generating the function computing the state of the perceptions read by a table, False if it cannot be cached.
+            As for decision tables, the function is generated as source and compiled, so that it builds the key in one expression.
+        """
+
+        dependencies = table.get_dependencies()
+        if dependencies is None or not table.is_deterministic(): return False
+
+        def is_coarse(key:str) -> bool:
+            return all(key in getattr(function, 'coarse', ()) for function in table.get_functions()
+                       if not isinstance(function, str) and key in function.dependencies)
+
+        namespace = {'goal': table.get_goal(), 'Perception': Perception, 'directions_mask': directions_mask,
+                     'coarse_battery': self._coarse_battery, 'target_offset': _target_offset}
+        terms, rest = ['goal'], set(dependencies)
+        if rest.issuperset(DIRECTIONS):
+            terms.append('(perceptions.get_blocked() if isinstance(perceptions, Perception) else directions_mask(perceptions))')
+            rest.difference_update(DIRECTIONS)
+        if 'battery_level' in rest and is_coarse('battery_level'):
+            terms.append('coarse_battery(perceptions)')
+            rest.discard('battery_level')
+        if ('position' in rest or 'target' in rest) and is_coarse('position') and is_coarse('target'):
+            terms.append('target_offset(perceptions)')
+            rest.difference_update(('position', 'target'))
+        terms.extend(f'perceptions.get({key!r})' for key in sorted(rest))
+
+        exec(compile(f"def state(perceptions): return ({', '.join(terms)})", f'<state of {table.get_goal()}>', 'exec'), namespace)
+        return namespace['state']
+
+    def _select_cached(self, table:DecisionTable, perceptions:dict):
+        """
+            Method selecting the action of a table through the cache, planning only in states not seen recently.
+        """
+
+        state = self._cache_keys.get(table)
+        if state is None:
+            # Tables of random plans, not kept by compile, are not cached
+            goal = table.get_goal()
+            state = self._cache_keys[table] = self._state_function(table) if self._compiled.get(goal) is table else False
+        if state is False:
+            self._bypasses += 1
+            return table.select(perceptions)
+
+        key = state(perceptions)
+        cache = self._cache
+        try: cached = cache.get(key)
+        except TypeError: # Perceptions that cannot be hashed, such as arrays of samples
+            self._bypasses += 1
+            return table.select(perceptions)
+
+        if cached is not None:
+            self._hits += 1
+            cache.move_to_end(key)
+            table._last[0] = cached[1]
+            return cached[0]
+
+        self._misses += 1
+        action = table.select(perceptions)
+        cache[key] = (action, table.get_last_plan())
+        if len(cache) > self._cache_size: cache.popitem(last=False)
+        return action
+
+    def _cost(self, direction:str, perceptions:dict) -> float:
+        """
+            Method to get the energy predicted for moving, or turning, towards a direction, zero without an energy model.
+        """
+        if self._energy_model is None: return 0.0
+        return self._energy_model.action_cost(direction, perceptions.get('orientation', 'forward'), perceptions.get('payload', 0.0))
+
+    def _affordable(self, direction:str, perceptions:dict) -> bool:
+        """
+            Method determining whether the battery can pay for moving, or turning, towards a direction.
+        """
+        return self._energy_model is None or self._cost(direction, perceptions) <= perceptions['battery_level']
+
     def compute_random_plan(self, n:int) -> list:
         """
             Method computing a plan as a list of n random condition-action rules.
@@ -61,6 +206,7 @@ class Planner:
 
         if not isinstance(n, int): raise TypeError(f"{n} is not an integer.")  
 
+        import random # Only needed for random plans, so not imported with the module
         return [random.choice(self._rules) for _ in range(n)]
 
     def compute_subsumption_plan(self, goal:str) -> list:
@@ -77,37 +223,76 @@ class Planner:
         """
 
         # Check if plan exists in plans' library
-        for plan_goal, plan in self._plans.items():
-            if goal == plan_goal: return plan
+        plan = self._plans.get(goal)
+        if plan is not None: return plan
 
         # If no plan available
         return self.compute_random_plan(2)
-    
-    def select_action(self, plan:list, perceptions:dict) -> tuple:
+
+    def compile(self, goal:str) -> DecisionTable:
         """
-            Method that selects an action to perform from the possible condition-actions rules in the given plan. 
+            Method compiling the subsumption plan for a given goal into a flat, priority-ordered decision table.
+            Tables of goals in the library are cached until the library is changed with add_plan.
+            If no plan is available for the goal, a random plan is compiled and not cached.
+
+            Args:
+                goal (str): string specifying the goal of the plan.
+
+            Returns:
+                table (DecisionTable): decision table equivalent to the subsumption plan for the goal.
+        """
+
+        table = self._compiled.get(goal)
+        if table is None:
+            table = DecisionTable(goal, self.compute_subsumption_plan(goal), self._plans)
+            if goal in self._plans: self._compiled[goal] = table
+        return table
+
+    def get_dependencies(self, goal:str) -> frozenset:
+        """
+            Method to get the perceptions read by the plan for a given goal, and by its sub-plans.
+            Conditions and actions declare the perceptions they read with the depends_on decorator.
+
+            Args:
+                goal (str): string specifying the goal of the plan.
+
+            Returns:
+                dependencies (frozenset): perceptions read by the rules of the plan, None if any of them does not declare them.
+        """
+        return self.compile(goal).get_dependencies()
+
+    def select_action(self, plan, perceptions:dict) -> tuple:
+        """
+            Method that selects an action to perform from the possible condition-actions rules in the given plan.
             Choice is based on just received perceptions.
 
             Args:
-                plan (list): list of condition-action rules composing the plan to reach the goal.
+                plan (list | DecisionTable): list of condition-action rules composing the plan to reach the goal, or its compiled decision table.
                 perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
-            
+
             Returns:
                 action (str): string representing action to perform at current time step.
                 action_type (str): string denoting the type of the action to be perfomed.
         """
+        if isinstance(plan, DecisionTable):
+            if self._cache is None: return plan.select(perceptions)
+            return self._select_cached(plan, perceptions)
+
         for (condition, action) in plan:
-            if condition(perceptions) and action in self._plans: 
+            if not condition(perceptions): continue
+            if action in self._plans:
                 action = self.select_action(self._plans[action], perceptions)
                 if action is not None: return action
-            elif condition(perceptions):
-                if isinstance(action, str): return action 
+            else:
+                if isinstance(action, str): return action
                 return action(perceptions)
         return None
 
+    @depends_on('battery_level', 'payload', coarse=('battery_level',))
     def check_battery(self, perceptions:dict) -> bool:
         """
             Method that checks if the battery level is different from zero percent.
+            With an energy model, the battery must be able to pay at least for the cheapest movement.
 
             Args:
                 perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
@@ -115,8 +300,11 @@ class Planner:
             Returns:
                 is_not_empty (bool): True if battery level is different from zero percent, False otherwise.
         """
+        if self._energy_model is not None:
+            return perceptions['battery_level'] >= self._energy_model.get_min_cost(perceptions.get('payload', 0.0))
         return perceptions['battery_level'] != 0
             
+    @depends_on('battery_level', 'orientation', 'payload', *DIRECTIONS, coarse=('battery_level',))
     def choose_dir(self, perceptions:dict) -> str:
         """
             Method determining the direction for next move not considering any distance metric to choose.
@@ -129,12 +317,14 @@ class Planner:
         """
 
         for direction in self._directions:
-            if perceptions[direction] == "free": return direction
+            if perceptions[direction] == "free" and self._affordable(direction, perceptions): return direction
         return 'trapped'
 
+    @depends_on('position', 'target', 'battery_level', 'orientation', 'payload', *DIRECTIONS, coarse=('position', 'target', 'battery_level'))
     def choose_best_dir(self, perceptions:dict) -> str:
         """
             Method determining the direction for next move minimizing manhattan distance to target.
+            With an energy model, directions at the same distance are sorted by the energy needed to move towards them.
             
             Args:
                 perceptions (dict): dictionary of perceptions received by the robot from sensors at last time step.
@@ -151,11 +341,16 @@ class Planner:
                     'forward': abs(x-xt) + abs((y+1)-yt),
                     'backward': abs(x-xt) + abs((y-1)-yt)}
     
-        sorted_directions = sorted(distancies, key=distancies.get, reverse=False)
+        if self._energy_model is None: sorted_directions = sorted(distancies, key=distancies.get, reverse=False)
+        else:
+            orientation, payload = perceptions.get('orientation', 'forward'), perceptions.get('payload', 0.0)
+            step_cost = self._energy_model.step_cost
+            sorted_directions = sorted(distancies, key=lambda direction: (distancies[direction], step_cost(direction, orientation, payload)))
         for direction in sorted_directions: 
-            if perceptions[direction] == 'free': return direction
+            if perceptions[direction] == 'free' and self._affordable(direction, perceptions): return direction
         return 'trapped'
     
+    @depends_on('position', 'target', coarse=('position', 'target'))
     def target_reached(self, perceptions:dict) -> bool:
         """
             Method determining whether the robot has reached its target or not.
@@ -171,6 +366,15 @@ class Planner:
         xt,yt = perceptions['target']
         return abs(x-xt) + abs(y-yt) == 1
 
+def _target_offset(perceptions:dict) -> tuple:
+    """
+        Function returning the offset of the position from the target, None if the target is unknown.
+    """
+    target = perceptions['target']
+    if target is None: return None
+    position = perceptions['position']
+    return (position[0] - target[0], position[1] - target[1])
+
 if __name__ == "__main__":
     planner = Planner('search')
 
@@ -192,3 +396,21 @@ if __name__ == "__main__":
     # Test select_action
     print(planner.select_action(plan, {'battery_level':100, 'position': (10,10), 'left':'blocked', 'right':'free', 'forward':'blocked', 'backward':'blocked', 'target': None}))
     print(planner.select_action(plan, {'battery_level':100, 'position': (10,10), 'left':'blocked', 'right':'free', 'forward':'free', 'backward':'blocked', 'target': (20,10)}))
+
+    # Test compile
+    table = planner.compile('search')
+    print(table)
+    print(planner.select_action(table, {'battery_level':100, 'position': (10,10), 'left':'blocked', 'right':'free', 'forward':'free', 'backward':'blocked', 'target': (20,10)}))
+    planner.add_plan('go', [(planner.check_battery, 'forward')])
+    print(planner.compile('search') is table)
+
+    # Test cache: same state at another position relative to the same offset from the target, and invalidation
+    import random
+    from sense_plan_act.perception import nondeterministic
+    planner = Planner('search')
+    planner.set_cache(16)
+    perceptions = {'battery_level':100, 'position': (10,10), 'left':'blocked', 'right':'free', 'forward':'free', 'backward':'blocked', 'target': (20,10)}
+    print(planner.select_action(planner.compile('search'), perceptions), planner.select_action(planner.compile('search'), dict(perceptions, position=(0,0), target=(10,0))))
+    planner.add_plan('wonder', [(planner.check_battery, nondeterministic(lambda perceptions: random.choice(planner._directions)))])
+    planner.select_action(planner.compile('search'), perceptions)
+    print(planner.get_cache_stats())
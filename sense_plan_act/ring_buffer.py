@@ -0,0 +1,273 @@
+"""
+    Class representing a fixed-capacity buffer keeping the latest samples collected by a sensor.
+"""
+
+from collections import deque
+
+import numpy as np
+
+# Blocks with fewer samples than this have their statistics computed without NumPy
+SMALL_BLOCK = 64
+
+class RingBuffer:
+
+    def __init__(self, capacity:int, dtype=np.float64) -> None:
+
+        """
+            Method to initialize the buffer, allocating all the memory it will ever use.
+            Every sample is written twice, capacity slots apart, so that the latest samples are always contiguous
+            in memory and can be returned as views without copies.
+
+            Args:
+                capacity (int): integer representing the maximum number of samples kept.
+                dtype (np.dtype): type of the samples.
+
+            Returns:
+                RingBuffer: new instance of the RingBuffer class.
+
+            Raises:
+                ValueError: if capacity is not positive.
+        """
+
+        if capacity <= 0: raise ValueError(f"Capacity must be positive, got {capacity}.")
+
+        self._capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._head = 0 # Slot where next sample is written
+        self._count = 0 # Number of samples appended since creation
+
+        # Running statistics of the samples currently in the buffer
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._minima = deque() # Candidates for the minimum, as (sample number, value) with increasing values
+        self._maxima = deque() # Candidates for the maximum, as (sample number, value) with decreasing values
+
+    def __str__(self) -> str:
+        return f"Buffer with {len(self)} samples out of {self._capacity}."
+
+    def __len__(self) -> int:
+        return min(self._count, self._capacity)
+
+    def append(self, value:float) -> None:
+        """
+            Method adding a sample to the buffer, overwriting the oldest one if the buffer is full.
+
+            Args:
+                value (float): value of the sample.
+        """
+
+        capacity, head = self._capacity, self._head
+        value = float(value)
+
+        # Remove oldest sample from the statistics
+        if self._count >= capacity:
+            old = float(self._data[head])
+            n = capacity - 1
+            if n == 0: self._mean, self._m2 = 0.0, 0.0
+            else:
+                delta = old - self._mean
+                self._mean -= delta / n
+                self._m2 -= delta * (old - self._mean)
+
+        self._data[head] = value
+        self._data[head + capacity] = value
+        self._head = head + 1 if head + 1 < capacity else 0
+        self._count += 1
+
+        # Add newest sample to the statistics
+        n = len(self)
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+
+        oldest = self._count - capacity
+        minima, maxima = self._minima, self._maxima
+        while minima and minima[-1][1] >= value: minima.pop()
+        while maxima and maxima[-1][1] <= value: maxima.pop()
+        minima.append((self._count, value))
+        maxima.append((self._count, value))
+        if minima[0][0] <= oldest: minima.popleft()
+        if maxima[0][0] <= oldest: maxima.popleft()
+
+    def extend(self, values) -> None:
+        """
+            Method adding several samples to the buffer, in order.
+            Samples are written as a block, and statistics are updated by merging the ones of the block,
+            so the cost in Python does not grow with the number of samples.
+
+            Args:
+                values (iterable): values of the samples.
+        """
+
+        values = np.asarray(values, dtype=self._data.dtype).ravel()
+        capacity = self._capacity
+        if len(values) >= capacity:
+            self.clear()
+            values = values[-capacity:]
+        k = len(values)
+        if k == 0: return
+
+        # Statistics of small blocks are computed on lists, as NumPy calls cost more than the loops they replace
+        small = k < SMALL_BLOCK
+        block = values.tolist() if small else values
+        moments = _moments_small if small else _moments
+
+        # Remove the samples that are going to be overwritten from the statistics
+        n = len(self)
+        evicted = n + k - capacity
+        if evicted > 0:
+            old = self.latest(n)[:evicted]
+            self._remove_block(n, *moments(old.tolist() if small else old), evicted)
+            n -= evicted
+
+        # Write the block twice, splitting it where it wraps around
+        head = self._head
+        first = min(k, capacity - head)
+        self._data[head:head+first] = values[:first]
+        self._data[head+capacity:head+capacity+first] = values[:first]
+        if first < k:
+            self._data[:k-first] = values[first:]
+            self._data[capacity:capacity+k-first] = values[first:]
+        self._head = (head + k) % capacity
+
+        # Merge the statistics of the block
+        mean_block, m2_block = moments(block)
+        total = n + k
+        delta = mean_block - self._mean
+        self._mean += delta * k / total
+        self._m2 += m2_block + delta * delta * n * k / total
+
+        # Candidates for minimum and maximum are the samples smaller, or larger, than all the following ones
+        start = self._count + 1
+        self._count += k
+        oldest = self._count - capacity
+        for candidates, sign in ((self._minima, 1.0), (self._maxima, -1.0)):
+            new = _candidates_small(block, start, sign) if small else _candidates(values, start, sign)
+            best = new[0][1] * sign
+            while candidates and candidates[-1][1] * sign >= best: candidates.pop()
+            while candidates and candidates[0][0] <= oldest: candidates.popleft()
+            candidates.extend(new)
+
+    def _remove_block(self, n:int, mean_block:float, m2_block:float, k:int) -> None:
+        """
+            Method removing from the running mean and variance of n samples the ones of a block of k of them.
+        """
+
+        rest = n - k
+        if rest == 0:
+            self._mean, self._m2 = 0.0, 0.0
+            return
+        mean_rest = (n * self._mean - k * mean_block) / rest
+        delta = mean_block - mean_rest
+        self._m2 -= m2_block + delta * delta * rest * k / n
+        self._mean = mean_rest
+
+    def latest(self, k:int=None) -> np.ndarray:
+        """
+            Method to get the latest samples, from the oldest to the newest.
+            The returned array is a view on the buffer, so it is overwritten by the following samples.
+
+            Args:
+                k (int): number of samples to get. If None or larger than the number of samples, all of them are returned.
+
+            Returns:
+                samples (np.ndarray): view of the latest samples.
+        """
+
+        n = len(self)
+        k = n if k is None else max(0, min(k, n))
+        end = self._head + self._capacity
+        return self._data[end-k:end]
+
+    def clear(self) -> None:
+        """
+            Method removing all the samples from the buffer.
+        """
+        self._head, self._count = 0, 0
+        self._mean, self._m2 = 0.0, 0.0
+        self._minima.clear()
+        self._maxima.clear()
+
+    def mean(self) -> float:
+        """
+            Method to get the mean of the samples in the buffer, None if it is empty.
+        """
+        return self._mean if self._count else None
+
+    def variance(self) -> float:
+        """
+            Method to get the variance of the samples in the buffer, None if it is empty.
+        """
+        return max(self._m2, 0.0) / len(self) if self._count else None
+
+    def min(self) -> float:
+        """
+            Method to get the minimum of the samples in the buffer, None if it is empty.
+        """
+        return self._minima[0][1] if self._minima else None
+
+    def max(self) -> float:
+        """
+            Method to get the maximum of the samples in the buffer, None if it is empty.
+        """
+        return self._maxima[0][1] if self._maxima else None
+
+def _moments(values:np.ndarray) -> tuple:
+    """
+        Function returning mean and sum of squared deviations from the mean of an array.
+    """
+    mean = float(values.sum()) / len(values)
+    deviations = values - mean
+    return mean, float(deviations @ deviations)
+
+def _moments_small(values:list) -> tuple:
+    """
+        Function returning mean and sum of squared deviations from the mean of a list.
+    """
+    mean = sum(values) / len(values)
+    return mean, sum((value - mean) * (value - mean) for value in values)
+
+def _candidates(values:np.ndarray, start:int, sign:float) -> list:
+    """
+        Function returning, as (sample number, value) pairs, the samples of an array smaller than all the following ones.
+        With a negative sign, the samples larger than all the following ones are returned instead.
+    """
+    signed = values * sign
+    following = np.minimum.accumulate(signed[::-1])[::-1]
+    keep = np.empty(len(values), dtype=bool)
+    keep[:-1] = signed[:-1] < following[1:]
+    keep[-1] = True
+    return list(zip((np.flatnonzero(keep) + start).tolist(), values[keep].tolist()))
+
+def _candidates_small(values:list, start:int, sign:float) -> list:
+    """
+        Function equivalent to _candidates for a list, scanning it from the newest sample.
+    """
+    new = []
+    best = float('inf')
+    for index in range(len(values) - 1, -1, -1):
+        value = values[index]
+        if value * sign < best:
+            best = value * sign
+            new.append((start + index, value))
+    new.reverse()
+    return new
+
+if __name__ == "__main__":
+
+    buffer = RingBuffer(5)
+
+    # Test append and views
+    buffer.extend([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0])
+    print(buffer)
+    print(buffer.latest(), buffer.latest(3))
+
+    # Test running statistics against a full scan
+    samples = buffer.latest()
+    print(buffer.mean(), samples.mean())
+    print(buffer.variance(), samples.var())
+    print(buffer.min(), buffer.max())
+
+    # Test clear
+    buffer.clear()
+    print(buffer, buffer.mean())
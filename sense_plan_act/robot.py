@@ -2,13 +2,17 @@
     Class representing the physical characteristics of the robot.
 """
 
+import threading
+
 from sense_plan_act.planner import Planner
+from sense_plan_act.control_loop import ControlLoop
+from sense_plan_act.ids import IdAllocator
 
-id_counter:int = 0
+_ids = IdAllocator() # Identifiers of the robots of this process
 
 class Robot:
     
-    def __init__(self, name:str, dimensions:tuple, weight:float, sensors:list, actuators:list, planner:Planner) -> None:
+    def __init__(self, name:str, dimensions:tuple, weight:float, sensors:list, actuators:list, planner:Planner, energy_model=None) -> None:
 
         """
             Method to initialize a robot. 
@@ -20,18 +24,19 @@ class Robot:
                 sensors (dict): dictionary of Sensor objects representing sensors of the robot.
                 actuators (dict): dictionary of Actuator objects representing actuators of the robot.
                 planner (Planner): planner object that allows robot to plan.
+                energy_model (EnergyModel): optional model of the energy consumed by actions, shared with the planner.
+                                            If None, each action consumes the flat energy cost of its actuator.
             
             Returns:
                 Robot: new instance of the Robot class.
         """
 
-        global id_counter
-
-        self._id: int = id_counter
+        self._id: int = _ids.allocate()
         self._name = name
         self._dimensions = dimensions
         self._weight = weight
         self._battery_level = 100 # Initial battery level in %
+        self._lock = threading.Lock() # Guards the battery, which actuators running in worker threads consume
 
         self._target_position = None # Initially unknown target position
         self._orientation = 'forward' # Initial orientation of the robot
@@ -39,8 +44,8 @@ class Robot:
         self._sensors = sensors
         self._actuators = actuators
         self._planner = planner
-
-        id_counter += 1
+        self._energy_model = energy_model
+        if energy_model is not None: planner.set_energy_model(energy_model)
 
     def __str__(self) -> str:
         height, width = self._dimensions
@@ -62,6 +67,38 @@ class Robot:
         """
         self._battery_level = battery_percentage
 
+    def consume_energy(self, energy:float) -> None:
+        """
+            Method to subtract from the battery the energy consumed by an action.
+            The battery is updated under a lock, so that actuators performing commands in different threads never lose an update.
+
+            Args:
+                energy (float): energy consumed, in % of the battery.
+        """
+        with self._lock: self._battery_level -= energy
+
+    def run(self, goal:str=None, max_ticks:int=None, rate:float=None, recorder=None, fusion=None, lazy:bool=False, metrics=None,
+            kinematics=None, actuation=None) -> dict:
+        """
+            Method to perform Sense-Plan-Act until target is reached, battery expires or the robot is trapped.
+
+            Args:
+                goal (str): string representing the goal of the plan. If None, the goal of the planner is used.
+                max_ticks (int): optional integer limiting the number of time steps.
+                rate (float): optional frequency, in time steps per second, of the loop. If None, it runs as fast as possible.
+                recorder (TraceRecorder): optional recorder of perceptions, action and energy of each time step.
+                fusion (FusionStage): optional stage fusing the readings of the sensors into a belief on the position.
+                lazy (bool): whether sensors are read on demand, only when the rules evaluated read their perceptions.
+                metrics (Metrics): optional metrics counting plans, actions, pick ups, energy and latency of each time step.
+                kinematics (Kinematics): optional continuous motion model timing movements and turns and checking the footprint for collisions.
+                actuation (Actuation): optional command queues performing the actions in worker threads, with pick ups retried by the gripper.
+
+            Returns:
+                result (dict): dictionary describing how the mission ended.
+        """
+        return ControlLoop(self, goal, rate, recorder, fusion=fusion, lazy=lazy, metrics=metrics, kinematics=kinematics,
+                           actuation=actuation).run(max_ticks)
+
 if __name__ == "__main__":
 
     # Test initialization and to string
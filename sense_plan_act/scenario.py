@@ -0,0 +1,277 @@
+"""
+    Functions to load, validate and expand scenarios described in TOML or JSON files.
+"""
+
+import copy
+import inspect
+import itertools
+import json
+import os
+
+from sense_plan_act.energy import EnergyModel
+from sense_plan_act.faults import FaultInjector
+from sense_plan_act.grid_map import GridMap
+from sense_plan_act.mission import DEFAULT_CONFIG
+
+# Sections of a scenario file, any other key is reported as an error
+SECTIONS = ('name', 'goal', 'runs', 'seed', 'robot', 'sensors', 'actuators', 'map', 'stop', 'energy', 'explorer', 'lookahead', 'faults', 'sweep')
+
+# Sections that must be tables, checked before looking into them. Sensors, actuators and faults have their own messages
+TABLES = ('robot', 'map', 'stop', 'energy', 'explorer', 'lookahead', 'sweep')
+
+# Settings of the energy section, as the arguments of EnergyModel other than the ones build_robot gives
+ENERGY_SETTINGS = tuple(parameter for parameter in inspect.signature(EnergyModel).parameters if parameter not in ('actuators', 'weight'))
+
+# Sensors and actuators the control loop needs
+REQUIRED_SENSORS = ('position', 'camera')
+REQUIRED_ACTUATORS = ('motor', 'servo', 'gripper')
+
+def load_scenario(path:str) -> dict:
+    """
+        Function loading a scenario from a TOML or JSON file. The file is not validated.
+
+        Args:
+            path (str): path of a .toml or .json file.
+
+        Returns:
+            scenario (dict): dictionary describing the scenario, named after the file if it has no name.
+
+        Raises:
+            ValueError: if the extension of the file is not supported.
+    """
+
+    if path.endswith('.toml'):
+        import tomllib # Only needed for TOML files, so not imported with the module
+        with open(path, 'rb') as file: scenario = tomllib.load(file)
+    elif path.endswith('.json'):
+        with open(path) as file: scenario = json.load(file)
+    else: raise ValueError(f"Scenario {path} is neither a .toml nor a .json file.")
+
+    scenario.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    world = scenario.get('map')
+    if isinstance(world, dict) and isinstance(world.get('path'), str):
+        world['path'] = os.path.join(os.path.dirname(path), world['path']) # Map files are relative to the scenario
+    return scenario
+
+def _check_number(errors:list, where:str, value, minimum:float=None, integer:bool=False) -> None:
+    """
+        Function appending an error if a value is not a number, or is lower than a minimum.
+    """
+    kinds = int if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, kinds): errors.append(f"{where} must be {'an integer' if integer else 'a number'}, got {value!r}.")
+    elif minimum is not None and value < minimum: errors.append(f"{where} must be at least {minimum}, got {value}.")
+
+def _check_position(errors:list, where:str, value) -> None:
+    """
+        Function appending an error if a value is not an x,y position of integers.
+    """
+    if not isinstance(value, (list, tuple)) or len(value) != 2 or not all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        errors.append(f"{where} must be an x,y position of integers, got {value!r}.")
+
+def _check_inside(errors:list, where:str, value, shape:tuple) -> None:
+    """
+        Function appending an error if an x,y position is outside of a map of a given shape.
+    """
+    if not (0 <= value[0] < shape[0] and 0 <= value[1] < shape[1]): errors.append(f"{where} {list(value)} is outside of the {shape[0]}x{shape[1]} map.")
+
+def validate_scenario(scenario:dict) -> list:
+    """
+        Function checking a scenario, sweep included, without running it.
+        Every section is checked, so that a scenario passing validation does not fail in the middle of a sweep.
+
+        Args:
+            scenario (dict): dictionary describing the scenario, as returned by load_scenario.
+
+        Returns:
+            errors (list): list of strings describing each problem found, empty if the scenario is valid.
+    """
+
+    name = scenario.get('name', '?')
+    errors = [f"unknown section {key!r}." for key in scenario if key not in SECTIONS]
+    errors.extend(f"{section} must be a table, got {scenario[section]!r}." for section in TABLES
+                  if section in scenario and not isinstance(scenario[section], dict))
+    scenario = {key: value for key, value in scenario.items() if key not in TABLES or isinstance(value, dict)}
+
+    if not isinstance(scenario.get('goal', DEFAULT_CONFIG['goal']), str): errors.append("goal must be a string.")
+    _check_number(errors, 'runs', scenario.get('runs', 1), 1, integer=True)
+    if scenario.get('seed') is not None: _check_number(errors, 'seed', scenario['seed'], 0, integer=True)
+
+    robot = scenario.get('robot', {})
+    if 'weight' in robot: _check_number(errors, 'robot.weight', robot['weight'], 0)
+    if 'dimensions' in robot and (not isinstance(robot['dimensions'], list) or len(robot['dimensions']) != 2):
+        errors.append(f"robot.dimensions must be a list of two numbers, got {robot['dimensions']!r}.")
+
+    for section, required, fields in (('sensors', REQUIRED_SENSORS, ('range', 'max_samples')),
+                                      ('actuators', REQUIRED_ACTUATORS, ('max_speed', 'max_turning_speed', 'energy_cost'))):
+        devices = scenario.get(section, DEFAULT_CONFIG[section])
+        if not isinstance(devices, dict):
+            errors.append(f"{section} must be a table of devices.")
+            continue
+        errors.extend(f"{section}.{device} is missing." for device in required if device not in devices)
+        for device, description in devices.items():
+            if not isinstance(description, dict) or not isinstance(description.get('type'), str):
+                errors.append(f"{section}.{device} must have a type.")
+                continue
+            for field in fields:
+                _check_number(errors, f"{section}.{device}.{field}", description.get(field), 1 if field == 'max_samples' else 0, field == 'max_samples')
+
+    world = scenario.get('map')
+    if world is not None:
+        if 'path' in world:
+            if not os.path.exists(world['path']): errors.append(f"map.path {world['path']} does not exist.")
+        else:
+            _check_number(errors, 'map.width', world.get('width'), 1, integer=True)
+            _check_number(errors, 'map.height', world.get('height'), 1, integer=True)
+            if 'density' in world: _check_number(errors, 'map.density', world['density'], 0)
+            if isinstance(world.get('density'), (int, float)) and world['density'] > 1: errors.append(f"map.density must be at most 1, got {world['density']}.")
+        # Positions are checked against the size of the map, read from the file when it is loaded from one
+        shape = None
+        if 'path' not in world and all(isinstance(world.get(key), int) and world[key] >= 1 for key in ('width', 'height')): shape = (world['width'], world['height'])
+        elif isinstance(world.get('path'), str) and os.path.exists(world['path']):
+            try: shape = GridMap.load(world['path']).get_shape()
+            except (OSError, ValueError) as error: errors.append(f"map.path {world['path']} cannot be loaded: {error}")
+        for key in ('target', 'start'):
+            if key not in world: continue
+            count = len(errors)
+            _check_position(errors, f"map.{key}", world[key])
+            if len(errors) == count and shape is not None: _check_inside(errors, f"map.{key}", world[key], shape)
+
+    energy = scenario.get('energy')
+    if energy is not None:
+        errors.extend(f"unknown setting energy.{key}, use one of {', '.join(ENERGY_SETTINGS)}." for key in energy if key not in ENERGY_SETTINGS)
+
+    max_ticks = scenario.get('stop', {}).get('max_ticks')
+    if max_ticks is not None: _check_number(errors, 'stop.max_ticks', max_ticks, 1, integer=True)
+
+    explorer = scenario.get('explorer')
+    if explorer is not None and not explorer and world is None: errors.append("explorer needs a shape and an origin, or a map.")
+
+    lookahead = scenario.get('lookahead')
+    if lookahead is not None:
+        if 'shape' not in lookahead and world is None: errors.append("lookahead needs a shape, or a map.")
+        for field in ('horizon', 'n_candidates'):
+            if field in lookahead: _check_number(errors, f"lookahead.{field}", lookahead[field], 1, integer=True)
+
+    faults = scenario.get('faults')
+    if faults is not None:
+        if not isinstance(faults, dict) or not all(isinstance(profile, dict) for profile in faults.values()): errors.append("faults must be a table of sensors.")
+        else:
+            try: FaultInjector(faults)
+            except (ValueError, TypeError) as error: errors.append(f"faults: {error}")
+
+    for key, values in scenario.get('sweep', {}).items():
+        if not isinstance(values, list) or not values: errors.append(f"sweep.{key} must be a non-empty list of values.")
+        elif key.split('.')[0] not in SECTIONS or key.split('.')[0] == 'sweep': errors.append(f"sweep.{key} does not refer to a section of the scenario.")
+
+    return [f"{name}: {error}" for error in errors]
+
+def expand_scenario(scenario:dict) -> list:
+    """
+        Function expanding a scenario into one scenario for each combination of the values of its sweep.
+        Keys of the sweep are dotted paths in the scenario, such as 'sensors.camera.range' or 'map.density'.
+
+        Args:
+            scenario (dict): dictionary describing the scenario, with an optional 'sweep' table of lists of values.
+
+        Returns:
+            scenarios (list): list of scenarios without sweep, named after the values they take.
+    """
+
+    sweep = scenario.get('sweep', {})
+    base = {key: value for key, value in scenario.items() if key != 'sweep'}
+    if not sweep: return [base]
+
+    scenarios = []
+    keys = list(sweep)
+    for values in itertools.product(*(sweep[key] for key in keys)):
+        expanded = copy.deepcopy(base)
+        for key, value in zip(keys, values):
+            *parents, leaf = key.split('.')
+            node = expanded
+            for parent in parents: node = node.setdefault(parent, {} if parent not in ('sensors', 'actuators') else copy.deepcopy(DEFAULT_CONFIG[parent]))
+            node[leaf] = value
+        expanded['name'] = f"{base['name']}[{','.join(f'{key}={value}' for key, value in zip(keys, values))}]"
+        scenarios.append(expanded)
+    return scenarios
+
+def to_config(scenario:dict) -> dict:
+    """
+        Function converting a scenario into the configuration of a robot, in the same form as DEFAULT_CONFIG.
+        Sections missing from the scenario are taken from DEFAULT_CONFIG.
+
+        Args:
+            scenario (dict): dictionary describing a scenario without sweep.
+
+        Returns:
+            config (dict): dictionary accepted by build_robot and run_batch.
+    """
+
+    robot = scenario.get('robot', {})
+    config = {
+        'name': robot.get('name', DEFAULT_CONFIG['name']),
+        'dimensions': tuple(robot.get('dimensions', DEFAULT_CONFIG['dimensions'])),
+        'weight': robot.get('weight', DEFAULT_CONFIG['weight']),
+        'goal': scenario.get('goal', DEFAULT_CONFIG['goal']),
+        'sensors': scenario.get('sensors', DEFAULT_CONFIG['sensors']),
+        'actuators': scenario.get('actuators', DEFAULT_CONFIG['actuators']),
+        'max_ticks': scenario.get('stop', {}).get('max_ticks', DEFAULT_CONFIG['max_ticks'])
+    }
+    for key in ('map', 'energy', 'explorer', 'lookahead', 'faults'):
+        if key in scenario: config[key] = scenario[key]
+    return config
+
+def load_scenarios(paths:list) -> list:
+    """
+        Function loading, validating and expanding scenarios from many files.
+        Every file is checked before returning, so that a sweep does not stop half way because of a typo.
+
+        Args:
+            paths (list): list of paths of .toml or .json scenario files.
+
+        Returns:
+            scenarios (list): list of expanded scenarios, in the order of the files.
+
+        Raises:
+            ValueError: listing every problem found, if any scenario cannot be loaded or is not valid.
+    """
+
+    scenarios, errors = [], []
+    for path in paths:
+        try: scenario = load_scenario(path)
+        except (OSError, ValueError) as error: # Decoding errors of TOML and JSON are ValueError
+            errors.append(f"{path}: {error}")
+            continue
+        problems = validate_scenario(scenario)
+        if not problems:
+            # Values of the sweep are checked in each combination they are used in
+            expanded = expand_scenario(scenario)
+            for combination in expanded: problems.extend(validate_scenario(combination))
+            if not problems: scenarios.extend(expanded)
+        errors.extend(problems)
+
+    if errors: raise ValueError("Invalid scenarios:\n  " + "\n  ".join(errors))
+    return scenarios
+
+if __name__ == "__main__":
+
+    import tempfile
+
+    # Test loading, validation and expansion of a scenario with a sweep
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'grid.toml')
+        with open(path, 'w') as file:
+            file.write('runs = 4\nseed = 1\n[map]\nwidth = 30\nheight = 30\ntarget = [20, 25]\n[stop]\nmax_ticks = 500\n'
+                       '[sweep]\n"map.density" = [0.1, 0.3]\n"sensors.camera.range" = [0.0, 10.0]\n')
+        scenarios = load_scenarios([path])
+        print([scenario['name'] for scenario in scenarios])
+        print(to_config(scenarios[0])['map'], to_config(scenarios[3])['sensors']['camera'])
+
+        # Test that every problem is reported at once
+        with open(path, 'w') as file: file.write('runs = 0\ncolour = "red"\n[map]\nwidth = 10\n[sensors.camera]\ntype = "camera"\nrange = "far"\n')
+        try: load_scenarios([path, os.path.join(directory, 'missing.json')])
+        except ValueError as error: print(error)
+
+        # Test sections that are not tables, unknown energy settings and positions outside of the map
+        with open(path, 'w') as file: file.write('stop = 5\nrobot = "x"\n[energy]\nrolling = 0.1\nspeed = 2\n[map]\nwidth = 10\nheight = 10\ntarget = [10, 3]\nstart = [-1, 0]\n')
+        try: load_scenarios([path])
+        except ValueError as error: print(error)
@@ -2,14 +2,28 @@
     Class representing the sensors available to the robot.
 """
 
-import random
 import numpy as np
 
-id_counter:int = 0
+from sense_plan_act.ring_buffer import RingBuffer
+from sense_plan_act.events import NULL_LOG, DEBUG, SENSOR_READ
+from sense_plan_act.ids import IdAllocator
+
+_ids = IdAllocator() # Identifiers of the sensors of this process
+
+# Parameters of the dummy world shared by the sensors and by the fleet simulator
+TARGET_POSITION = (25,20)
+TARGET_PROBABILITY = 0.1
+BLOCKED_PROBABILITY = 0.2
+
+class SensorUnavailable(RuntimeError):
+    """
+        Exception raised when reading a sensor that is not available.
+    """
 
 class Sensor:
     
-    def __init__(self, type:str, range:float, max_samples:int) -> None:
+    def __init__(self, type:str, range:float, max_samples:int, rng:np.random.Generator=None, grid_map=None, events=None,
+                 noise:float=0.0) -> None:
 
         """
             Method to initialize a robot. 
@@ -18,74 +32,217 @@ class Sensor:
                 type (str): string representing the type of the sensor.
                 range (float): float representing the range of the sensor.
                 max_samples (int): integer representing maximum number of samples in memory.
+                rng (np.random.Generator): optional random generator used for all the extractions. If None, global random state is used.
+                grid_map (GridMap): optional map of the world answering obstacle and target queries. If None, they are extracted randomly.
+                events (EventLog): optional log receiving the events of the sensor. If None, events are discarded.
+                noise (float): standard deviation of the Gaussian noise of position and range measurements.
             
             Returns:
                 Sensor: new instance of the Sensor class.
         """
 
-        global id_counter
-
-        self._id: int = id_counter
+        self._id: int = _ids.allocate()
         self._type = type
         self._range = range
         self._max_samples = max_samples
         self._available = True
+        self._rng = rng
+        self._uniform = None # Function drawing samples from the global random state, set on the first read without a generator
+        self._grid_map = grid_map
+        self._events = events if events is not None else NULL_LOG
+        self._noise = noise
+        self._buffer = RingBuffer(max_samples) # Latest samples collected by the sensor
+        self._scratch = np.empty(max_samples) # Memory where new samples are extracted before being stored
         self._position = (0,0) # Initial position for the sensors and for the robot
 
         self._directions = ['left', 'right', 'forward', 'backward']
 
-        id_counter += 1
-
     def __str__(self) -> str:
         return f"This is a {self._type} sensor. Sensor's id is: {self._id} and range is: {self._range}"
     
-    def get_data(self, data_samples:int) -> list:
+    def read(self, data_samples:int=1) -> np.ndarray:
         """
-            Method to get data from the sensor.
+            Method to collect new data samples from the sensor and store them in memory.
+            Only the latest max_samples samples are kept.
 
             Args:
-                data_samples (int): integer representing the number of data samples to retrieve.
+                data_samples (int): integer representing the number of data samples to collect.
 
             Returns:
-                data (list): list containing values of collected data.
+                data (np.ndarray): view of the collected data, valid until the next samples are collected.
+
+            Raises:
+                SensorUnavailable: if the sensor is not available.
         """
-        return [random.uniform(1,100) for _ in range(data_samples)]
 
-    def get_all_data(self) -> None:
+        if not self._available: raise SensorUnavailable(f"Sensor {self._type} is not available.")
+        buffer, remaining = self._buffer, data_samples
+        while remaining > 0:
+            n = min(remaining, self._max_samples)
+            if self._rng is not None:
+                samples = self._scratch[:n]
+                self._rng.random(out=samples)
+                samples *= 99
+                samples += 1
+                buffer.extend(samples)
+            else:
+                uniform = self._uniform
+                if uniform is None:
+                    import random # Only needed without a generator, so not imported with the module
+                    uniform = self._uniform = random.uniform
+                buffer.extend([uniform(1,100) for _ in range(n)])
+            remaining -= n
+
+        self._events.emit(DEBUG, SENSOR_READ, self._type, data_samples)
+        return buffer.latest(data_samples)
+
+    def get_data(self, data_samples:int) -> np.ndarray:
         """
-            Method to get data all the data from the sensor.
+            Method to get the latest data samples stored in memory, without collecting new ones.
 
             Args:
                 data_samples (int): integer representing the number of data samples to retrieve.
 
             Returns:
-                data (list): list containing values of collected data.
+                data (np.ndarray): view of the latest data samples, at most max_samples of them.
+        """
+        return self._buffer.latest(data_samples)
+
+    def get_all_data(self) -> np.ndarray:
+        """
+            Method to collect a full set of max_samples new data samples from the sensor.
+
+            Returns:
+                data (np.ndarray): view of all the data samples in memory.
+        """
+
+        return self.read(self._max_samples)
+
+    def get_statistics(self) -> dict:
+        """
+            Method to get running statistics of the data samples in memory.
+
+            Returns:
+                statistics (dict): dictionary with mean, variance, min and max of the samples, None if there are no samples.
         """
 
-        return [random.uniform(1,100) for _ in range(self._max_samples)]
+        buffer = self._buffer
+        return {'mean': buffer.mean(), 'variance': buffer.variance(), 'min': buffer.min(), 'max': buffer.max()}
     
-    def target_visible(self) -> tuple:
+    def target_visible(self, position:tuple=None) -> tuple:
         """
             Method determining if the target is visible and which is its position.
+            With a map, the target is visible when it is within the range of the sensor.
+
+            Args:
+                position (tuple): optional x,y position of the robot. If None, position of the sensor is used.
 
             Returns:
                 is_visible (bool): boolean determining if the target is visible or not.
                 position (tuple): tuple representing x,y position of the target.
+
+            Raises:
+                SensorUnavailable: if the sensor is not available.
         """
-        is_visible = True if np.random.binomial(1, 0.1) == 1 else False
-        target_position = (25,20) if is_visible else None
+        if not self._available: raise SensorUnavailable(f"Sensor {self._type} is not available.")
+        if self._grid_map is not None:
+            is_visible = self._grid_map.target_visible(position if position is not None else self._position, self._range)
+            return is_visible, self._grid_map.get_target() if is_visible else None
+
+        binomial = self._rng.binomial if self._rng is not None else np.random.binomial
+        is_visible = True if binomial(1, TARGET_PROBABILITY) == 1 else False
+        target_position = TARGET_POSITION if is_visible else None
 
         return is_visible, target_position
     
-    def get_directions_state(self) -> dict:
+    def get_directions_state(self, position:tuple=None) -> dict:
         """
             Method determining for each possible movement direction whether it is free or blocked.
 
+            Args:
+                position (tuple): optional x,y position of the robot. If None, position of the sensor is used.
+
             Returns:
                 directions_state (dict): dictionary associating to each direction either 'free' or 'blocked' state.
+
+            Raises:
+                SensorUnavailable: if the sensor is not available.
         """
+        if not self._available: raise SensorUnavailable(f"Sensor {self._type} is not available.")
+        if self._grid_map is not None:
+            return self._grid_map.get_directions_state(position if position is not None else self._position)
+
         states = ['free','blocked']
-        return {direction: states[np.random.binomial(1,0.2)]  for direction in self._directions}
+        if self._rng is not None:
+            draws = self._rng.binomial(1, BLOCKED_PROBABILITY, len(self._directions))
+            return {direction: states[draw] for direction, draw in zip(self._directions, draws)}
+        return {direction: states[np.random.binomial(1,BLOCKED_PROBABILITY)]  for direction in self._directions}
+
+    def get_directions_mask(self, position:tuple=None) -> int:
+        """
+            Method determining which movement directions are blocked, packed in the bits of an integer.
+            It draws the same random values as get_directions_state, without building strings.
+
+            Args:
+                position (tuple): optional x,y position of the robot. If None, position of the sensor is used.
+
+            Returns:
+                blocked (int): mask where bit i is set when the i-th of left, right, forward and backward is blocked.
+
+            Raises:
+                SensorUnavailable: if the sensor is not available.
+        """
+        if not self._available: raise SensorUnavailable(f"Sensor {self._type} is not available.")
+        if self._grid_map is not None:
+            return self._grid_map.get_directions_mask(position if position is not None else self._position)
+
+        if self._rng is not None: left, right, forward, backward = self._rng.binomial(1, BLOCKED_PROBABILITY, 4).tolist()
+        else: left, right, forward, backward = [np.random.binomial(1,BLOCKED_PROBABILITY) for _ in range(4)]
+        return left | right << 1 | forward << 2 | backward << 3
+
+    def measure_position(self, position:tuple=None) -> np.ndarray:
+        """
+            Method measuring the position of the robot, as a gps would, with the noise of the sensor.
+
+            Args:
+                position (tuple): optional x,y position of the robot. If None, position of the sensor is used.
+
+            Returns:
+                measurement (np.ndarray): measured x,y position.
+
+            Raises:
+                SensorUnavailable: if the sensor is not available.
+        """
+
+        if not self._available: raise SensorUnavailable(f"Sensor {self._type} is not available.")
+        measurement = np.array(position if position is not None else self._position, dtype=np.float64)
+        if self._noise > 0:
+            normal = self._rng.normal if self._rng is not None else np.random.normal
+            measurement += normal(0.0, self._noise, 2)
+        return measurement
+
+    def measure_ranges(self, position:tuple=None) -> np.ndarray:
+        """
+            Method measuring, as an ultra sound would, the distance of the nearest obstacle in each direction,
+            with the noise of the sensor and limited by its range.
+
+            Args:
+                position (tuple): optional x,y position of the robot. If None, position of the sensor is used.
+
+            Returns:
+                ranges (np.ndarray): measured distances, ordered as left, right, forward and backward, None without a map.
+
+            Raises:
+                SensorUnavailable: if the sensor is not available.
+        """
+
+        if not self._available: raise SensorUnavailable(f"Sensor {self._type} is not available.")
+        if self._grid_map is None: return None
+        ranges = self._grid_map.get_ranges(position if position is not None else self._position)
+        if self._noise > 0:
+            normal = self._rng.normal if self._rng is not None else np.random.normal
+            ranges += normal(0.0, self._noise, 4)
+        return np.clip(ranges, 0.0, self._range, out=ranges)
 
     def get_position(self) -> tuple:
         """
@@ -96,6 +253,15 @@ class Sensor:
         """
         return self._position
     
+    def set_position(self, position:tuple) -> None:
+        """
+            Method to place the sensor, and so the robot, in a given position.
+
+            Args:
+                position (tuple): x,y position of the robot.
+        """
+        self._position = position
+
     def update_position(self, direction:str) -> None:
         """
             Method to update the position of the robot depending on the direction.
@@ -113,6 +279,19 @@ class Sensor:
 
         self._available = True
 
+    def set_unavailable(self) -> None:
+        """
+            Method to make a sensor unavailable, so that reading it raises SensorUnavailable until it is restored.
+            The position of the robot kept by the sensor can still be read and updated.
+        """
+        self._available = False
+
+    def is_available(self) -> bool:
+        """
+            Method to get the availability of a sensor.
+        """
+        return self._available
+
 if __name__ == "__main__":
 
     # Test initialization and to string
@@ -121,16 +300,26 @@ if __name__ == "__main__":
     print(sensor1)
     print(sensor2)
 
-    # Test get_data
+    # Test read and get_data
+    sensor1.read(10)
     data = sensor1.get_data(10)
     print(data)
 
     # Test get_all_data
     all_data = sensor1.get_all_data()
     print(all_data)
+    print(sensor1.get_statistics())
 
     # Test restore_sensor
-    sensor1._available = False
-    print(sensor1._available)
+    sensor1.set_unavailable()
+    print(sensor1.is_available())
+    try: sensor1.read()
+    except SensorUnavailable as error: print(error)
     sensor1.restore_sensor()
-    print(sensor1._available)
+    print(sensor1.is_available())
+
+    # Test queries on a map of the world
+    from sense_plan_act.grid_map import GridMap
+    camera = Sensor('camera', 5.0, 1, grid_map=GridMap.random(30, 30, 0.2, target=(25,20)))
+    print(camera.get_directions_state((0,0)))
+    print(camera.target_visible((0,0)), camera.target_visible((22,18)))
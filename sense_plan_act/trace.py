@@ -0,0 +1,249 @@
+"""
+    Classes to record the time steps of a mission in a binary trace file, and to replay them through a planner.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from sense_plan_act.perception import Perception, directions_mask
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+
+# Header of the file: magic string, version, number of records, offset of the string table
+HEADER = struct.Struct('<8sIQQ4x')
+MAGIC = b'SPATRACE'
+VERSION = 1
+
+# Fixed-width record of a time step. Bit i of directions is set when DIRECTIONS[i] is blocked.
+RECORD = np.dtype([
+    ('tick', '<u4'),
+    ('x', '<i4'),
+    ('y', '<i4'),
+    ('orientation', 'u1'),
+    ('directions', 'u1'),
+    ('target_known', 'u1'),
+    ('outcome', 'u1'),
+    ('tx', '<i4'),
+    ('ty', '<i4'),
+    ('battery_level', '<f8'),
+    ('energy', '<f8'),
+    ('action', '<u2')
+])
+
+class TraceRecorder:
+
+    def __init__(self, path:str, chunk_size:int=4096) -> None:
+
+        """
+            Method to initialize a recorder writing a new trace file.
+            Records are collected in a preallocated chunk and written to the file when the chunk is full.
+            Names of the actions are stored once, in a string table at the end of the file.
+
+            Args:
+                path (str): path of the trace file.
+                chunk_size (int): number of records kept in memory before writing them.
+
+            Returns:
+                TraceRecorder: new instance of the TraceRecorder class.
+        """
+
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        self._chunk = np.zeros(chunk_size, dtype=RECORD)
+        self._size = 0 # Records in the current chunk
+        self._count = 0 # Records written to the file
+        self._strings = {None: 0} # Action names and their ids
+
+    def __str__(self) -> str:
+        return f"Trace recorder with {self._count + self._size} records."
+
+    def __enter__(self) -> 'TraceRecorder':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def record(self, tick:int, perceptions:dict, orientation:str, action:str, energy:float, outcome:bool=False) -> None:
+        """
+            Method recording a time step.
+
+            Args:
+                tick (int): integer representing the number of the time step.
+                perceptions (dict): dictionary of perceptions the action was selected from.
+                orientation (str): orientation of the robot when the perceptions were received.
+                action (str): action selected by the planner.
+                energy (float): energy consumed to perform the action.
+                outcome (bool): outcome of the action, for example of a pick up.
+        """
+
+        index = self._strings.get(action)
+        if index is None: index = self._strings[action] = len(self._strings)
+
+        directions = perceptions.get_blocked() if isinstance(perceptions, Perception) else directions_mask(perceptions)
+
+        x, y = perceptions['position']
+        target = perceptions['target']
+        tx, ty = target if target is not None else (0, 0)
+
+        self._chunk[self._size] = (tick, x, y, DIRECTIONS.index(orientation), directions, target is not None, outcome,
+                                   tx, ty, perceptions['battery_level'], energy, index)
+        self._size += 1
+        if self._size == len(self._chunk): self._write_chunk()
+
+    def _write_chunk(self) -> None:
+        """
+            Method writing the records of the current chunk to the file.
+        """
+        self._file.write(self._chunk[:self._size].tobytes())
+        self._count += self._size
+        self._size = 0
+
+    def close(self) -> None:
+        """
+            Method writing the remaining records and the string table, and closing the file.
+        """
+
+        if self._file.closed: return
+        self._write_chunk()
+        offset = self._file.tell()
+        names = [None] * len(self._strings)
+        for name, index in self._strings.items(): names[index] = name
+        self._file.write(json.dumps(names).encode())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self._count, offset))
+        self._file.close()
+
+class TraceReader:
+
+    def __init__(self, path:str) -> None:
+
+        """
+            Method to open a trace file. Records are memory-mapped, so only the ones accessed are read from disk.
+
+            Args:
+                path (str): path of the trace file.
+
+            Returns:
+                TraceReader: new instance of the TraceReader class.
+
+            Raises:
+                ValueError: if the file is not a trace file.
+        """
+
+        with open(path, 'rb') as file:
+            magic, version, count, offset = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION: raise ValueError(f"{path} is not a trace file.")
+            file.seek(offset)
+            self._actions = json.loads(file.read().decode())
+
+        self._records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.size, shape=(count,)) if count else np.zeros(0, dtype=RECORD)
+
+    def __str__(self) -> str:
+        return f"Trace with {len(self)} records and actions: {', '.join(str(action) for action in self._actions[1:])}"
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get_records(self) -> np.ndarray:
+        """
+            Method to get the records of the trace. Each field can be accessed as a column, for example records['battery_level'].
+        """
+        return self._records
+
+    def get_actions(self) -> list:
+        """
+            Method to get the string table of the trace, where the action of each record is an index.
+        """
+        return self._actions
+
+    def get_perceptions(self, index:int) -> dict:
+        """
+            Method rebuilding the perceptions of a recorded time step, as received by the planner.
+
+            Args:
+                index (int): index of the record.
+
+            Returns:
+                perceptions (dict): dictionary of perceptions.
+        """
+        perceptions = {}
+        _fill(perceptions, self._records[index].item())
+        return perceptions
+
+def _fill(perceptions:dict, record:tuple) -> None:
+    """
+        Function writing in a dictionary the perceptions stored in a record.
+    """
+
+    _, x, y, orientation, directions, target_known, _, tx, ty, battery_level, _, _ = record
+    perceptions['position'] = (x, y)
+    perceptions['orientation'] = DIRECTIONS[orientation]
+    perceptions['target'] = (tx, ty) if target_known else None
+    perceptions['battery_level'] = battery_level
+    perceptions['left'] = 'blocked' if directions & 1 else 'free'
+    perceptions['right'] = 'blocked' if directions & 2 else 'free'
+    perceptions['forward'] = 'blocked' if directions & 4 else 'free'
+    perceptions['backward'] = 'blocked' if directions & 8 else 'free'
+
+def replay(reader:TraceReader, planner, goal:str, chunk_size:int=65536) -> dict:
+    """
+        Function feeding the recorded perceptions through a planner, without using any sensor,
+        and comparing its actions with the recorded ones.
+
+        Args:
+            reader (TraceReader): trace to replay.
+            planner (Planner): planner selecting the actions.
+            goal (str): string representing the goal of the plan.
+            chunk_size (int): number of records read from the file at once.
+
+        Returns:
+            result (dict): dictionary with the number of replayed records and the indices of the records where the action differs.
+    """
+
+    records, names = reader.get_records(), reader.get_actions()
+    plan = planner.compile(goal)
+    select = planner.select_action
+    perceptions = {}
+    mismatches = []
+
+    for start in range(0, len(records), chunk_size):
+        for offset, record in enumerate(records[start:start+chunk_size].tolist()):
+            _fill(perceptions, record)
+            if select(plan, perceptions) != names[record[-1]]: mismatches.append(start + offset)
+
+    return {'records': len(records), 'mismatches': mismatches}
+
+if __name__ == "__main__":
+
+    import os
+    import tempfile
+    import time
+
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot, run_mission
+    from sense_plan_act.planner import Planner
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'mission.trace')
+
+        # Test recording of some missions in the same trace
+        with TraceRecorder(path) as recorder:
+            for seed in range(200):
+                robot = build_robot(DEFAULT_CONFIG, np.random.default_rng(seed))
+                run_mission(robot, 'search', recorder=recorder)
+
+        reader = TraceReader(path)
+        print(reader)
+        print(reader.get_perceptions(0))
+        print(f"Size: {os.path.getsize(path)} bytes, battery consumed: {reader.get_records()['energy'].sum():.1f}")
+
+        # Test replay with the same planner and with a changed one
+        start = time.perf_counter()
+        print(len(replay(reader, Planner('search'), 'search')['mismatches']))
+        print(f"Replayed {len(reader)} records in {time.perf_counter() - start:.3f} s")
+
+        planner = Planner('search')
+        planner.add_plan('wonder', [(planner.check_battery, lambda perceptions: 'forward')])
+        print(len(replay(reader, planner, 'search')['mismatches']))
+        del reader
@@ -0,0 +1,319 @@
+"""
+    Class representing a world shared by many robots, moving on the same map.
+"""
+
+import math
+
+from sense_plan_act.control_loop import ControlLoop
+
+DIRECTIONS = ['left', 'right', 'forward', 'backward']
+OFFSETS = [(-1,0), (1,0), (0,1), (0,-1)]
+
+class World:
+
+    def __init__(self, grid_map, bucket_size:int=8) -> None:
+
+        """
+            Method to initialize a world on a map.
+            Robots are indexed both by the cell they occupy, to check occupancy, and by the bucket of
+            bucket_size x bucket_size cells containing them, to find the robots close to a position
+            without looking at all the others.
+            The world can be given to sensors in place of the map: a cell occupied by another robot is blocked.
+
+            Args:
+                grid_map (GridMap): map of the obstacles and of the target.
+                bucket_size (int): integer representing the side, in cells, of the buckets of the spatial hash.
+
+            Returns:
+                World: new instance of the World class.
+
+            Raises:
+                ValueError: if bucket_size is not positive.
+        """
+
+        if bucket_size <= 0: raise ValueError(f"Bucket size must be positive, got {bucket_size}.")
+
+        self._grid_map = grid_map
+        self._bucket_size = bucket_size
+        self._robots = {} # Robots of the world, by id
+        self._loops = {} # Control loop of each robot, by id
+        self._positions = {} # Position of each robot, by id
+        self._occupied = {} # Id of the robot occupying each cell
+        self._buckets = {} # Set of ids of the robots in each bucket
+        self._active = [] # Ids of the robots whose mission is not over, in the order they act
+
+    def __str__(self) -> str:
+        return f"World with {len(self._robots)} robots, {len(self._active)} active, on: {self._grid_map}"
+
+    def __len__(self) -> int:
+        return len(self._robots)
+
+    def _bucket(self, position:tuple) -> tuple:
+        """
+            Method to get the key of the bucket containing a position.
+        """
+        return position[0] // self._bucket_size, position[1] // self._bucket_size
+
+    def add_robot(self, robot, position:tuple=(0,0), goal:str=None) -> int:
+        """
+            Method to place a robot in the world. Its sensors perceive the world instead of their own map.
+
+            Args:
+                robot (Robot): robot to add.
+                position (tuple): x,y position of the robot.
+                goal (str): goal of the plan followed by the robot. If None, the goal of its planner is used.
+
+            Returns:
+                id (int): integer identifying the robot in the world.
+
+            Raises:
+                ValueError: if the robot is already in the world, or the position is blocked or occupied.
+        """
+
+        if robot._id in self._robots: raise ValueError(f"Robot {robot._id} is already in the world.")
+        if self._grid_map.is_blocked(position): raise ValueError(f"Position {position} is blocked.")
+        if position in self._occupied: raise ValueError(f"Position {position} is occupied by robot {self._occupied[position]}.")
+
+        for sensor in robot._sensors.values():
+            sensor.set_position(position)
+            sensor._grid_map = self
+
+        id = robot._id
+        self._robots[id] = robot
+        self._loops[id] = ControlLoop(robot, goal)
+        self._positions[id] = position
+        self._occupied[position] = id
+        self._buckets.setdefault(self._bucket(position), set()).add(id)
+        self._active.append(id)
+        return id
+
+    def remove_robot(self, id:int) -> None:
+        """
+            Method to remove a robot from the world.
+
+            Args:
+                id (int): integer identifying the robot.
+        """
+
+        position = self._positions.pop(id)
+        del self._robots[id], self._loops[id], self._occupied[position]
+        self._remove_from_bucket(id, position)
+        if id in self._active: self._active.remove(id)
+
+    def _remove_from_bucket(self, id:int, position:tuple) -> None:
+        """
+            Method removing a robot from the bucket of a position, dropping the bucket when it becomes empty.
+        """
+        key = self._bucket(position)
+        bucket = self._buckets[key]
+        bucket.discard(id)
+        if not bucket: del self._buckets[key]
+
+    def move_robot(self, id:int, position:tuple) -> None:
+        """
+            Method updating the position of a robot in the indices of the world.
+
+            Args:
+                id (int): integer identifying the robot.
+                position (tuple): new x,y position of the robot.
+
+            Raises:
+                ValueError: if the position is occupied by another robot.
+        """
+
+        old = self._positions[id]
+        if old == position: return
+        other = self._occupied.get(position)
+        if other is not None: raise ValueError(f"Robot {id} collides with robot {other} at {position}.")
+
+        del self._occupied[old]
+        self._occupied[position] = id
+        self._positions[id] = position
+        if self._bucket(old) != self._bucket(position):
+            self._remove_from_bucket(id, old)
+            self._buckets.setdefault(self._bucket(position), set()).add(id)
+
+    def get_robot(self, id:int):
+        """
+            Method to get a robot of the world given its id.
+        """
+        return self._robots[id]
+
+    def get_position(self, id:int) -> tuple:
+        """
+            Method to get the position of a robot of the world given its id.
+        """
+        return self._positions[id]
+
+    def is_occupied(self, position:tuple) -> bool:
+        """
+            Method determining whether a cell is occupied by a robot.
+        """
+        return position in self._occupied
+
+    def get_occupant(self, position:tuple) -> int:
+        """
+            Method to get the id of the robot occupying a cell, None if it is free.
+        """
+        return self._occupied.get(position)
+
+    def get_neighbours(self, position:tuple, radius:float, exclude:int=None) -> list:
+        """
+            Method finding the robots within a distance from a position, looking only at the buckets the range overlaps.
+
+            Args:
+                position (tuple): x,y position of the center.
+                radius (float): float representing the maximum Euclidean distance.
+                exclude (int): optional id of a robot not to include, usually the one asking.
+
+            Returns:
+                neighbours (list): list of ids of the robots within range.
+        """
+
+        x, y = position
+        size, reach = self._bucket_size, math.floor(radius)
+        squared = radius * radius
+        neighbours = []
+        for bx in range((x - reach) // size, (x + reach) // size + 1):
+            for by in range((y - reach) // size, (y + reach) // size + 1):
+                for id in self._buckets.get((bx, by), ()):
+                    ox, oy = self._positions[id]
+                    if id != exclude and (ox - x) ** 2 + (oy - y) ** 2 <= squared: neighbours.append(id)
+        return neighbours
+
+    def get_robots_in_range(self, id:int, sensor:str='camera') -> list:
+        """
+            Method finding the robots within the range of a sensor of a robot.
+
+            Args:
+                id (int): integer identifying the robot.
+                sensor (str): name of the sensor whose range is used.
+
+            Returns:
+                neighbours (list): list of ids of the other robots within range.
+        """
+        return self.get_neighbours(self._positions[id], self._robots[id]._sensors[sensor]._range, id)
+
+    def get_target(self) -> tuple:
+        """
+            Method to get the position of the target, from the map.
+        """
+        return self._grid_map.get_target()
+
+    def is_blocked(self, position:tuple) -> bool:
+        """
+            Method determining whether a cell is blocked by an obstacle or occupied by a robot.
+        """
+        return position in self._occupied or self._grid_map.is_blocked(position)
+
+    def get_directions_mask(self, position:tuple) -> int:
+        """
+            Method determining which movement directions are blocked, by obstacles or by other robots.
+
+            Args:
+                position (tuple): x,y position of the robot.
+
+            Returns:
+                blocked (int): mask where bit i is set when DIRECTIONS[i] is blocked.
+        """
+
+        blocked = self._grid_map.get_directions_mask(position)
+        if self._occupied:
+            x, y = position
+            occupied = self._occupied
+            for bit, (dx, dy) in enumerate(OFFSETS):
+                if (x + dx, y + dy) in occupied: blocked |= 1 << bit
+        return blocked
+
+    def get_directions_state(self, position:tuple) -> dict:
+        """
+            Method determining for each possible movement direction whether it is free or blocked, by obstacles or by other robots.
+
+            Args:
+                position (tuple): x,y position of the robot.
+
+            Returns:
+                directions_state (dict): dictionary associating to each direction either 'free' or 'blocked' state.
+        """
+        blocked = self.get_directions_mask(position)
+        return {direction: 'blocked' if blocked & (1 << bit) else 'free' for bit, direction in enumerate(DIRECTIONS)}
+
+    def get_ranges(self, position:tuple) -> 'np.ndarray':
+        """
+            Method determining, for each direction, the distance of the nearest obstacle of the map. Robots are not considered.
+        """
+        return self._grid_map.get_ranges(position)
+
+    def target_visible(self, position:tuple, range:float) -> bool:
+        """
+            Method determining if the target is within a given range from a position, from the map.
+        """
+        return self._grid_map.target_visible(position, range)
+
+    def step(self) -> int:
+        """
+            Method performing a time step for every robot whose mission is not over, one robot after the other.
+            The position of each robot is updated before the next one acts, so robots never collide.
+
+            Returns:
+                active (int): number of robots whose mission is not over after the time step.
+        """
+
+        still_active = []
+        for id in self._active:
+            loop = self._loops[id]
+            loop.step()
+            self.move_robot(id, self._robots[id]._sensors['position'].get_position())
+            if not loop.is_done(): still_active.append(id)
+        self._active = still_active
+        return len(still_active)
+
+    def run(self, max_ticks:int=None) -> dict:
+        """
+            Method performing time steps until the missions of all robots are over.
+
+            Args:
+                max_ticks (int): optional integer limiting the number of time steps.
+
+            Returns:
+                results (dict): dictionary associating to the id of each robot how its mission ended.
+        """
+
+        ticks = 0
+        while self._active and (max_ticks is None or ticks < max_ticks):
+            self.step()
+            ticks += 1
+        return {id: loop.get_result() for id, loop in self._loops.items()}
+
+if __name__ == "__main__":
+
+    import time
+
+    import numpy as np
+
+    from sense_plan_act.grid_map import GridMap
+    from sense_plan_act.mission import DEFAULT_CONFIG, build_robot
+
+    # Test a swarm searching the target on a random map, with cameras able to see it from far away
+    config = dict(DEFAULT_CONFIG, sensors=dict(DEFAULT_CONFIG['sensors'], camera={'type': 'camera', 'range': 30.0, 'max_samples': 1}))
+    rng = np.random.default_rng(0)
+    grid_map = GridMap.random(100, 100, 0.1, rng, target=(80,70))
+    world = World(grid_map)
+    for index in range(200):
+        position = (int(rng.integers(0, 100)), int(rng.integers(0, 100)))
+        if grid_map.is_blocked(position) or world.is_occupied(position): continue
+        world.add_robot(build_robot(config, rng), position)
+    print(world)
+
+    # Test neighbour queries against a full scan
+    ids = list(world._positions)
+    for id in ids[:20]:
+        x, y = world.get_position(id)
+        scan = sorted(other for other in ids if other != id and (world.get_position(other)[0] - x) ** 2 + (world.get_position(other)[1] - y) ** 2 <= 100)
+        assert sorted(world.get_neighbours((x, y), 10, id)) == scan
+    print(world.get_robots_in_range(ids[0], 'ultra_sound')[:10])
+
+    start = time.perf_counter()
+    results = world.run(max_ticks=500)
+    print(f"{sum(result['found'] for result in results.values())} robots found the target in {time.perf_counter() - start:.2f} s")
+    print(len(set(world._positions.values())) == len(world))